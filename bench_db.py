@@ -0,0 +1,146 @@
+"""
+Concurrency benchmark for the SQLite engine profile.
+
+Copies the database to a temporary directory and, for each profile, runs
+writer threads that toggle watchlist entries (insert/delete plus counter
+update, one transaction each) while reader threads query the catalog.
+Prints write throughput, latency percentiles and lock errors.
+
+    python bench_db.py --writers 8 --readers 4 --seconds 10
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+# Add the current directory to the Python path
+sys.path.insert(0, os.path.abspath('.'))
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+from board.database import default_database_uri, engine_options, sqlite_pragmas, apply_sqlite_pragmas
+
+# Environment overrides of each profile
+PROFILES = {
+    # SQLite defaults: rollback journal, fsync on every commit, no lock waiting
+    'default': {'SQLITE_JOURNAL_MODE': 'DELETE', 'SQLITE_SYNCHRONOUS': 'FULL', 'SQLITE_BUSY_TIMEOUT': '0',
+                'SQLITE_CACHE_SIZE': '-2000', 'SQLITE_MMAP_SIZE': '0', 'SQLITE_TEMP_STORE': 'DEFAULT'},
+    # The application profile (board/database.py)
+    'tuned': {},
+}
+
+TOGGLE = [
+    "INSERT OR IGNORE INTO watchlist (user_id, movie_id) VALUES (:user_id, :movie_id)",
+    "DELETE FROM watchlist WHERE user_id = :user_id AND movie_id = :movie_id AND :delete",
+    "UPDATE movie_stats SET watchlist_count = watchlist_count + 1 WHERE movie_id = :movie_id",
+]
+
+READ = "SELECT id, title FROM movies WHERE rating IS NOT NULL ORDER BY rating DESC LIMIT 24 OFFSET :offset"
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def run_profile(name, overrides, source, args):
+    workdir = tempfile.mkdtemp(prefix='bench_db_')
+    try:
+        path = os.path.join(workdir, 'bench.db')
+        shutil.copy(source, path)
+        uri = 'sqlite:///' + path
+
+        environ = {**os.environ, **overrides}
+        options = engine_options(uri, environ)
+        options['pool_size'] = args.writers + args.readers
+        engine = create_engine(uri, **options)
+        apply_sqlite_pragmas(engine, sqlite_pragmas(environ))
+
+        with engine.connect() as connection:
+            user_ids = [row[0] for row in connection.execute(text("SELECT id FROM users"))] or [1]
+            movie_ids = [row[0] for row in connection.execute(text("SELECT id FROM movies"))]
+
+        latencies = []
+        errors = [0]
+        reads = [0]
+        lock = threading.Lock()
+        deadline = time.perf_counter() + args.seconds
+
+        def writer():
+            rng = random.Random()
+            local, failed = [], 0
+            while time.perf_counter() < deadline:
+                params = {'user_id': rng.choice(user_ids), 'movie_id': rng.choice(movie_ids), 'delete': rng.random() < 0.5}
+                start = time.perf_counter()
+                try:
+                    with engine.begin() as connection:
+                        for statement in TOGGLE:
+                            connection.execute(text(statement), params)
+                    local.append(time.perf_counter() - start)
+                except OperationalError:
+                    failed += 1
+            with lock:
+                latencies.extend(local)
+                errors[0] += failed
+
+        def reader():
+            rng = random.Random()
+            count = 0
+            while time.perf_counter() < deadline:
+                try:
+                    with engine.connect() as connection:
+                        connection.execute(text(READ), {'offset': rng.randrange(0, 500)}).all()
+                    count += 1
+                except OperationalError:
+                    pass
+            with lock:
+                reads[0] += count
+
+        threads = [threading.Thread(target=writer) for _ in range(args.writers)]
+        threads += [threading.Thread(target=reader) for _ in range(args.readers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        engine.dispose()
+
+        return {
+            'profile': name,
+            'writes/s': len(latencies) / args.seconds,
+            'reads/s': reads[0] / args.seconds,
+            'p50 ms': percentile(latencies, 0.50) * 1000,
+            'p99 ms': percentile(latencies, 0.99) * 1000,
+            'errors': errors[0],
+        }
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--db', default=default_database_uri()[len('sqlite:///'):], help='SQLite database to copy')
+    parser.add_argument('--writers', type=int, default=8)
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--profile', choices=sorted(PROFILES), action='append', help='Profiles to run (default: all)')
+    args = parser.parse_args()
+
+    results = [run_profile(name, PROFILES[name], args.db, args) for name in args.profile or PROFILES]
+
+    columns = ['profile', 'writes/s', 'reads/s', 'p50 ms', 'p99 ms', 'errors']
+    print(''.join(f'{column:>12}' for column in columns))
+    for result in results:
+        print(''.join(
+            f'{result[column]:>12.1f}' if isinstance(result[column], float) else f'{result[column]:>12}'
+            for column in columns
+        ))
+
+
+if __name__ == '__main__':
+    main()
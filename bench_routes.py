@@ -0,0 +1,356 @@
+"""
+Route benchmark: every page and API of the site on synthetic data.
+
+Copies a database made by generate_data.py to a temporary directory and
+sends each benchmark case (a route, signed out or as a typical or power
+user) through the Flask test client. After a few warm-up requests it
+records the p50/p95/p99 latency (until the last byte of the body, so
+streamed pages count in full) and the SQL statements per request, then
+makes one more request to measure its peak Python memory.
+
+Results are compared with a baseline file. The exit status is 1 when a
+route ran more queries than its baseline, got slower or used more memory
+than the tolerance allows, or when a route of the pages blueprint has no
+benchmark case.
+
+    python generate_data.py --db /tmp/bench.db
+    python bench_routes.py --db /tmp/bench.db                     # compare with bench_baseline.json
+    python bench_routes.py --db /tmp/bench.db --update-baseline   # record a new baseline
+"""
+import argparse
+import gc
+import io
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import namedtuple
+
+# Add the current directory to the Python path
+sys.path.insert(0, os.path.abspath('.'))
+
+from sqlalchemy import func, select
+from board import create_app
+from board.avatars import shutdown_workers
+from board.query_stats import count_queries
+from board.models import db, Genre, Movie, MovieStats, User, UserStats, movie_genres, watched
+from generate_data import PASSWORD
+
+# One benchmark case. `url` and `body` are strings formatted with the
+# dataset sample (see load_sample()) and the request number `n`, or
+# functions of (sample, n). `user` is None, 'typical' or 'power';
+# `body` is sent as JSON, or as a form with `form`.
+Case = namedtuple('Case', ['name', 'endpoint', 'method', 'url', 'status', 'user', 'body', 'form'],
+                  defaults=['GET', None, 200, None, None, False])
+
+CASES = [
+    Case('home', 'pages.home', url='/'),
+    Case('genre', 'pages.genre_movies', url='/genre/{genre_id}'),
+    Case('api_genre', 'pages.api_genre_movies', url='/api/genre/{genre_id}/movies'),
+    Case('search', 'pages.search', url='/search?q={word}'),
+    Case('api_search', 'pages.api_search', url='/api/search?q={word}'),
+    Case('suggest', 'pages.search_suggest', url='/api/search/suggest?q={prefix}'),
+    Case('movie', 'pages.movie_detail', url='/movie/{movie_id}'),
+    Case('movie_signed_in', 'pages.movie_detail', url='/movie/{movie_id}', user='power'),
+    Case('surprise_me', 'pages.surprise_me', url='/surprise-me', status=302),
+    Case('top_movies', 'pages.top_movies', url='/top-movies'),
+    Case('api_top_movies', 'pages.api_top_movies', url='/api/top-movies'),
+    Case('signin_form', 'pages.signin', url='/signin'),
+    Case('signin', 'pages.signin', 'POST', '/signin', 302,
+         body={'email': '{typical_email}', 'password': PASSWORD}, form=True),
+    Case('signup_form', 'pages.signup', url='/signup'),
+    Case('signup', 'pages.signup', 'POST', '/signup', 302, form=True,
+         body={'username': 'bench{n}', 'email': 'bench{n}@example.com',
+               'password': 'Bench-mark1', 'confirm_password': 'Bench-mark1'}),
+    Case('signout', 'pages.signout', url='/signout', status=302, user='typical'),
+    Case('library', 'pages.my_library', url='/my-library', user='typical'),
+    Case('library_power', 'pages.my_library', url='/my-library?sort=watched', user='power'),
+    Case('api_library', 'pages.api_library', url='/api/library', user='typical'),
+    Case('api_library_power', 'pages.api_library', url='/api/library?tab=favorites&sort=favorited', user='power'),
+    Case('export', 'pages.export_my_library', url='/api/library/export', user='typical'),
+    Case('export_power', 'pages.export_my_library', url='/api/library/export?format=ndjson', user='power'),
+    Case('movie_statuses', 'pages.get_user_movie_statuses', url='/api/user/movie-statuses?ids={page_ids}',
+         user='power'),
+    Case('movie_statuses_all', 'pages.get_user_movie_statuses', url='/api/user/movie-statuses', user='power'),
+    Case('toggle_watchlist', 'pages.toggle_watchlist', 'POST', '/api/watchlist/toggle', user='typical',
+         body={'movie_id': '{movie_id}'}),
+    Case('toggle_favorite', 'pages.toggle_favorite', 'POST', '/api/favorites/toggle', user='typical',
+         body={'movie_id': '{movie_id}'}),
+    Case('toggle_watched', 'pages.toggle_watched', 'POST', '/api/watched/toggle', user='typical',
+         body={'movie_id': '{movie_id}'}),
+    Case('library_batch', 'pages.library_batch', 'POST', '/api/library/batch', user='power',
+         body=lambda sample, n: {'operations': [
+             {'movie_id': movie_id, 'list': 'watchlist', 'op': op}
+             for op in ('add', 'remove') for movie_id in sample['page_id_list'][:20]
+         ]}),
+    # Each request removes a different movie of the power user's library
+    Case('remove_movie', 'pages.remove_movie', 'POST', '/api/movie/remove', user='power',
+         body=lambda sample, n: {'movie_id': sample['removable'][n % len(sample['removable'])]}),
+    Case('own_profile', 'pages.profile', url='/profile', status=302, user='typical'),
+    Case('profile', 'pages.profile', url='/profile/{typical_user}'),
+    Case('profile_power', 'pages.profile', url='/profile/{power_user}'),
+    Case('update_profile', 'pages.update_profile', 'POST', '/update_profile', 302, user='typical',
+         body={'username': '{typical_username}'}, form=True),
+    Case('upload_avatar', 'pages.upload_avatar', 'POST', '/profile/picture', 302, user='typical', form=True,
+         body=lambda sample, n: {'avatar': (io.BytesIO(sample['picture']), 'avatar.png')}),
+    Case('community', 'pages.community', url='/community'),
+]
+
+# Routes that only send files from disk, so they say nothing about the app
+SKIPPED = {
+    'pages.poster': 'sends a stored poster variant',
+    'pages.avatar': 'sends a stored avatar thumbnail',
+    'pages.asset': 'sends a built static file',
+}
+
+BASELINE = 'bench_baseline.json'
+
+# Allowed growth over the baseline: (multiple of --tolerance, absolute
+# slack), so millisecond-scale routes don't fail on timer noise. p99 is
+# recorded but not compared; with a few dozen samples it is the slowest
+# request.
+COMPARED = {
+    'p50_ms': (1, 2.0),
+    'p95_ms': (2, 5.0),
+    'peak_kb': (1, 256),
+}
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def load_sample():
+    """The IDs and values the cases are formatted with, picked from the data."""
+    watched_count = UserStats.watched_count
+    user_count = db.session.scalar(select(func.count()).select_from(UserStats))
+    typical = db.session.execute(
+        select(User.id, User.username, User.email)
+        .join(UserStats, UserStats.user_id == User.id)
+        .order_by(watched_count, User.id)
+        .offset(user_count // 2)
+        .limit(1)
+    ).one()
+    power_user = db.session.scalar(select(UserStats.user_id).order_by(watched_count.desc(), UserStats.user_id).limit(1))
+    movie_id = db.session.scalar(select(MovieStats.movie_id).order_by(MovieStats.watched_count.desc()).limit(1))
+    genre_id = db.session.scalar(
+        select(movie_genres.c.genre_id).group_by(movie_genres.c.genre_id).order_by(func.count().desc()).limit(1)
+    ) or db.session.scalar(select(Genre.id).limit(1))
+    word = db.session.get(Movie, movie_id).title.split()[0].lower()
+    power_ids = db.session.scalars(
+        select(watched.c.movie_id).where(watched.c.user_id == power_user).order_by(watched.c.movie_id)
+    ).all()
+
+    # A small PNG for the profile picture upload
+    from PIL import Image
+    buffer = io.BytesIO()
+    Image.new('RGB', (300, 300), (200, 40, 40)).save(buffer, 'PNG')
+
+    # Half of a movie grid's IDs in the power user's library, half not
+    page_id_list = power_ids[:12] + list(range(1, 13))
+    return {
+        'typical_user': typical.id,
+        'typical_username': typical.username,
+        'typical_email': typical.email,
+        'power_user': power_user,
+        'movie_id': movie_id,
+        'genre_id': genre_id,
+        'word': word,
+        'prefix': word[:3],
+        'page_id_list': page_id_list,
+        'page_ids': ','.join(map(str, page_id_list)),
+        'removable': power_ids[len(power_ids) // 2:] or [movie_id],
+        'picture': buffer.getvalue(),
+    }
+
+
+def dataset_summary():
+    """Row counts identifying the dataset a baseline was recorded on."""
+    return {
+        'movies': db.session.scalar(select(func.count()).select_from(Movie)),
+        'users': db.session.scalar(select(func.count()).select_from(User)),
+        'library_entries': db.session.scalar(
+            select(func.sum(UserStats.watchlist_count + UserStats.watched_count + UserStats.favorites_count))
+        ) or 0,
+    }
+
+
+def _fill(value, sample, n):
+    if callable(value):
+        return value(sample, n)
+    if isinstance(value, str):
+        return value.format(n=n, **sample)
+    if isinstance(value, dict):
+        return {key: _fill(item, sample, n) for key, item in value.items()}
+    return value
+
+
+def send(app, case, sample, n):
+    """Make one request of `case` with a fresh client; returns (status, seconds)."""
+    client = app.test_client()
+    if case.user is not None:
+        with client.session_transaction() as session:
+            session['_user_id'] = str(sample[f'{case.user}_user'])
+            session['_fresh'] = True
+
+    kwargs = {}
+    if case.body is not None:
+        body = _fill(case.body, sample, n)
+        kwargs['data' if case.form else 'json'] = body
+
+    # Read the body chunk by chunk, as a server would send it, so streamed
+    # responses aren't held in memory as a whole
+    start = time.perf_counter()
+    response = client.open(_fill(case.url, sample, n), method=case.method, buffered=False, **kwargs)
+    for _ in response.response:
+        pass
+    elapsed = time.perf_counter() - start
+    response.close()
+    return response.status_code, elapsed
+
+
+def run_case(app, engine, case, sample, requests, warmup):
+    """Benchmark one case; returns its metrics, or raises AssertionError on an unexpected status."""
+    # Don't let garbage from earlier cases be collected during this one
+    gc.collect()
+    timings, counts = [], []
+    for n in range(warmup + requests):
+        # Statements sent by this thread, so profile pictures processed in
+        # the background aren't counted
+        with count_queries(engine) as stats:
+            status, elapsed = send(app, case, sample, n)
+        if status != case.status:
+            raise AssertionError(f'{case.name}: {case.method} {_fill(case.url, sample, n)} returned {status}, '
+                                 f'expected {case.status}')
+        if n >= warmup:
+            timings.append(elapsed)
+            counts.append(stats.count)
+
+    tracemalloc.start()
+    try:
+        send(app, case, sample, warmup + requests)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    # The median count: the catalog version and cached fragments are
+    # re-read every few seconds, so an occasional request runs one more query
+    return {
+        'p50_ms': round(percentile(timings, 0.50) * 1000, 2),
+        'p95_ms': round(percentile(timings, 0.95) * 1000, 2),
+        'p99_ms': round(percentile(timings, 0.99) * 1000, 2),
+        'queries': statistics.median_low(counts),
+        'peak_kb': round(peak / 1024),
+    }
+
+
+def uncovered_endpoints(app):
+    """Endpoints of the pages blueprint with neither a case nor a SKIPPED entry."""
+    covered = {case.endpoint for case in CASES} | set(SKIPPED)
+    return sorted({rule.endpoint for rule in app.url_map.iter_rules()
+                   if rule.endpoint.startswith('pages.') and rule.endpoint not in covered})
+
+
+def regressions(results, baseline, tolerance):
+    """(case, metric, baseline, current) for every metric worse than its baseline allows."""
+    found = []
+    for name, metrics in results.items():
+        expected = baseline.get(name)
+        if expected is None:
+            continue
+        # Query counts don't depend on the machine: any increase is a regression
+        if metrics['queries'] > expected['queries']:
+            found.append((name, 'queries', expected['queries'], metrics['queries']))
+        for metric, (factor, slack) in COMPARED.items():
+            if metrics[metric] > expected[metric] * (1 + factor * tolerance) + slack:
+                found.append((name, metric, expected[metric], metrics[metric]))
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--db', required=True, help='SQLite database made by generate_data.py (copied first)')
+    parser.add_argument('--requests', type=int, default=30, help='Timed requests per case')
+    parser.add_argument('--warmup', type=int, default=3, help='Untimed requests per case')
+    parser.add_argument('--case', action='append', help='Cases to run (default: all)')
+    parser.add_argument('--baseline', default=BASELINE, help='Baseline file')
+    parser.add_argument('--update-baseline', action='store_true', help='Write the results as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=0.5, help='Allowed slowdown, as a fraction')
+    parser.add_argument('--output', help='Also write the results as JSON to this file')
+    args = parser.parse_args()
+
+    cases = [case for case in CASES if not args.case or case.name in args.case]
+    workdir = tempfile.mkdtemp(prefix='bench_routes_')
+    try:
+        path = os.path.join(workdir, 'bench.db')
+        for suffix in ('', '-wal'):
+            if os.path.exists(args.db + suffix):
+                shutil.copy(args.db + suffix, path + suffix)
+        os.environ['DATABASE_URL'] = 'sqlite:///' + path
+        app = create_app(production=True)
+        app.config.update(WTF_CSRF_ENABLED=False, AVATAR_DIR=os.path.join(workdir, 'avatars'))
+
+        # Requests must run outside this context, or they would share its g and session
+        with app.app_context():
+            missing = uncovered_endpoints(app)
+            sample = load_sample()
+            dataset = dataset_summary()
+            engine = db.engine
+        print(f"{dataset['movies']} movies, {dataset['users']} users, "
+              f"{dataset['library_entries']} library entries")
+
+        results = {}
+        print(f"{'case':<22}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'queries':>9}{'peak KB':>10}")
+        for case in cases:
+            metrics = results[case.name] = run_case(app, engine, case, sample, args.requests, args.warmup)
+            print(f"{case.name:<22}{metrics['p50_ms']:>10.2f}{metrics['p95_ms']:>10.2f}"
+                  f"{metrics['p99_ms']:>10.2f}{metrics['queries']:>9}{metrics['peak_kb']:>10}")
+    finally:
+        # Profile pictures are processed in the background, against the copy
+        shutdown_workers()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {'dataset': dataset, 'routes': results}
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+
+    failed = False
+    for endpoint in missing:
+        print(f"No benchmark case for {endpoint}; add one to CASES (or to SKIPPED)")
+        failed = True
+
+    if args.update_baseline:
+        if args.case and os.path.exists(args.baseline):
+            # Only replace the cases that were run
+            with open(args.baseline) as f:
+                report['routes'] = {**json.load(f)['routes'], **results}
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f"Wrote the baseline of {len(report['routes'])} cases to {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline['dataset'] != dataset:
+            print(f"{args.baseline} was recorded on a different dataset ({baseline['dataset']}); "
+                  f"generate that dataset or record a new baseline with --update-baseline")
+            return 1
+        for name, metric, expected, current in regressions(results, baseline['routes'], args.tolerance):
+            print(f"Regression in {name}: {metric} {expected} -> {current}")
+            failed = True
+        for name in sorted(set(results) - set(baseline['routes'])):
+            print(f"{name} has no baseline yet")
+    else:
+        print(f"No baseline at {args.baseline}; record one with --update-baseline")
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
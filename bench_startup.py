@@ -0,0 +1,90 @@
+"""
+Startup benchmark: time from a fresh interpreter to the first response.
+
+Runs each startup mode in new Python processes against a migrated copy
+of the database and reports the median import + create_app() time, the
+time-to-first-request (startup plus the first GET of the home page) and
+the time until the first hit of each main page has been served.
+
+    python bench_startup.py --runs 5
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+# Add the current directory to the Python path
+sys.path.insert(0, os.path.abspath('.'))
+
+from board.database import default_database_uri
+
+# Code run in each child process; prints its timings as JSON
+CHILD = """
+import json, time
+start = time.perf_counter()
+from board import create_app
+app = create_app()
+created = time.perf_counter()
+client = app.test_client()
+assert client.get('/').status_code == 200
+first = time.perf_counter()
+for url in ('/genre/1', '/movie/1', '/top-movies', '/search?q=the', '/community', '/signin'):
+    assert client.get(url).status_code == 200, url
+pages = time.perf_counter()
+print(json.dumps({'startup': created - start, 'first_request': first - start, 'all_pages': pages - start}))
+"""
+
+MODES = {
+    'development': {'APP_ENV': 'development'},
+    'production (cold cache)': {'APP_ENV': 'production', 'clear_cache': True},
+    'production': {'APP_ENV': 'production'},
+}
+
+
+def run_child(environ):
+    output = subprocess.run(
+        [sys.executable, '-c', CHILD],
+        env=environ, capture_output=True, text=True, check=True, cwd=os.path.abspath('.')
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--db', default=default_database_uri()[len('sqlite:///'):], help='SQLite database to copy')
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench_startup_')
+    try:
+        path = os.path.join(workdir, 'bench.db')
+        shutil.copy(args.db, path)
+        cache_dir = os.path.join(workdir, 'jinja_cache')
+        base = {**os.environ, 'DATABASE_URL': 'sqlite:///' + path, 'TEMPLATE_CACHE_DIR': cache_dir}
+
+        # Bring the copy up to the current schema, as `flask db upgrade` would
+        run_child({**base, 'APP_ENV': 'development'})
+
+        # Modes are interleaved so background noise spreads evenly over them
+        results = {name: [] for name in MODES}
+        for _ in range(args.runs):
+            for name, mode in MODES.items():
+                if mode.get('clear_cache'):
+                    shutil.rmtree(cache_dir, ignore_errors=True)
+                results[name].append(run_child({**base, 'APP_ENV': mode['APP_ENV']}))
+
+        columns = [('startup', 'startup ms'), ('first_request', 'first request ms'), ('all_pages', 'all pages ms')]
+        print(f"{'mode':<26}" + ''.join(f'{label:>18}' for _, label in columns))
+        for name, runs in results.items():
+            medians = [statistics.median(run[key] for run in runs) * 1000 for key, _ in columns]
+            print(f"{name:<26}" + ''.join(f'{median:>18.1f}' for median in medians))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -4,25 +4,65 @@ from flask import Flask, session
 from flask_login import LoginManager
 from flask_wtf.csrf import CSRFProtect, generate_csrf
 from .models import db, User
+from .library import current_library
 from board import pages  # Import the pages blueprint
+from board import commands
+from board import database
+from board import fragments
+from board import startup
+from board import assets
+from board import query_stats
+from .posters import poster_attrs, poster_key
+from . import avatars
 
-def create_app():
-    """Application factory function that creates and configures the Flask app"""
+def create_app(production=None):
+    """
+    Application factory function that creates and configures the Flask app.
+    
+    In production mode (APP_ENV=production, or production=True) the schema
+    is left to the Alembic migrations instead of create_all(), compiled
+    templates are cached on disk and loaded up front, and static files are
+    served from the `flask build-assets` output when it exists.
+    """
+    if production is None:
+        production = startup.is_production()
+    
     # Create the Flask application instance
     app = Flask(__name__)
     
     # Configuration
     app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY') or 'your-secret-key-here'
+    app.config['CREATE_ALL_ON_STARTUP'] = not production
+    app.config['PRECOMPILE_TEMPLATES'] = production
+    app.config['TEMPLATE_CACHE_DIR'] = (os.environ.get('TEMPLATE_CACHE_DIR') or os.path.join(app.instance_path, 'jinja_cache')) \
+        if production else None
+    app.config['POSTER_CACHE_DIR'] = os.environ.get('POSTER_CACHE_DIR') or os.path.join(app.instance_path, 'posters')
+    app.config['USE_BUILT_ASSETS'] = production
+    app.config['ASSET_DIR'] = os.environ.get('ASSET_DIR') or os.path.join(app.static_folder, 'dist')
+    app.config['AVATAR_DIR'] = os.environ.get('AVATAR_DIR') or os.path.join(app.instance_path, 'avatars')
+    app.config['AVATAR_MAX_BYTES'] = avatars.MAX_UPLOAD_BYTES
+    # Larger request bodies are refused before being read (room left for the other form fields)
+    app.config['MAX_CONTENT_LENGTH'] = app.config['AVATAR_MAX_BYTES'] + 64 * 1024
+    # Per-request query counts and N+1 warnings (always on in debug mode)
+    app.config['QUERY_STATS'] = os.environ.get('QUERY_STATS', '0').lower() not in ('0', 'false', 'no')
+    
+    # Compiled template cache; must be set before the Jinja environment is created
+    if app.config['TEMPLATE_CACHE_DIR']:
+        startup.configure_template_cache(app, app.config['TEMPLATE_CACHE_DIR'])
     
-    # Database configuration
-    basedir = os.path.abspath(os.path.dirname(os.path.dirname(__file__)))
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(basedir, 'instance/movielist.db')
+    # Database configuration (DATABASE_URL, DB_POOL_* and SQLITE_* environment variables)
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
     
     # Initialize extensions
-    db.init_app(app)
+    database.init_app(app)
     csrf = CSRFProtect(app)
     
+    # Migrations are only run from the flask CLI; importing Alembic costs
+    # a noticeable part of startup, so web workers skip it
+    if os.environ.get('FLASK_RUN_FROM_CLI') == 'true':
+        from flask_migrate import Migrate
+        Migrate(app, db)
+    
     # Initialize Flask-Login
     login_manager = LoginManager()
     login_manager.login_view = 'pages.signin'
@@ -33,18 +73,39 @@ def create_app():
     def load_user(user_id):
         return User.query.get(int(user_id))
     
-    # Create database tables
-    with app.app_context():
-        db.create_all()
+    # Create database tables (production relies on `flask db upgrade` instead)
+    if app.config['CREATE_ALL_ON_STARTUP']:
+        with app.app_context():
+            db.create_all()
     
     # Register the pages blueprint with the application
     app.register_blueprint(pages.bp)
     
+    # Fragment cache for shared template parts ({% cache %})
+    fragments.init_app(app)
+    
+    # Fingerprinted, precompressed static files (`flask build-assets`)
+    assets.init_app(app)
+    
+    # Query counts per request (QUERY_STATS=1): headers, log line, N+1 warnings
+    query_stats.init_app(app)
+    
+    # Responsive poster images from the local poster store
+    app.jinja_env.globals.update(poster_attrs=poster_attrs, poster_key=poster_key, avatar_attrs=avatars.avatar_attrs)
+    
+    # Register CLI commands (flask rebuild-search-index, ...)
+    commands.init_app(app)
+    
     # Add CSRF token to all templates
     @app.context_processor
     def inject_csrf_token():
         return dict(csrf_token=generate_csrf)
     
+    # Expose the request's library membership (watchlist/favorites/watched) to templates
+    @app.context_processor
+    def inject_library():
+        return dict(library=current_library())
+    
     # Custom Jinja filter for formatting relative time
     @app.template_filter('timesince')
     def timesince(dt, default="just now"):
@@ -86,4 +147,8 @@ def create_app():
             return f'{value/1000:.1f}K'.replace('.0', '')
         return str(value)
     
+    # Compile every template now rather than on the first requests
+    if app.config['PRECOMPILE_TEMPLATES']:
+        startup.precompile_templates(app)
+    
     return app
@@ -0,0 +1,137 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+from flask import abort, current_app, request, send_from_directory, url_for
+from .posters import IMMUTABLE, write_atomic
+
+# The minifiers and brotli are only needed by `flask build-assets`, so they
+# are imported inside build_assets() rather than at application startup.
+
+# Sources picked up by the build, relative to the static folder
+EXTENSIONS = ('.css', '.js')
+EXCLUDED_DIRS = ('dist', 'uploads')
+
+MANIFEST_NAME = 'manifest.json'
+
+# Length of the content hash put in the built file names
+HASH_LENGTH = 12
+
+# Precompressed variants, in order of preference: Accept-Encoding token -> suffix
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+def asset_dir(app=None):
+    """Where built assets and their manifest go (the ASSET_DIR setting)."""
+    return (app or current_app).config['ASSET_DIR']
+
+
+def find_sources(static_dir):
+    """Relative paths of the stylesheets and scripts under `static_dir`."""
+    sources = []
+    for dirpath, dirnames, filenames in os.walk(static_dir):
+        if dirpath == static_dir:
+            dirnames[:] = [name for name in dirnames if name not in EXCLUDED_DIRS]
+        for name in filenames:
+            if name.endswith(EXTENSIONS):
+                sources.append(os.path.relpath(os.path.join(dirpath, name), static_dir).replace(os.sep, '/'))
+    return sorted(sources)
+
+
+def minify(name, text):
+    """Minified contents of a stylesheet or script."""
+    if name.endswith('.css'):
+        import rcssmin
+        return rcssmin.cssmin(text)
+    import rjsmin
+    return rjsmin.jsmin(text)
+
+
+def build_assets(static_dir, out_dir, clean=False):
+    """
+    Minify every stylesheet and script of `static_dir` into `out_dir` under
+    a content-hashed name, write .gz and .br copies next to them and save
+    the manifest mapping source names to built ones. With `clean`, files of
+    earlier builds are removed (keep them while old pages may still be cached).
+    Returns {source name: (built name, source bytes, minified bytes)}.
+    """
+    import brotli
+
+    built = {}
+    for name in find_sources(static_dir):
+        with open(os.path.join(static_dir, name), encoding='utf-8') as f:
+            source = f.read()
+        data = minify(name, source).encode('utf-8')
+
+        root, ext = os.path.splitext(name)
+        built_name = f'{root}.{hashlib.sha256(data).hexdigest()[:HASH_LENGTH]}{ext}'
+        path = os.path.join(out_dir, built_name)
+        write_atomic(path, data)
+        write_atomic(path + '.gz', gzip.compress(data, compresslevel=9, mtime=0))
+        write_atomic(path + '.br', brotli.compress(data, quality=11))
+        built[name] = (built_name, len(source.encode('utf-8')), len(data))
+
+    manifest = {name: built_name for name, (built_name, _, _) in built.items()}
+    write_atomic(os.path.join(out_dir, MANIFEST_NAME), json.dumps(manifest, indent=2, sort_keys=True).encode('utf-8'))
+
+    if clean:
+        keep = {MANIFEST_NAME} | {
+            built_name + suffix for built_name in manifest.values() for suffix in ('', '.gz', '.br')
+        }
+        for dirpath, _, filenames in os.walk(out_dir):
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                if os.path.relpath(path, out_dir).replace(os.sep, '/') not in keep:
+                    os.unlink(path)
+
+    return built
+
+
+def load_manifest(app):
+    """Read the manifest of the last build into the app; returns the number of entries."""
+    path = os.path.join(asset_dir(app), MANIFEST_NAME)
+    manifest = {}
+    if os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            manifest = json.load(f)
+    app.extensions['asset_manifest'] = manifest
+    return len(manifest)
+
+
+def static_url(filename):
+    """
+    URL of a static file: its fingerprinted build when the manifest has
+    one, the plain static URL otherwise (development, or not built yet).
+    """
+    built_name = current_app.extensions.get('asset_manifest', {}).get(filename)
+    if built_name is None:
+        return url_for('static', filename=filename)
+    return url_for('pages.asset', filename=built_name)
+
+
+def send_asset(filename):
+    """Response for a built asset, precompressed when the client accepts it; cacheable forever."""
+    if os.path.splitext(filename)[1] not in EXTENSIONS:
+        abort(404)
+    directory = asset_dir()
+    mimetype = mimetypes.guess_type(filename)[0]
+
+    for encoding, suffix in ENCODINGS:
+        if request.accept_encodings[encoding] > 0 and os.path.isfile(os.path.join(directory, filename + suffix)):
+            response = send_from_directory(directory, filename + suffix, mimetype=mimetype)
+            response.headers['Content-Encoding'] = encoding
+            break
+    else:
+        response = send_from_directory(directory, filename, mimetype=mimetype)
+
+    response.headers['Cache-Control'] = IMMUTABLE
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+def init_app(app):
+    """Load the asset manifest (when USE_BUILT_ASSETS is set) and install static_url()."""
+    if app.config.get('USE_BUILT_ASSETS'):
+        load_manifest(app)
+    app.jinja_env.globals.update(static_url=static_url)
@@ -0,0 +1,230 @@
+import hashlib
+import os
+import re
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from io import BytesIO
+from flask import abort, current_app, send_from_directory, url_for
+from markupsafe import Markup
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from .models import db, User, UserAvatar
+from .posters import IMMUTABLE, write_atomic
+
+# Pillow is imported inside the functions that need it, like in posters.py
+
+# Side lengths of the square thumbnails, in pixels
+SIZES = (64, 128, 256)
+WEBP_OPTIONS = {'quality': 85, 'method': 6}
+
+# Upload limits: file size (the AVATAR_MAX_BYTES setting) and decoded pixels
+MAX_UPLOAD_BYTES = 5 * 1024 * 1024
+MAX_PIXELS = 40_000_000
+ALLOWED_FORMATS = {'JPEG', 'PNG', 'WEBP', 'GIF'}
+
+# Bytes copied at a time when saving an upload
+CHUNK_SIZE = 64 * 1024
+
+# Background threads that build the thumbnails (the AVATAR_WORKERS setting)
+DEFAULT_WORKERS = 2
+
+_HASH_RE = re.compile(r'[0-9a-f]{64}')
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+class AvatarError(ValueError):
+    """An upload that can't be used as a profile picture; the message is shown to the user."""
+
+
+def avatar_dir():
+    """Root of the avatar store (the AVATAR_DIR setting)."""
+    return current_app.config['AVATAR_DIR']
+
+
+def _entry_dir(root, content_hash):
+    return os.path.join(root, content_hash[:2], content_hash)
+
+
+def save_upload(upload, max_bytes):
+    """
+    Stream an uploaded file into the store's incoming/ directory, hashing
+    it on the way. Returns (path, content_hash).
+    """
+    incoming = os.path.join(avatar_dir(), 'incoming')
+    os.makedirs(incoming, exist_ok=True)
+    fd, path = tempfile.mkstemp(dir=incoming)
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            while True:
+                chunk = upload.stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise AvatarError(f"Pictures can be at most {max_bytes // (1024 * 1024)} MB.")
+                digest.update(chunk)
+                f.write(chunk)
+        if size == 0:
+            raise AvatarError("The uploaded file is empty.")
+    except BaseException:
+        os.unlink(path)
+        raise
+    return path, digest.hexdigest()
+
+
+def check_image(path):
+    """Reject files that aren't supported images, reading only their header."""
+    from PIL import Image, UnidentifiedImageError
+
+    try:
+        with Image.open(path) as image:
+            image_format, (width, height) = image.format, image.size
+    except (UnidentifiedImageError, OSError):
+        raise AvatarError("The uploaded file is not an image.")
+    if image_format not in ALLOWED_FORMATS:
+        raise AvatarError("Please upload a JPEG, PNG, WebP or GIF picture.")
+    if width * height > MAX_PIXELS:
+        raise AvatarError("The picture's dimensions are too large.")
+
+
+def build_thumbnails(path, content_hash, root):
+    """
+    Decode the image at `path` once and write a center-cropped square WebP
+    of every size under its content hash. Metadata (EXIF, ICC, XMP) is not
+    copied; the EXIF orientation is applied to the pixels first.
+    """
+    from PIL import Image, ImageOps
+
+    entry = _entry_dir(root, content_hash)
+    paths = {size: os.path.join(entry, f'{size}.webp') for size in SIZES}
+    if all(os.path.exists(target) for target in paths.values()):
+        return
+
+    with Image.open(path) as image:
+        # Let the JPEG decoder scale down large photos while decoding
+        image.draft('RGB', (SIZES[-1], SIZES[-1]))
+        image = ImageOps.exif_transpose(image)
+        has_alpha = image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info
+        image = image.convert('RGBA' if has_alpha else 'RGB')
+
+        side = min(image.size)
+        square = ImageOps.fit(image, (side, side), Image.LANCZOS)
+        square.info = {}
+
+        for size, target in paths.items():
+            # Never upscale; smaller pictures get a same-size copy
+            thumbnail = square if size >= side else square.resize((size, size), Image.LANCZOS)
+            buffer = BytesIO()
+            thumbnail.save(buffer, 'WEBP', **WEBP_OPTIONS)
+            write_atomic(target, buffer.getvalue())
+
+
+def set_avatar(user_id, content_hash):
+    """Point a user's profile picture at a processed image."""
+    now = datetime.utcnow()
+    stmt = sqlite_insert(UserAvatar.__table__).values(user_id=user_id, content_hash=content_hash, updated_at=now)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[UserAvatar.user_id],
+        set_={'content_hash': content_hash, 'updated_at': now}
+    )
+    db.session.execute(stmt)
+    db.session.commit()
+
+
+def process_avatar(app, user_id, path, content_hash):
+    """Build the thumbnails of a saved upload and switch the user to them; runs in a worker thread."""
+    try:
+        with app.app_context():
+            build_thumbnails(path, content_hash, avatar_dir())
+            set_avatar(user_id, content_hash)
+    except Exception as e:
+        print(f"Error processing profile picture of user {user_id}: {str(e)}")
+    finally:
+        if os.path.exists(path):
+            os.unlink(path)
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            workers = current_app.config.get('AVATAR_WORKERS', DEFAULT_WORKERS)
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='avatar')
+        return _executor
+
+
+def shutdown_workers():
+    """Wait for the queued profile pictures and stop the worker threads (for scripts)."""
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=True)
+
+
+def submit_avatar(user_id, upload):
+    """
+    Save an uploaded profile picture and queue it for processing. Only the
+    copy to disk and a header check happen on the request thread; raises
+    AvatarError for unusable uploads. Returns the processing Future.
+    """
+    path, content_hash = save_upload(upload, current_app.config.get('AVATAR_MAX_BYTES', MAX_UPLOAD_BYTES))
+    try:
+        check_image(path)
+    except AvatarError:
+        os.unlink(path)
+        raise
+    app = current_app._get_current_object()
+    return _get_executor().submit(process_avatar, app, user_id, path, content_hash)
+
+
+def import_profile_pics(source_dir):
+    """
+    Process pictures named <user id>_<anything> from `source_dir`, as the
+    old upload form stored them. Returns (imported, skipped) counts.
+    """
+    imported = skipped = 0
+    user_ids = {user_id for user_id, in db.session.query(User.id)}
+    for name in sorted(os.listdir(source_dir)):
+        prefix = name.split('_', 1)[0]
+        path = os.path.join(source_dir, name)
+        if not prefix.isdigit() or int(prefix) not in user_ids or not os.path.isfile(path):
+            skipped += 1
+            continue
+        with open(path, 'rb') as f:
+            content_hash = hashlib.sha256(f.read()).hexdigest()
+        try:
+            check_image(path)
+        except AvatarError:
+            skipped += 1
+            continue
+        build_thumbnails(path, content_hash, avatar_dir())
+        set_avatar(int(prefix), content_hash)
+        imported += 1
+    return imported, skipped
+
+
+def send_avatar(content_hash, size):
+    """Response for one thumbnail, cacheable forever."""
+    if not _HASH_RE.fullmatch(content_hash) or size not in SIZES:
+        abort(404)
+    response = send_from_directory(_entry_dir(avatar_dir(), content_hash), f'{size}.webp')
+    response.headers['Cache-Control'] = IMMUTABLE
+    return response
+
+
+def avatar_attrs(user, size):
+    """The src/srcset/width/height attributes of a user's avatar displayed at `size` CSS pixels."""
+    content_hash = user.avatar.content_hash
+    one_x = min((s for s in SIZES if s >= size), default=SIZES[-1])
+    two_x = min((s for s in SIZES if s >= 2 * size), default=SIZES[-1])
+    src = url_for('pages.avatar', content_hash=content_hash, size=one_x)
+    if two_x == one_x:
+        return Markup('src="{}" width="{}" height="{}"').format(src, size, size)
+    srcset = f"{src} 1x, {url_for('pages.avatar', content_hash=content_hash, size=two_x)} 2x"
+    return Markup('src="{}" srcset="{}" width="{}" height="{}"').format(src, srcset, size, size)
@@ -0,0 +1,131 @@
+import threading
+from flask import current_app
+from sqlalchemy.orm import contains_eager, joinedload
+from .models import db, Movie, Genre, MovieStats, movie_genres
+from .pagination import keyset_paginate
+from .http_cache import catalog_content_version
+
+# Listing order shared by the catalog pages: best rated first, ties by id
+RATING_KEYS = [(Movie.rating, True), (Movie.id, False)]
+
+# Shelf layouts (per_genre, genre_ids) kept per process
+MAX_SHELF_LAYOUTS = 16
+
+# Movie IDs bound into one query
+MAX_IDS_PER_QUERY = 900
+
+_shelves_lock = threading.Lock()
+
+
+def _rank_shelves(per_genre, genre_ids):
+    """[(genre_id, movie_id)] of the top `per_genre` movies of every genre, in rank order."""
+    # Rank the movies of each genre by rating (ties broken by id)
+    rank = db.func.row_number().over(
+        partition_by=movie_genres.c.genre_id,
+        order_by=(Movie.rating.desc(), Movie.id)
+    ).label('rank')
+
+    ranked = db.session.query(
+        movie_genres.c.genre_id.label('genre_id'),
+        movie_genres.c.movie_id.label('movie_id'),
+        rank
+    ).join(Movie, Movie.id == movie_genres.c.movie_id)
+
+    if genre_ids is not None:
+        ranked = ranked.filter(movie_genres.c.genre_id.in_(genre_ids))
+
+    ranked = ranked.subquery()
+    return db.session.query(ranked.c.genre_id, ranked.c.movie_id)\
+        .filter(ranked.c.rank <= per_genre)\
+        .order_by(ranked.c.genre_id, ranked.c.rank)\
+        .all()
+
+
+def _shelf_ids(per_genre, genre_ids):
+    """
+    _rank_shelves() for the current catalog version. Ranking reads every
+    movie of every genre, so it only runs again after the catalog itself
+    changed (counter changes don't affect the ranking).
+    """
+    version = catalog_content_version()
+    key = (per_genre, tuple(sorted(genre_ids)) if genre_ids is not None else None)
+    shelves = current_app.extensions.setdefault('genre_shelves', {})
+    cached = shelves.get(key)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+
+    ids = _rank_shelves(per_genre, genre_ids)
+    with _shelves_lock:
+        if len(shelves) >= MAX_SHELF_LAYOUTS:
+            shelves.clear()
+        shelves[key] = (version, ids)
+    return ids
+
+
+def top_movies_by_genre(per_genre=5, genre_ids=None):
+    """
+    Return an ordered dict of {genre: [movies]} holding the top rated
+    movies of every genre.
+
+    Which movies make each shelf is ranked with a single windowed query
+    and kept until the catalog changes; each call then loads
+    only those movies, together with their stats, so the cost depends on
+    the number of shelves rather than the size of the catalog.
+    """
+    ids = _shelf_ids(per_genre, genre_ids)
+    if not ids:
+        return {}
+    position = {pair: index for index, pair in enumerate(ids)}
+
+    # Looked up by movie (primary key); a movie's other genres are dropped below
+    movie_ids = sorted({movie_id for _, movie_id in ids})
+    rows = []
+    for start in range(0, len(movie_ids), MAX_IDS_PER_QUERY):
+        rows += db.session.query(Genre, Movie)\
+            .join(movie_genres, movie_genres.c.genre_id == Genre.id)\
+            .join(Movie, Movie.id == movie_genres.c.movie_id)\
+            .outerjoin(MovieStats, MovieStats.movie_id == Movie.id)\
+            .options(contains_eager(Movie.stats))\
+            .filter(Movie.id.in_(movie_ids[start:start + MAX_IDS_PER_QUERY]))\
+            .all()
+    rows = [row for row in rows if (row[0].id, row[1].id) in position]
+    rows.sort(key=lambda row: (row[0].name, position[row[0].id, row[1].id]))
+
+    movies_by_genre = {}
+    for genre, movie in rows:
+        movies_by_genre.setdefault(genre, []).append(movie)
+
+    return movies_by_genre
+
+
+def genre_movies_page(genre_id, cursor=None, per_page=24):
+    """One keyset page of the movies in a genre, best rated first."""
+    movies = Movie.query\
+        .join(movie_genres, movie_genres.c.movie_id == Movie.id)\
+        .filter(movie_genres.c.genre_id == genre_id)\
+        .options(joinedload(Movie.stats))
+
+    return keyset_paginate(movies, RATING_KEYS, cursor=cursor, per_page=per_page)
+
+
+def top_movies_page(cursor=None, per_page=50):
+    """One keyset page of all rated movies, best rated first."""
+    movies = Movie.query\
+        .options(joinedload(Movie.stats))\
+        .filter(Movie.rating.isnot(None))
+
+    return keyset_paginate(movies, RATING_KEYS, cursor=cursor, per_page=per_page)
+
+
+def serialize_movie(movie):
+    """JSON representation of a movie used by the listing APIs."""
+    return {
+        'id': movie.id,
+        'title': movie.title,
+        'release_year': movie.release_year,
+        'rating': movie.rating,
+        'certification': movie.certification,
+        'runtime_minutes': movie.runtime_minutes,
+        'poster_url': movie.poster_url,
+        'watchlist_count': movie.stats.watchlist_count if movie.stats else 0
+    }
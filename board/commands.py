@@ -0,0 +1,197 @@
+import time
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from .search import rebuild_search_index
+from .stats import reconcile_user_stats, reconcile_movie_stats
+from .similarity import build_similarity_index, update_similarity_index
+from .query_plans import ROUTES, check_query_plans
+from .startup import precompile_templates
+from .posters import cache_posters, poster_dir
+from .avatars import import_profile_pics, avatar_dir
+from .assets import build_assets, load_manifest, asset_dir
+from .importer import import_movies, FORMATS, DEFAULT_BATCH_SIZE
+from .export import library_export_rows, encode_rows, ALL_USERS_FIELDS, EXPORT_FORMATS
+
+
+@click.command('rebuild-search-index')
+def rebuild_search_index_command():
+    """Rebuild the full-text search index from the movies table."""
+    start = time.perf_counter()
+    count = rebuild_search_index()
+    elapsed = time.perf_counter() - start
+    click.echo(f"Indexed {count} movies in {elapsed:.2f}s")
+
+
+def _report(label, result, elapsed, dry_run):
+    action = 'Would repair' if dry_run else 'Repaired'
+    click.echo(
+        f"Checked {result.checked} {label} in {elapsed:.2f}s. "
+        f"{action} {len(result.repaired)} rows ({result.missing} missing), "
+        f"total drift {result.drift}."
+    )
+
+
+@click.command('reconcile-user-stats')
+@click.option('--dry-run', is_flag=True, help='Report drift without writing anything.')
+def reconcile_user_stats_command(dry_run):
+    """Build or repair the per-user library counters (user_stats)."""
+    start = time.perf_counter()
+    result = reconcile_user_stats(dry_run=dry_run)
+    _report('users', result, time.perf_counter() - start, dry_run)
+
+
+@click.command('reconcile-movie-stats')
+@click.option('--dry-run', is_flag=True, help='Report drift without writing anything.')
+def reconcile_movie_stats_command(dry_run):
+    """Recompute the watchlist/favorites/watched counters of movie_stats."""
+    start = time.perf_counter()
+    result = reconcile_movie_stats(dry_run=dry_run)
+    _report('movies', result, time.perf_counter() - start, dry_run)
+
+
+@click.command('build-similar-movies')
+@click.option('--full', is_flag=True, help='Recompute every movie instead of only the changed ones.')
+def build_similar_movies_command(full):
+    """Build or incrementally update the similar-movies index."""
+    start = time.perf_counter()
+    count = build_similarity_index() if full else update_similarity_index()
+    elapsed = time.perf_counter() - start
+    click.echo(f"Recomputed neighbours of {count} movies in {elapsed:.2f}s")
+
+
+@click.command('check-query-plans')
+@click.option('--user', 'user_id', type=int, help='Fetch the pages signed in as this user ID.')
+@click.argument('urls', nargs=-1)
+@with_appcontext
+def check_query_plans_command(user_id, urls):
+    """Fail if any query run by the given pages (default: the main routes) scans a whole table."""
+    problems = check_query_plans(current_app, urls or ROUTES, user_id=user_id)
+    for problem in problems:
+        click.echo(f"{problem.url}: {problem.detail}\n    {' '.join(problem.statement.split())}")
+    if problems:
+        raise click.ClickException(f"{len(problems)} queries scan a whole table")
+    click.echo(f"Checked {len(urls or ROUTES)} pages, no full table scans")
+
+
+@click.command('compile-templates')
+@with_appcontext
+def compile_templates_command():
+    """Compile every template into the on-disk bytecode cache (production mode)."""
+    if not current_app.config.get('TEMPLATE_CACHE_DIR'):
+        raise click.ClickException("The template cache is only used in production mode (APP_ENV=production)")
+    start = time.perf_counter()
+    count = precompile_templates(current_app)
+    elapsed = time.perf_counter() - start
+    click.echo(f"Compiled {count} templates into {current_app.config['TEMPLATE_CACHE_DIR']} in {elapsed:.2f}s")
+
+
+@click.command('cache-posters')
+@click.option('--refresh', is_flag=True, help='Fetch every poster again, not only the uncached ones.')
+@click.option('--from-dir', 'source_dir', type=click.Path(exists=True, file_okay=False),
+              help='Read posters from <movie id>.jpg files here instead of downloading them.')
+@click.option('--workers', type=int, default=8, show_default=True, help='Posters fetched in parallel.')
+@click.option('--limit', type=int, help='Stop after this many posters.')
+@with_appcontext
+def cache_posters_command(refresh, source_dir, workers, limit):
+    """Store movie posters locally as resized WebP/JPEG variants."""
+    start = time.perf_counter()
+    result = cache_posters(refresh=refresh, source_dir=source_dir, workers=workers, limit=limit)
+    elapsed = time.perf_counter() - start
+    for url, error in result.failed:
+        click.echo(f"Failed {url}: {error}")
+    click.echo(
+        f"Cached {result.cached} posters into {poster_dir()} in {elapsed:.2f}s "
+        f"({result.missing} missing, {len(result.failed)} failed)"
+    )
+
+
+@click.command('import-profile-pics')
+@click.argument('source_dir', type=click.Path(exists=True, file_okay=False), default='board/static/uploads/profile_pics')
+@with_appcontext
+def import_profile_pics_command(source_dir):
+    """Turn raw <user id>_*.png/jpg uploads into processed profile pictures."""
+    start = time.perf_counter()
+    imported, skipped = import_profile_pics(source_dir)
+    elapsed = time.perf_counter() - start
+    click.echo(f"Imported {imported} profile pictures into {avatar_dir()} in {elapsed:.2f}s ({skipped} skipped)")
+
+
+@click.command('build-assets')
+@click.option('--clean', is_flag=True, help='Remove the files of earlier builds.')
+@with_appcontext
+def build_assets_command(clean):
+    """Minify, fingerprint and precompress the stylesheets and scripts."""
+    start = time.perf_counter()
+    built = build_assets(current_app.static_folder, asset_dir(), clean=clean)
+    elapsed = time.perf_counter() - start
+    for name, (built_name, source_size, size) in built.items():
+        click.echo(f"{name} -> {built_name} ({source_size} -> {size} bytes)")
+    load_manifest(current_app)
+    click.echo(f"Built {len(built)} assets into {asset_dir()} in {elapsed:.2f}s")
+
+
+@click.command('import-movies')
+@click.argument('paths', nargs=-1, required=True, type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'file_format', type=click.Choice(FORMATS), help='File format (default: from the extension).')
+@click.option('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, show_default=True, help='Rows per transaction.')
+@click.option('--restart', is_flag=True, help='Import from the first row even if an earlier run got further.')
+@with_appcontext
+def import_movies_command(paths, file_format, batch_size, restart):
+    """Stream movies from CSV or JSONL files into the catalog (resumable)."""
+    def progress(rows_done, elapsed):
+        click.echo(f"  {rows_done} rows, {rows_done / elapsed:,.0f} rows/s", err=True)
+
+    for path in paths:
+        try:
+            result = import_movies(path, file_format=file_format, batch_size=batch_size,
+                                   restart=restart, progress=progress)
+        except ValueError as e:
+            raise click.ClickException(str(e))
+        for number, error in result.errors:
+            click.echo(f"{path}:{number}: skipped, {error}")
+        resumed = f", resumed after row {result.resumed_from}" if result.resumed_from else ""
+        rate = result.imported / result.elapsed if result.elapsed else 0
+        click.echo(
+            f"Imported {result.imported} movies from {path} in {result.elapsed:.2f}s "
+            f"({rate:,.0f} movies/s, {result.skipped} skipped, {result.new_genres} new genres{resumed})"
+        )
+    click.echo("Run `flask build-similar-movies` to index the new movies for recommendations")
+
+
+@click.command('export-libraries')
+@click.option('--format', 'export_format', type=click.Choice(list(EXPORT_FORMATS)), default='csv', show_default=True)
+@click.option('--output', '-o', type=click.File('w', encoding='utf-8', lazy=True), default='-',
+              help='File to write (default: standard output).')
+@with_appcontext
+def export_libraries_command(export_format, output):
+    """Dump the lists of every user, one row per user and movie."""
+    start = time.perf_counter()
+    count = 0
+
+    def counted(rows):
+        nonlocal count
+        for row in rows:
+            count += 1
+            yield row
+
+    for chunk in encode_rows(counted(library_export_rows()), ALL_USERS_FIELDS, export_format):
+        output.write(chunk)
+    output.flush()
+    elapsed = time.perf_counter() - start
+    click.echo(f"Exported {count} library entries in {elapsed:.2f}s", err=True)
+
+
+def init_app(app):
+    """Register the CLI commands with the application."""
+    app.cli.add_command(rebuild_search_index_command)
+    app.cli.add_command(reconcile_user_stats_command)
+    app.cli.add_command(reconcile_movie_stats_command)
+    app.cli.add_command(build_similar_movies_command)
+    app.cli.add_command(check_query_plans_command)
+    app.cli.add_command(compile_templates_command)
+    app.cli.add_command(cache_posters_command)
+    app.cli.add_command(import_profile_pics_command)
+    app.cli.add_command(build_assets_command)
+    app.cli.add_command(import_movies_command)
+    app.cli.add_command(export_libraries_command)
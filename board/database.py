@@ -0,0 +1,109 @@
+import os
+import re
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from .models import db
+
+# Connection settings applied to every new SQLite connection. Each one can
+# be overridden with an environment variable named SQLITE_<PRAGMA>, e.g.
+# SQLITE_SYNCHRONOUS=FULL.
+SQLITE_PRAGMAS = {
+    # Readers don't block the writer and commits append to the WAL instead
+    # of rewriting the journal
+    'journal_mode': 'WAL',
+    # In WAL mode NORMAL only syncs at checkpoints; still safe against corruption
+    'synchronous': 'NORMAL',
+    # Wait up to 5s for a lock instead of failing with "database is locked"
+    'busy_timeout': 5000,
+    # Negative values are KiB, i.e. a 64 MB page cache per connection
+    'cache_size': -64000,
+    # Memory-map up to 256 MB of the database file
+    'mmap_size': 268435456,
+    # Keep temporary tables and sort spills in memory
+    'temp_store': 'MEMORY',
+}
+
+# Connection pool settings, overridable with the matching environment variable
+POOL_OPTIONS = {
+    'pool_size': ('DB_POOL_SIZE', 10),
+    'max_overflow': ('DB_MAX_OVERFLOW', 20),
+    'pool_timeout': ('DB_POOL_TIMEOUT', 30),
+    'pool_recycle': ('DB_POOL_RECYCLE', 1800),
+}
+
+
+def default_database_uri():
+    """The bundled SQLite database in instance/."""
+    basedir = os.path.abspath(os.path.dirname(os.path.dirname(__file__)))
+    return 'sqlite:///' + os.path.join(basedir, 'instance/movielist.db')
+
+
+def _is_sqlite(uri):
+    return make_url(uri).get_backend_name() == 'sqlite'
+
+
+def _is_memory(uri):
+    return make_url(uri).database in (None, '', ':memory:')
+
+
+def sqlite_pragmas(environ=os.environ):
+    """Return the pragmas to apply, with environment overrides; raises ValueError on bad values."""
+    pragmas = {}
+    for name, default in SQLITE_PRAGMAS.items():
+        value = str(environ.get(f'SQLITE_{name.upper()}', default))
+        # Pragma values can't be bound as parameters, so only allow plain words and numbers
+        if not re.fullmatch(r'-?\w+', value):
+            raise ValueError(f"Invalid value for SQLITE_{name.upper()}: {value!r}")
+        pragmas[name] = value
+    return pragmas
+
+
+def engine_options(uri, environ=os.environ):
+    """Return the SQLAlchemy create_engine() options for `uri`."""
+    options = {
+        'pool_pre_ping': environ.get('DB_POOL_PRE_PING', '1').lower() not in ('0', 'false', 'no'),
+    }
+
+    # In-memory SQLite uses a single shared connection, so there is no pool to size
+    if not (_is_sqlite(uri) and _is_memory(uri)):
+        for option, (variable, default) in POOL_OPTIONS.items():
+            options[option] = int(environ.get(variable, default))
+
+    if _is_sqlite(uri):
+        # The driver's own lock timeout (seconds) should match busy_timeout (ms)
+        busy_timeout = int(sqlite_pragmas(environ)['busy_timeout'])
+        options['connect_args'] = {'timeout': busy_timeout / 1000}
+
+    return options
+
+
+def apply_sqlite_pragmas(engine, pragmas):
+    """Run `pragmas` on every new connection of `engine`."""
+    @event.listens_for(engine, 'connect')
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f'PRAGMA {name} = {value}')
+        finally:
+            cursor.close()
+
+
+def init_app(app):
+    """
+    Configure the database from the environment and initialize Flask-SQLAlchemy.
+
+    DATABASE_URL selects the database (default: instance/movielist.db);
+    the DB_POOL_* and SQLITE_* variables tune the pool and the pragmas.
+    Values already set in app.config take precedence.
+    """
+    uri = app.config.setdefault('SQLALCHEMY_DATABASE_URI', os.environ.get('DATABASE_URL') or default_database_uri())
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(uri))
+    if _is_sqlite(uri):
+        app.config.setdefault('SQLITE_PRAGMAS', sqlite_pragmas())
+
+    db.init_app(app)
+
+    if _is_sqlite(uri):
+        with app.app_context():
+            apply_sqlite_pragmas(db.engine, app.config['SQLITE_PRAGMAS'])
@@ -0,0 +1,104 @@
+import csv
+import json
+from datetime import datetime
+from sqlalchemy import and_, select, union
+from .models import db, User, Movie, watchlist, favorites, watched
+from .library import LISTS
+from .streaming import buffered
+
+# Output formats: name -> (mimetype, file extension)
+EXPORT_FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+}
+
+# Columns of a user's export, and of the export of every user
+FIELDS = ('movie_id', 'title', 'release_year', 'in_watchlist', 'is_watched', 'watched_at',
+          'is_favorite', 'favorited_at')
+ALL_USERS_FIELDS = ('user_id', 'username') + FIELDS
+
+# Rows fetched per round trip; the cursor is read as the response is sent
+EXPORT_BATCH_SIZE = 1000
+
+
+def library_export_rows(user_id=None):
+    """
+    Yield one row per movie in a user's lists (every user's when `user_id`
+    is None) with the list flags and timestamps, as mappings keyed by
+    ALL_USERS_FIELDS. Rows come straight from the database cursor,
+    EXPORT_BATCH_SIZE at a time, so memory stays flat however many there are.
+    """
+    selects = []
+    for _, table in LISTS:
+        query = select(table.c.user_id, table.c.movie_id)
+        if user_id is not None:
+            query = query.where(table.c.user_id == user_id)
+        selects.append(query)
+    members = union(*selects).subquery('members')
+
+    stmt = select(
+            members.c.user_id,
+            User.username,
+            Movie.id.label('movie_id'),
+            Movie.title,
+            Movie.release_year,
+            watchlist.c.movie_id.isnot(None).label('in_watchlist'),
+            watched.c.movie_id.isnot(None).label('is_watched'),
+            watched.c.watched_at,
+            favorites.c.movie_id.isnot(None).label('is_favorite'),
+            favorites.c.added_at.label('favorited_at')
+        )\
+        .select_from(members)\
+        .join(User, User.id == members.c.user_id)\
+        .join(Movie, Movie.id == members.c.movie_id)\
+        .outerjoin(watchlist, and_(watchlist.c.user_id == members.c.user_id, watchlist.c.movie_id == Movie.id))\
+        .outerjoin(watched, and_(watched.c.user_id == members.c.user_id, watched.c.movie_id == Movie.id))\
+        .outerjoin(favorites, and_(favorites.c.user_id == members.c.user_id, favorites.c.movie_id == Movie.id))
+
+    # A single user's library reads best by title; the full dump keeps the
+    # (user, movie) order the UNION already produces, so SQLite needn't sort it
+    if user_id is not None:
+        stmt = stmt.order_by(Movie.title, Movie.id)
+    else:
+        stmt = stmt.order_by(members.c.user_id, members.c.movie_id)
+
+    for row in db.session.execute(stmt.execution_options(yield_per=EXPORT_BATCH_SIZE)):
+        yield row._mapping
+
+
+def _csv_value(value):
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return '' if value is None else value
+
+
+class _Echo:
+    """File-like object whose write() hands the text back, so csv.writer formats one row at a time."""
+
+    def write(self, value):
+        return value
+
+
+def encode_rows(rows, fields, export_format):
+    """Yield `rows` encoded as CSV (with a header) or NDJSON, in chunks of about 8KB."""
+    def lines():
+        if export_format == 'csv':
+            writer = csv.writer(_Echo())
+            yield writer.writerow(fields)
+            for row in rows:
+                yield writer.writerow([_csv_value(row[name]) for name in fields])
+        else:
+            for row in rows:
+                yield json.dumps({name: row[name] for name in fields}, default=datetime.isoformat) + '\n'
+
+    return buffered(lines())
+
+
+def export_library(user_id=None, export_format='csv'):
+    """Encoded chunks of a user's library export, or of every user's when `user_id` is None."""
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format {export_format!r}")
+    fields = FIELDS if user_id is not None else ALL_USERS_FIELDS
+    return encode_rows(library_export_rows(user_id), fields, export_format)
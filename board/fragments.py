@@ -0,0 +1,136 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app
+from flask_login import current_user
+from jinja2 import nodes
+from jinja2.ext import Extension
+from markupsafe import Markup
+from .library import current_library
+from .posters import poster_key
+
+# Placeholder left in cached HTML for per-user content, filled on every render
+_SLOT = re.compile(r'<!--slot:(\w+):(\d+)-->')
+
+
+class FragmentCache:
+    """
+    Bounded LRU cache of rendered template fragments. Entries expire
+    `ttl` seconds after they were stored; hits, misses and evictions are
+    counted for stats().
+    """
+
+    def __init__(self, max_entries=2048, ttl=300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() - entry[1] > self.ttl:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+
+def fragment_slot(name, movie_id):
+    """Mark where the per-user `_<name>.html` partial for a movie goes inside a cached fragment."""
+    return Markup(f'<!--slot:{name}:{int(movie_id)}-->')
+
+
+def fill_slots(html):
+    """Replace the slots in `html` with their partials rendered for the current request."""
+    if '<!--slot:' not in html:
+        return html
+
+    # Render the partials directly with just what they need; render_template()
+    # would run every context processor once per slot
+    context = {'current_user': current_user, 'library': current_library()}
+    templates = {}
+
+    def render(match):
+        name = match.group(1)
+        if name not in templates:
+            templates[name] = current_app.jinja_env.get_template(f'_{name}.html')
+        return templates[name].render(context, movie_id=int(match.group(2)))
+
+    return _SLOT.sub(render, html)
+
+
+def fragment_key(movies):
+    """A cache key part that changes whenever any of `movies` (or their order or posters) changes."""
+    return tuple((movie.id, movie.updated_at, poster_key(movie)) for movie in movies)
+
+
+class FragmentCacheExtension(Extension):
+    """
+    {% cache 'name', key, ... %}...{% endcache %} renders the body once
+    per key and serves it from the app's FragmentCache afterwards. Keep
+    per-user content out of the body, or leave fragment_slot() markers
+    that are filled on every render.
+    """
+    tags = {'cache'}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        args = [parser.parse_expression()]
+        while parser.stream.skip_if('comma'):
+            args.append(parser.parse_expression())
+        body = parser.parse_statements(['name:endcache'], drop_needle=True)
+        return nodes.CallBlock(
+            self.call_method('_cache_support', [nodes.List(args)]), [], [], body
+        ).set_lineno(lineno)
+
+    def _cache_support(self, key, caller):
+        cache = current_app.extensions.get('fragment_cache')
+        key = tuple(key)
+        html = cache.get(key) if cache is not None else None
+        if html is None:
+            html = str(caller())
+            if cache is not None:
+                cache.set(key, html)
+        return Markup(fill_slots(html))
+
+
+def init_app(app):
+    """Install the {% cache %} tag and the app's fragment cache (FRAGMENT_CACHE_* settings)."""
+    if app.config.get('FRAGMENT_CACHE_ENABLED', True):
+        app.extensions['fragment_cache'] = FragmentCache(
+            max_entries=app.config.get('FRAGMENT_CACHE_SIZE', 2048),
+            ttl=app.config.get('FRAGMENT_CACHE_TTL', 300)
+        )
+    app.jinja_env.add_extension(FragmentCacheExtension)
+    app.jinja_env.globals.update(fragment_slot=fragment_slot, fragment_key=fragment_key)
@@ -0,0 +1,199 @@
+import threading
+import time
+from datetime import datetime
+from functools import wraps
+from flask import current_app, make_response, request, session
+from flask_login import current_user
+from sqlalchemy import event
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+from werkzeug.http import is_resource_modified
+from .models import db, Movie, Genre, MovieStats, MovieSimilarity, PosterImage, CatalogVersion, movie_genres
+
+# Tables whose changes alter the catalog pages
+CATALOG_TABLES = {
+    Movie.__tablename__,
+    Genre.__tablename__,
+    MovieSimilarity.__tablename__,
+    PosterImage.__tablename__,
+    movie_genres.name,
+}
+CATALOG_MODELS = (Movie, Genre, MovieSimilarity, PosterImage)
+
+# Counters shown on the catalog pages. Every library change updates them,
+# so they bump the version at most once per COUNTER_BUMP_INTERVAL seconds
+# per process: anonymous pages keep their ETags between toggles, and their
+# counts lag by up to that long. A change that falls inside the interval
+# is published by the process's next commit after it.
+COUNTER_TABLES = {MovieStats.__tablename__}
+COUNTER_MODELS = (MovieStats,)
+COUNTER_BUMP_INTERVAL = 300
+
+# Seconds a process trusts its cached catalog version. Changes committed by
+# this process are seen immediately, those of other workers within this delay.
+VERSION_MAX_AGE = 5
+
+# Default seconds a shared cache (reverse proxy) may serve a catalog page
+# without revalidating; override with the CATALOG_CACHE_MAX_AGE setting
+SHARED_MAX_AGE = 60
+
+# Rows of the catalog_version table: one bumped by catalog changes, one
+# by counter changes. Pages are versioned by both, data derived from the
+# catalog alone (e.g. the home shelves) by the first.
+CATALOG_ROW = 1
+COUNTERS_ROW = 2
+
+_lock = threading.Lock()
+_cached = None  # ({row id: version}, updated_at, loaded_at)
+_counters_bumped_at = None  # time.monotonic() of the last bump
+_counters_pending = False  # counter changes not published yet
+
+
+def _versions():
+    global _cached
+    cached = _cached
+    if cached is not None and time.monotonic() - cached[2] < VERSION_MAX_AGE:
+        return cached[0], cached[1]
+
+    rows = db.session.query(CatalogVersion.id, CatalogVersion.version, CatalogVersion.updated_at).all()
+    versions = {row_id: version for row_id, version, _ in rows}
+    updated_at = max((updated_at for _, _, updated_at in rows), default=None)
+    with _lock:
+        _cached = (versions, updated_at, time.monotonic())
+    return versions, updated_at
+
+
+def catalog_version():
+    """Return the current (version, updated_at) of the catalog, counters included."""
+    versions, updated_at = _versions()
+    return sum(versions.values()), updated_at
+
+
+def catalog_content_version():
+    """Return the version of the catalog itself, which counter changes leave alone."""
+    return _versions()[0].get(CATALOG_ROW, 0)
+
+
+def bump_catalog_version(row=CATALOG_ROW):
+    """Increment a catalog version row in the current transaction."""
+    now = datetime.utcnow()
+    stmt = sqlite_insert(CatalogVersion.__table__).values(id=row, version=1, updated_at=now)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[CatalogVersion.id],
+        set_={'version': CatalogVersion.__table__.c.version + 1, 'updated_at': now}
+    )
+    db.session.execute(stmt)
+
+
+@event.listens_for(Session, 'after_flush')
+def _note_catalog_flush(session, flush_context):
+    # new/dirty/deleted still describe what was just flushed. Adding a movie
+    # to a user's list only changes collections, so dirty objects count
+    # when a column changed.
+    dirty = [obj for obj in session.dirty if session.is_modified(obj, include_collections=False)]
+    for obj in list(session.new) + dirty + list(session.deleted):
+        if isinstance(obj, CATALOG_MODELS):
+            session.info['catalog_changed'] = True
+            return
+        if isinstance(obj, COUNTER_MODELS):
+            session.info['counters_changed'] = True
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _note_catalog_statement(orm_execute_state):
+    # Bulk statements (counter upserts, index rebuilds) bypass the flush
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        table = getattr(orm_execute_state.statement, 'table', None)
+        name = getattr(table, 'name', None)
+        if name in CATALOG_TABLES:
+            orm_execute_state.session.info['catalog_changed'] = True
+        elif name in COUNTER_TABLES:
+            orm_execute_state.session.info['counters_changed'] = True
+
+
+def _counters_due():
+    return _counters_bumped_at is None or time.monotonic() - _counters_bumped_at >= COUNTER_BUMP_INTERVAL
+
+
+@event.listens_for(Session, 'before_commit')
+def _bump_on_commit(session):
+    global _counters_pending
+    session.flush()
+    if session.info.pop('counters_changed', False):
+        _counters_pending = True
+    if session.info.pop('catalog_changed', False):
+        bump_catalog_version(CATALOG_ROW)
+        session.info['catalog_bumped'] = True
+    elif _counters_pending and _counters_due():
+        bump_catalog_version(COUNTERS_ROW)
+        session.info['catalog_bumped'] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def _forget_cached_version(session):
+    global _cached, _counters_bumped_at, _counters_pending
+    if session.info.pop('catalog_bumped', False):
+        with _lock:
+            _cached = None
+            # The bump published every counter change made so far
+            _counters_bumped_at = time.monotonic()
+            _counters_pending = False
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_catalog_changes(session):
+    session.info.pop('catalog_changed', None)
+    session.info.pop('counters_changed', None)
+    session.info.pop('catalog_bumped', None)
+
+
+def _personalized():
+    """Whether the response may differ from what any anonymous visitor gets."""
+    return current_user.is_authenticated or '_flashes' in session
+
+
+def catalog_cache(view):
+    """
+    HTTP caching for catalog pages that only depend on the catalog.
+
+    Anonymous visitors get a weak ETag and Last-Modified derived from the
+    catalog version, and a matching If-None-Match / If-Modified-Since is
+    answered with 304 before the view runs any query. Responses are
+    public for shared caches, with Vary: Cookie so signed-in users (whose
+    pages show their own lists) are never served a cached copy; their
+    responses, and those that set a session cookie, are marked private
+    instead.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if request.method not in ('GET', 'HEAD') or _personalized():
+            response = make_response(view(*args, **kwargs))
+            response.headers['Cache-Control'] = 'private, no-cache'
+            response.vary.add('Cookie')
+            return response
+
+        version, updated_at = catalog_version()
+        etag = f'catalog-{version}'
+
+        if not is_resource_modified(request.environ, etag=etag, last_modified=updated_at):
+            response = current_app.response_class(status=304)
+        else:
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+            # A view that wrote to the session answers with a Set-Cookie,
+            # which must not be stored and replayed to other visitors
+            if session.modified:
+                response.headers['Cache-Control'] = 'private, no-cache'
+                response.vary.add('Cookie')
+                return response
+
+        response.set_etag(etag, weak=True)
+        if updated_at is not None:
+            response.last_modified = updated_at
+        max_age = current_app.config.get('CATALOG_CACHE_MAX_AGE', SHARED_MAX_AGE)
+        response.headers['Cache-Control'] = f'public, max-age=0, s-maxage={max_age}'
+        response.vary.add('Cookie')
+        return response
+
+    return wrapper
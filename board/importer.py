@@ -0,0 +1,224 @@
+import csv
+import json
+import os
+import time
+from collections import namedtuple
+from datetime import datetime
+from itertools import islice
+from sqlalchemy import insert, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from .models import db, Movie, Genre, MovieStats, ImportCheckpoint, movie_genres
+
+# Rows written per transaction (and per checkpoint)
+DEFAULT_BATCH_SIZE = 5000
+
+FORMATS = ('csv', 'jsonl')
+
+# Accepted spellings of each column, in order of preference
+FIELD_ALIASES = {
+    'title': ('title', 'name'),
+    'release_year': ('release_year', 'year'),
+    'rating': ('rating', 'vote_average'),
+    'certification': ('certification', 'rated'),
+    'runtime_minutes': ('runtime_minutes', 'runtime'),
+    'poster_url': ('poster_url', 'poster'),
+    'overview': ('overview', 'plot', 'description'),
+    'genres': ('genres', 'genre'),
+}
+
+# Separators of the genre names in a CSV cell
+GENRE_SEPARATORS = ('|', ',', ';')
+
+# Outcome of import_movies(): `errors` holds the first few (row number, message) pairs
+ImportResult = namedtuple('ImportResult', ['imported', 'skipped', 'resumed_from', 'new_genres', 'errors', 'elapsed'])
+
+MAX_REPORTED_ERRORS = 20
+
+
+def detect_format(path):
+    """The format of a file from its extension ('csv' or 'jsonl')."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.csv':
+        return 'csv'
+    if extension in ('.jsonl', '.ndjson'):
+        return 'jsonl'
+    raise ValueError(f"Can't tell the format of {path}; pass --format")
+
+
+def read_records(path, file_format):
+    """Yield the records of a CSV or JSONL file as dicts, one at a time."""
+    with open(path, newline='', encoding='utf-8') as f:
+        if file_format == 'csv':
+            yield from csv.DictReader(f)
+        else:
+            for line in f:
+                line = line.strip()
+                # Blank and malformed lines still count as rows, so
+                # checkpoints (row numbers) stay valid
+                if not line:
+                    yield {}
+                    continue
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    yield None
+
+
+def _field(record, name):
+    for alias in FIELD_ALIASES[name]:
+        value = record.get(alias)
+        if value not in (None, ''):
+            return value
+    return None
+
+
+def _number(value, kind):
+    return None if value is None else kind(float(value) if kind is int else value)
+
+
+def parse_genres(value):
+    """Genre names of a record: a JSON list, or a CSV cell split on | , or ;"""
+    if value is None:
+        return []
+    if isinstance(value, str):
+        separator = next((s for s in GENRE_SEPARATORS if s in value), None)
+        value = value.split(separator) if separator else [value]
+    return [name.strip() for name in value if name and name.strip()]
+
+
+def parse_record(record):
+    """
+    Turn an input record into (movie row, genre names). Raises ValueError
+    for records without a title or year, or with malformed numbers.
+    """
+    if not isinstance(record, dict):
+        raise ValueError('malformed record')
+    title = _field(record, 'title')
+    if not title:
+        raise ValueError('missing title')
+    try:
+        release_year = _number(_field(record, 'release_year'), int)
+        rating = _number(_field(record, 'rating'), float)
+        runtime = _number(_field(record, 'runtime_minutes'), int)
+    except (TypeError, ValueError):
+        raise ValueError('malformed number')
+    if release_year is None:
+        raise ValueError('missing release year')
+
+    row = {
+        'title': str(title).strip()[:200],
+        'release_year': release_year,
+        'rating': rating,
+        'certification': _field(record, 'certification'),
+        'runtime_minutes': runtime,
+        'poster_url': _field(record, 'poster_url'),
+        'overview': _field(record, 'overview'),
+    }
+    return row, parse_genres(_field(record, 'genres'))
+
+
+class GenreMap:
+    """Genre name -> ID, loaded once and extended as new names appear."""
+
+    def __init__(self):
+        self.ids = dict(db.session.execute(select(Genre.name, Genre.id)).all())
+        self.created = 0
+
+    def resolve(self, names):
+        """IDs of `names`, creating the genres that don't exist yet."""
+        missing = sorted({name for name in names if name not in self.ids})
+        if missing:
+            stmt = sqlite_insert(Genre.__table__).on_conflict_do_nothing(index_elements=[Genre.name])
+            db.session.execute(stmt, [{'name': name} for name in missing])
+            self.ids.update(db.session.execute(select(Genre.name, Genre.id).where(Genre.name.in_(missing))).all())
+            self.created += len(missing)
+        return [self.ids[name] for name in names]
+
+
+def _checkpoint_key(path):
+    return os.path.abspath(path)
+
+
+def load_checkpoint(path):
+    """Rows of `path` already imported, or 0. Raises ValueError if the file changed since."""
+    checkpoint = db.session.get(ImportCheckpoint, _checkpoint_key(path))
+    if checkpoint is None:
+        return 0
+    if checkpoint.file_size > os.path.getsize(path):
+        raise ValueError(f"{path} is smaller than when it was last imported; pass --restart")
+    return checkpoint.rows_done
+
+
+def _save_checkpoint(path, rows_done):
+    stmt = sqlite_insert(ImportCheckpoint.__table__).values(
+        source=_checkpoint_key(path), rows_done=rows_done,
+        file_size=os.path.getsize(path), updated_at=datetime.utcnow()
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[ImportCheckpoint.source],
+        set_={name: stmt.excluded[name] for name in ('rows_done', 'file_size', 'updated_at')}
+    )
+    db.session.execute(stmt)
+
+
+def _write_batch(rows, genre_map, now):
+    """Insert one batch of (movie row, genre names): movies, genre links and stats rows."""
+    movie_rows = [{**row, 'created_at': now, 'updated_at': now} for row, _ in rows]
+    stmt = insert(Movie.__table__).returning(Movie.__table__.c.id, sort_by_parameter_order=True)
+    movie_ids = db.session.execute(stmt, movie_rows).scalars().all()
+
+    links = []
+    for movie_id, (_, names) in zip(movie_ids, rows):
+        for genre_id in set(genre_map.resolve(names)):
+            links.append({'movie_id': movie_id, 'genre_id': genre_id})
+    if links:
+        db.session.execute(movie_genres.insert(), links)
+
+    db.session.execute(insert(MovieStats.__table__), [{'movie_id': movie_id} for movie_id in movie_ids])
+
+
+def import_movies(path, file_format=None, batch_size=DEFAULT_BATCH_SIZE, restart=False, progress=None):
+    """
+    Stream the movies of a CSV or JSONL file into the catalog, `batch_size`
+    rows per transaction. Each transaction also records how many rows of
+    the file are done, so an interrupted import continues where it stopped
+    when run again (unless `restart`). `progress(rows_done, elapsed)` is
+    called after every batch.
+    """
+    file_format = file_format or detect_format(path)
+    start = time.perf_counter()
+    resumed_from = 0 if restart else load_checkpoint(path)
+
+    genre_map = GenreMap()
+    imported = skipped = 0
+    errors = []
+    rows_done = resumed_from
+    records = islice(read_records(path, file_format), resumed_from, None)
+
+    while True:
+        chunk = list(islice(records, batch_size))
+        if not chunk:
+            break
+
+        rows = []
+        for number, record in enumerate(chunk, start=rows_done + 1):
+            if record == {}:
+                continue
+            try:
+                rows.append(parse_record(record))
+            except ValueError as e:
+                skipped += 1
+                if len(errors) < MAX_REPORTED_ERRORS:
+                    errors.append((number, str(e)))
+
+        if rows:
+            _write_batch(rows, genre_map, datetime.utcnow())
+        rows_done += len(chunk)
+        _save_checkpoint(path, rows_done)
+        db.session.commit()
+
+        imported += len(rows)
+        if progress:
+            progress(rows_done, time.perf_counter() - start)
+
+    return ImportResult(imported, skipped, resumed_from, genre_map.created, errors, time.perf_counter() - start)
@@ -0,0 +1,318 @@
+from collections import namedtuple
+from flask import g
+from flask_login import current_user
+from sqlalchemy import and_, delete, insert, literal, select, union, union_all
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import joinedload
+from .models import db, Movie, MovieStats, UserStats, LibraryChange, watchlist, favorites, watched
+from .pagination import keyset_paginate
+from .catalog import serialize_movie
+
+# Maximum number of movie IDs bound into a single IN (...) clause
+MAX_IDS_PER_QUERY = 900
+
+# The three lists, in the order they appear in API payloads
+LISTS = (('watchlist', watchlist), ('favorites', favorites), ('watched', watched))
+
+# Counter column of each list in user_stats and movie_stats
+LIST_COUNTERS = {'watchlist': 'watchlist_count', 'favorites': 'favorites_count', 'watched': 'watched_count'}
+
+# Largest number of operations accepted by apply_library_batch()
+MAX_BATCH_SIZE = 500
+
+# Tabs of the library view: everything, or one list
+LIBRARY_TABS = ('all', 'watchlist', 'watched', 'favorites')
+
+# Sort orders of the library view, as keyset pagination keys
+LIBRARY_SORTS = {
+    'title': [(Movie.title, False), (Movie.id, False)],
+    'rating': [(Movie.rating, True), (Movie.id, False)],
+    'year': [(Movie.release_year, True), (Movie.id, False)],
+    'watched': [(watched.c.watched_at, True), (Movie.id, False)],
+    'favorited': [(favorites.c.added_at, True), (Movie.id, False)],
+}
+
+# A movie of the library view with the user's state for it
+LibraryEntry = namedtuple('LibraryEntry', ['movie', 'in_watchlist', 'is_watched', 'is_favorite',
+                                           'watched_at', 'favorited_at'])
+
+# Outcome of a batch: per-operation results, the user's counters, the
+# counters of the movies that changed, and the new library version
+BatchResult = namedtuple('BatchResult', ['results', 'counters', 'movie_counters', 'version'])
+
+
+def _movie_id(movie):
+    return movie if isinstance(movie, int) else movie.id
+
+
+def _membership_query(user_id, movie_ids=None):
+    """(list, movie_id) rows of all three lists of a user, optionally limited to `movie_ids`."""
+    selects = []
+    for name, table in LISTS:
+        query = select(literal(name).label('list'), table.c.movie_id).where(table.c.user_id == user_id)
+        if movie_ids is not None:
+            query = query.where(table.c.movie_id.in_(movie_ids))
+        selects.append(query)
+    return union_all(*selects)
+
+
+class LibraryMembership:
+    """
+    The current user's watchlist / favorites / watched membership for the
+    movies shown in a request, held as sets for O(1) lookups in views and
+    templates.
+    """
+
+    def __init__(self):
+        self.loaded = set()
+        self.watchlist = set()
+        self.favorites = set()
+        self.watched = set()
+
+    def load(self, user_id, movie_ids):
+        """Fetch membership of all three lists for `movie_ids` in a single query."""
+        missing = sorted(set(movie_ids) - self.loaded)
+
+        for start in range(0, len(missing), MAX_IDS_PER_QUERY):
+            chunk = missing[start:start + MAX_IDS_PER_QUERY]
+            for list_name, movie_id in db.session.execute(_membership_query(user_id, chunk)):
+                getattr(self, list_name).add(movie_id)
+            self.loaded.update(chunk)
+
+        return self
+
+    def add_entries(self, entries):
+        """Record the state of LibraryEntry rows, which already carry it, without a query."""
+        for entry in entries:
+            movie_id = entry.movie.id
+            self.loaded.add(movie_id)
+            if entry.in_watchlist:
+                self.watchlist.add(movie_id)
+            if entry.is_favorite:
+                self.favorites.add(movie_id)
+            if entry.is_watched:
+                self.watched.add(movie_id)
+        return self
+
+    def in_watchlist(self, movie):
+        return _movie_id(movie) in self.watchlist
+
+    def is_favorite(self, movie):
+        return _movie_id(movie) in self.favorites
+
+    def has_watched(self, movie):
+        return _movie_id(movie) in self.watched
+
+
+def current_library():
+    """Return the LibraryMembership of the current request."""
+    if 'library' not in g:
+        g.library = LibraryMembership()
+    return g.library
+
+
+def load_library(movies):
+    """
+    Load the current user's list membership for `movies` (Movie objects or
+    IDs) into the request's LibraryMembership and return it. Anonymous
+    users get an empty membership without touching the database.
+    """
+    library = current_library()
+    if current_user.is_authenticated:
+        library.load(current_user.id, [_movie_id(movie) for movie in movies])
+    return library
+
+
+def watched_movies_page(user_id, cursor=None, per_page=24):
+    """
+    One keyset page of a user's watched movies, most recently watched
+    first, read along ix_watched_user_id_watched_at. Raises ValueError
+    for a malformed cursor.
+    """
+    query = db.session.query(Movie)\
+        .join(watched, watched.c.movie_id == Movie.id)\
+        .filter(watched.c.user_id == user_id)
+    return keyset_paginate(query, LIBRARY_SORTS['watched'], cursor=cursor, per_page=per_page)
+
+
+def library_page(user_id, tab='all', sort='title', cursor=None, per_page=24):
+    """
+    One keyset page of a user's library as LibraryEntry rows, in a single
+    query: the tab's movie IDs drive the query, and LEFT JOINs of the three
+    lists add each movie's flags and timestamps. Raises ValueError for an
+    unknown tab or sort or a malformed cursor.
+    """
+    if tab not in LIBRARY_TABS or sort not in LIBRARY_SORTS:
+        raise ValueError('Invalid tab or sort')
+    
+    tables = [table for name, table in LISTS if tab in ('all', name)]
+    members = union(*[select(table.c.movie_id).where(table.c.user_id == user_id) for table in tables])\
+        .subquery('members')
+    
+    query = db.session.query(
+            Movie,
+            watchlist.c.movie_id.isnot(None),
+            watched.c.movie_id.isnot(None),
+            favorites.c.movie_id.isnot(None),
+            watched.c.watched_at,
+            favorites.c.added_at
+        )\
+        .select_from(members)\
+        .join(Movie, Movie.id == members.c.movie_id)\
+        .outerjoin(watchlist, and_(watchlist.c.user_id == user_id, watchlist.c.movie_id == Movie.id))\
+        .outerjoin(watched, and_(watched.c.user_id == user_id, watched.c.movie_id == Movie.id))\
+        .outerjoin(favorites, and_(favorites.c.user_id == user_id, favorites.c.movie_id == Movie.id))\
+        .options(joinedload(Movie.stats))
+    
+    page = keyset_paginate(query, LIBRARY_SORTS[sort], cursor=cursor, per_page=per_page)
+    return page._replace(items=[LibraryEntry(*row) for row in page.items])
+
+
+def serialize_library_entry(entry):
+    """JSON representation of a LibraryEntry used by the library API."""
+    return {
+        **serialize_movie(entry.movie),
+        'in_watchlist': entry.in_watchlist,
+        'is_watched': entry.is_watched,
+        'is_favorite': entry.is_favorite,
+        'watched_at': entry.watched_at.isoformat() if entry.watched_at else None,
+        'favorited_at': entry.favorited_at.isoformat() if entry.favorited_at else None
+    }
+
+
+def library_size(user_id):
+    """Number of distinct movies in any of the user's lists."""
+    members = union(*[select(table.c.movie_id).where(table.c.user_id == user_id) for _, table in LISTS])
+    return db.session.scalar(select(db.func.count()).select_from(members.subquery()))
+
+
+def library_version(user_id):
+    """The user's library version: the ID of their latest logged change, or 0."""
+    return db.session.query(db.func.max(LibraryChange.id))\
+        .filter(LibraryChange.user_id == user_id)\
+        .scalar() or 0
+
+
+def library_snapshot(user_id, movie_ids=None):
+    """
+    Return {list: [movie_id, ...]} for all three lists, restricted to
+    `movie_ids` when given. Only IDs are read, never Movie rows.
+    """
+    snapshot = {name: [] for name, _ in LISTS}
+    if movie_ids is None:
+        for list_name, movie_id in db.session.execute(_membership_query(user_id)):
+            snapshot[list_name].append(movie_id)
+    else:
+        library = LibraryMembership().load(user_id, movie_ids)
+        for name in snapshot:
+            snapshot[name] = sorted(getattr(library, name))
+    return snapshot
+
+
+def _chunks(items, size=MAX_IDS_PER_QUERY // 3):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def apply_library_batch(user_id, operations):
+    """
+    Apply a list of {movie_id, list, op} operations (op is 'add' or
+    'remove', list one of watchlist/favorites/watched) to a user's lists
+    in a single transaction.
+
+    Each list gets one set-based INSERT ... ON CONFLICT DO NOTHING and one
+    DELETE, both RETURNING the rows they actually changed, so outcomes and
+    counters stay exact even if another request touched the same rows.
+    When several operations target the same movie and list, the last one
+    wins and the earlier ones are reported as 'superseded'.
+
+    Each result repeats the operation with an outcome of 'added',
+    'removed', 'unchanged', 'superseded', 'not_found' or 'invalid'.
+    """
+    tables = dict(LISTS)
+    results = []
+    # (list, movie_id) -> index of the last operation on it
+    final = {}
+
+    for index, operation in enumerate(operations):
+        if not isinstance(operation, dict):
+            operation = {}
+        list_name = operation.get('list')
+        op = operation.get('op')
+        try:
+            movie_id = int(operation.get('movie_id'))
+        except (TypeError, ValueError):
+            movie_id = None
+
+        result = {'movie_id': operation.get('movie_id') if movie_id is None else movie_id, 'list': list_name, 'op': op}
+        if movie_id is None or list_name not in tables or op not in ('add', 'remove'):
+            result['outcome'] = 'invalid'
+        else:
+            result['outcome'] = 'unchanged'
+            previous = final.get((list_name, movie_id))
+            if previous is not None:
+                results[previous]['outcome'] = 'superseded'
+            final[list_name, movie_id] = index
+        results.append(result)
+
+    # Drop operations on movies that do not exist
+    requested = {movie_id for _, movie_id in final}
+    existing = set()
+    for chunk in _chunks(requested, MAX_IDS_PER_QUERY):
+        existing.update(movie_id for movie_id, in db.session.query(Movie.id).filter(Movie.id.in_(chunk)))
+    for key in [key for key in final if key[1] not in existing]:
+        results[final.pop(key)]['outcome'] = 'not_found'
+
+    try:
+        changes = []
+        for list_name, table in LISTS:
+            wanted = {'add': [], 'remove': []}
+            for (name, movie_id), index in final.items():
+                if name == list_name:
+                    wanted[results[index]['op']].append(movie_id)
+
+            for chunk in _chunks(wanted['add']):
+                stmt = sqlite_insert(table)\
+                    .values([{'user_id': user_id, 'movie_id': movie_id} for movie_id in chunk])\
+                    .on_conflict_do_nothing()\
+                    .returning(table.c.movie_id)
+                changes.extend((list_name, movie_id, True) for movie_id, in db.session.execute(stmt))
+
+            for chunk in _chunks(wanted['remove'], MAX_IDS_PER_QUERY):
+                stmt = delete(table)\
+                    .where(table.c.user_id == user_id, table.c.movie_id.in_(chunk))\
+                    .returning(table.c.movie_id)
+                changes.extend((list_name, movie_id, False) for movie_id, in db.session.execute(stmt))
+
+        user_deltas = {}
+        movie_deltas = {}
+        for list_name, movie_id, added in changes:
+            results[final[list_name, movie_id]]['outcome'] = 'added' if added else 'removed'
+            column = LIST_COUNTERS[list_name]
+            delta = 1 if added else -1
+            user_deltas[column] = user_deltas.get(column, 0) + delta
+            counters = movie_deltas.setdefault(movie_id, {})
+            counters[column] = counters.get(column, 0) + delta
+
+        if changes:
+            db.session.execute(insert(LibraryChange.__table__), [
+                {'user_id': user_id, 'movie_id': movie_id, 'list_name': list_name, 'added': added}
+                for list_name, movie_id, added in changes
+            ])
+            UserStats.increment(user_id, **user_deltas)
+            MovieStats.increment_many(movie_deltas)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    stats = db.session.get(UserStats, user_id)
+    counters = {column: getattr(stats, column) if stats else 0 for column in LIST_COUNTERS.values()}
+
+    movie_counters = {}
+    for chunk in _chunks(movie_deltas, MAX_IDS_PER_QUERY):
+        for row in MovieStats.query.filter(MovieStats.movie_id.in_(chunk)):
+            movie_counters[row.movie_id] = {column: getattr(row, column) for column in LIST_COUNTERS.values()}
+
+    return BatchResult(results, counters, movie_counters, library_version(user_id))
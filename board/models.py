@@ -8,25 +8,34 @@ db = SQLAlchemy()
 # Association tables
 watchlist = db.Table('watchlist',
     db.Column('user_id', db.Integer, db.ForeignKey('users.id'), primary_key=True),
-    db.Column('movie_id', db.Integer, db.ForeignKey('movies.id'), primary_key=True)
+    db.Column('movie_id', db.Integer, db.ForeignKey('movies.id'), primary_key=True),
+    # Reverse lookups (who saved this movie, per-movie counts)
+    db.Index('ix_watchlist_movie_id', 'movie_id', 'user_id')
 )
 
 favorites = db.Table('favorites',
     db.Column('user_id', db.Integer, db.ForeignKey('users.id'), primary_key=True),
     db.Column('movie_id', db.Integer, db.ForeignKey('movies.id'), primary_key=True),
-    db.Column('added_at', db.DateTime, default=datetime.utcnow)
+    db.Column('added_at', db.DateTime, default=datetime.utcnow),
+    db.Index('ix_favorites_movie_id', 'movie_id', 'user_id'),
+    db.Index('ix_favorites_user_id_added_at', 'user_id', 'added_at')
 )
 
 watched = db.Table('watched',
     db.Column('user_id', db.Integer, db.ForeignKey('users.id'), primary_key=True),
     db.Column('movie_id', db.Integer, db.ForeignKey('movies.id'), primary_key=True),
-    db.Column('watched_at', db.DateTime, default=datetime.utcnow)
+    db.Column('watched_at', db.DateTime, default=datetime.utcnow),
+    db.Index('ix_watched_movie_id', 'movie_id', 'user_id'),
+    # Recently watched movies on the profile page
+    db.Index('ix_watched_user_id_watched_at', 'user_id', 'watched_at')
 )
 
 # Association table for many-to-many relationship between movies and genres
 movie_genres = db.Table('movie_genres',
     db.Column('movie_id', db.Integer, db.ForeignKey('movies.id'), primary_key=True),
-    db.Column('genre_id', db.Integer, db.ForeignKey('genres.id'), primary_key=True)
+    db.Column('genre_id', db.Integer, db.ForeignKey('genres.id'), primary_key=True),
+    # Movies of a genre (the primary key only covers movie -> genres)
+    db.Index('ix_movie_genres_genre_id_movie_id', 'genre_id', 'movie_id')
 )
 
 
@@ -38,7 +47,7 @@ class User(UserMixin, db.Model):
     email = db.Column(db.String(120), unique=True, nullable=False)
     password_hash = db.Column(db.String(128))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    last_login = db.Column(db.DateTime)
+    last_login = db.Column(db.DateTime, index=True)
     is_active = db.Column(db.Boolean, default=True)
     
     # Relationships
@@ -63,6 +72,10 @@ class User(UserMixin, db.Model):
         backref=db.backref('watched_by', lazy='dynamic')
     )
     
+    stats = db.relationship('UserStats', backref='user', uselist=False, lazy=True)
+    # Processed profile picture (see board/avatars.py)
+    avatar = db.relationship('UserAvatar', uselist=False, lazy=True)
+    
     def set_password(self, password):
         self.password_hash = generate_password_hash(password)
     
@@ -73,8 +86,9 @@ class User(UserMixin, db.Model):
         """Add a movie to the user's watchlist if not already present."""
         if not self.is_in_watchlist(movie):
             self.watchlist.append(movie)
-            if movie.stats:
-                movie.stats.watchlist_count += 1
+            MovieStats.increment(movie.id, watchlist_count=1)
+            UserStats.increment(self.id, watchlist_count=1)
+            self._log_change(movie, 'watchlist', True)
             db.session.commit()
             return True
         return False
@@ -83,8 +97,9 @@ class User(UserMixin, db.Model):
         """Remove a movie from the user's watchlist if present."""
         if self.is_in_watchlist(movie):
             self.watchlist.remove(movie)
-            if movie.stats and movie.stats.watchlist_count > 0:
-                movie.stats.watchlist_count -= 1
+            MovieStats.increment(movie.id, watchlist_count=-1)
+            UserStats.increment(self.id, watchlist_count=-1)
+            self._log_change(movie, 'watchlist', False)
             db.session.commit()
             return True
         return False
@@ -105,8 +120,9 @@ class User(UserMixin, db.Model):
         """Add a movie to the user's favorites if not already present."""
         if not self.is_favorite(movie):
             self.favorite_movies.append(movie)
-            if movie.stats:
-                movie.stats.favorites_count = (movie.stats.favorites_count or 0) + 1
+            MovieStats.increment(movie.id, favorites_count=1)
+            UserStats.increment(self.id, favorites_count=1)
+            self._log_change(movie, 'favorites', True)
             db.session.commit()
             return True
         return False
@@ -115,8 +131,9 @@ class User(UserMixin, db.Model):
         """Remove a movie from the user's favorites if present."""
         if self.is_favorite(movie):
             self.favorite_movies.remove(movie)
-            if movie.stats and (movie.stats.favorites_count or 0) > 0:
-                movie.stats.favorites_count -= 1
+            MovieStats.increment(movie.id, favorites_count=-1)
+            UserStats.increment(self.id, favorites_count=-1)
+            self._log_change(movie, 'favorites', False)
             db.session.commit()
             return True
         return False
@@ -125,8 +142,9 @@ class User(UserMixin, db.Model):
         """Add a movie to the user's watched list if not already present."""
         if not self.has_watched(movie):
             self.watched_movies.append(movie)
-            if movie.stats:
-                movie.stats.watched_count = (movie.stats.watched_count or 0) + 1
+            MovieStats.increment(movie.id, watched_count=1)
+            UserStats.increment(self.id, watched_count=1)
+            self._log_change(movie, 'watched', True)
             db.session.commit()
             return True
         return False
@@ -135,12 +153,17 @@ class User(UserMixin, db.Model):
         """Remove a movie from the user's watched list if present."""
         if self.has_watched(movie):
             self.watched_movies.remove(movie)
-            if movie.stats and (movie.stats.watched_count or 0) > 0:
-                movie.stats.watched_count -= 1
+            MovieStats.increment(movie.id, watched_count=-1)
+            UserStats.increment(self.id, watched_count=-1)
+            self._log_change(movie, 'watched', False)
             db.session.commit()
             return True
         return False
         
+    def _log_change(self, movie, list_name, added):
+        """Append a library change; its ID becomes the user's new library version."""
+        db.session.add(LibraryChange(user_id=self.id, movie_id=movie.id, list_name=list_name, added=added))
+        
     def __repr__(self):
         return f'<User {self.username}>'
 
@@ -163,10 +186,17 @@ class Movie(db.Model):
     genres = db.relationship('Genre', secondary=movie_genres, lazy='dynamic',
                            backref=db.backref('movies', lazy='dynamic'))
     stats = db.relationship('MovieStats', backref='movie', uselist=False, lazy=True)
+    # Locally cached copy of the poster (see board/posters.py); joined so
+    # listings can build srcsets without extra queries
+    poster = db.relationship('PosterImage', primaryjoin='foreign(Movie.poster_url) == PosterImage.source_url',
+                             uselist=False, viewonly=True, lazy='joined')
     
     def __repr__(self):
         return f'<Movie {self.title} ({self.release_year})>'
 
+# Listings sort by rating (highest first, NULLs last), then ID
+db.Index('ix_movies_rating_id', Movie.rating.desc(), Movie.id)
+
 class Genre(db.Model):
     __tablename__ = 'genres'
     
@@ -176,8 +206,69 @@ class Genre(db.Model):
     def __repr__(self):
         return f'<Genre {self.name}>'
 
-class MovieStats(db.Model):
+class CounterMixin:
+    """
+    Atomic, in-database updates for tables of denormalized counters.
+    
+    `counted_tables` maps each counter column that mirrors an association
+    table to that table; a row created by increment() starts from the
+    table's real count instead of zero.
+    """
+    
+    counted_tables = {}
+    
+    @classmethod
+    def increment(cls, key, **deltas):
+        """
+        Add `deltas` (column=delta) to the counters of row `key`, creating the
+        row if it does not exist yet. Counters never go below zero.
+        """
+        cls.increment_many({key: deltas})
+    
+    @classmethod
+    def increment_many(cls, deltas_by_key):
+        """
+        Apply {key: {column: delta}} to many rows with the same semantics as
+        increment(): one executemany UPDATE of the existing rows and, only
+        when it missed some, one executemany INSERT of the missing ones.
+        Call it after the list change itself, which the seeded counts then
+        include.
+        """
+        if not deltas_by_key:
+            return
+        table = cls.__table__
+        primary_key = list(table.primary_key.columns)[0]
+        names = sorted({name for deltas in deltas_by_key.values() for name in deltas})
+        key_param = db.bindparam('key')
+        
+        update = table.update()\
+            .where(primary_key == key_param)\
+            .values({name: db.func.max(db.func.coalesce(table.c[name], 0) + db.bindparam(name), 0) for name in names})
+        
+        # The counts are only evaluated for missing rows
+        values = {name: db.func.max(db.bindparam(name), 0) for name in names}
+        for name, counted in cls.counted_tables.items():
+            values[name] = db.select(db.func.count())\
+                .select_from(counted)\
+                .where(counted.c[primary_key.name] == key_param)\
+                .scalar_subquery()
+        missing = db.select(key_param, *values.values())\
+            .where(~db.exists().where(primary_key == key_param))
+        insert = table.insert().from_select([primary_key.name, *values], missing)
+        
+        rows = [
+            {'key': key, **{name: deltas.get(name, 0) for name in names}}
+            for key, deltas in deltas_by_key.items()
+        ]
+        # Pending appends to the list relationships must be in the counts
+        db.session.flush()
+        if db.session.execute(update, rows).rowcount < len(rows):
+            db.session.execute(insert, rows)
+
+
+class MovieStats(CounterMixin, db.Model):
     __tablename__ = 'movie_stats'
+    counted_tables = {'watchlist_count': watchlist, 'favorites_count': favorites, 'watched_count': watched}
 
     movie_id = db.Column(db.Integer, db.ForeignKey('movies.id'), primary_key=True)
     ratings_count = db.Column(db.Integer, default=0)
@@ -188,3 +279,118 @@ class MovieStats(db.Model):
     
     def __repr__(self):
         return f'<MovieStats for movie {self.movie_id}>'
+
+
+class UserStats(CounterMixin, db.Model):
+    __tablename__ = 'user_stats'
+    counted_tables = {'watchlist_count': watchlist, 'watched_count': watched, 'favorites_count': favorites}
+
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    watchlist_count = db.Column(db.Integer, default=0, nullable=False)
+    watched_count = db.Column(db.Integer, default=0, nullable=False)
+    favorites_count = db.Column(db.Integer, default=0, nullable=False)
+    
+    def __repr__(self):
+        return f'<UserStats for user {self.user_id}>'
+
+
+class MovieSimilarity(db.Model):
+    """Precomputed top-K neighbours of each movie (see board/similarity.py)."""
+    __tablename__ = 'movie_similarities'
+    # Finds the movies listing a changed movie as a neighbour
+    __table_args__ = (db.Index('ix_movie_similarities_similar_movie_id', 'similar_movie_id'),)
+
+    movie_id = db.Column(db.Integer, db.ForeignKey('movies.id'), primary_key=True)
+    similar_movie_id = db.Column(db.Integer, db.ForeignKey('movies.id'), primary_key=True)
+    score = db.Column(db.Float, nullable=False)
+    computed_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    
+    def __repr__(self):
+        return f'<MovieSimilarity {self.movie_id} -> {self.similar_movie_id} ({self.score:.3f})>'
+
+
+class LibraryChange(db.Model):
+    """
+    Append-only log of watchlist / favorites / watched changes. The highest
+    ID logged for a user is that user's library version, and the rows after
+    a given version are the delta a client needs to catch up.
+    """
+    __tablename__ = 'library_changes'
+    __table_args__ = (db.Index('ix_library_changes_user_id_id', 'user_id', 'id'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    movie_id = db.Column(db.Integer, db.ForeignKey('movies.id'), nullable=False)
+    list_name = db.Column(db.String(16), nullable=False)
+    added = db.Column(db.Boolean, nullable=False)
+    changed_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    
+    def __repr__(self):
+        action = 'added to' if self.added else 'removed from'
+        return f'<LibraryChange {self.id}: movie {self.movie_id} {action} {self.list_name}>'
+
+
+class CatalogVersion(db.Model):
+    """
+    Version counters of the catalog: row 1 is bumped whenever movies,
+    genres or the similar-movies index change, row 2 at most every few
+    minutes for their stats. Anonymous catalog pages use them as their
+    ETag and Last-Modified (see board/http_cache.py).
+    """
+    __tablename__ = 'catalog_version'
+
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, default=0, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    
+    def __repr__(self):
+        return f'<CatalogVersion {self.version}>'
+
+
+class PosterImage(db.Model):
+    """
+    A poster fetched into the local content-addressed store. Several movies
+    sharing a source URL share the row; resized variants live on disk under
+    the content hash.
+    """
+    __tablename__ = 'poster_images'
+
+    source_url = db.Column(db.String(500), primary_key=True)
+    content_hash = db.Column(db.String(64), nullable=False)
+    width = db.Column(db.Integer, nullable=False)
+    height = db.Column(db.Integer, nullable=False)
+    fetched_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    
+    def __repr__(self):
+        return f'<PosterImage {self.content_hash[:12]} from {self.source_url}>'
+
+
+class UserAvatar(db.Model):
+    """
+    A user's processed profile picture. The square WebP thumbnails live on
+    disk under the SHA-256 of the uploaded file.
+    """
+    __tablename__ = 'user_avatars'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    content_hash = db.Column(db.String(64), nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    
+    def __repr__(self):
+        return f'<UserAvatar {self.content_hash[:12]} of user {self.user_id}>'
+
+
+class ImportCheckpoint(db.Model):
+    """
+    How far `flask import-movies` got in a file, written in the same
+    transaction as each batch so an interrupted import can resume exactly.
+    """
+    __tablename__ = 'import_checkpoints'
+
+    source = db.Column(db.String(500), primary_key=True)
+    rows_done = db.Column(db.Integer, nullable=False)
+    file_size = db.Column(db.Integer, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    
+    def __repr__(self):
+        return f'<ImportCheckpoint {self.source}: {self.rows_done} rows>'
@@ -1,82 +1,91 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, abort, current_app, \
+    Response, stream_with_context
 from flask_login import login_required, current_user, login_user, logout_user
 from urllib.parse import urlparse as url_parse
-from .models import db, User, Movie, Genre, MovieStats, watched, movie_genres
+import zlib
+from .models import db, User, Movie, Genre, MovieStats, UserStats, watched, movie_genres
 from .forms import LoginForm, RegistrationForm
+from .catalog import top_movies_by_genre, genre_movies_page, top_movies_page, serialize_movie
+from .search import search_movies, count_search_results, suggest_titles
+from .library import load_library, current_library, library_version, library_snapshot, \
+    apply_library_batch, watched_movies_page, library_page, library_size, serialize_library_entry, \
+    LibraryMembership, MAX_BATCH_SIZE, LIST_COUNTERS
+from .similarity import similar_movies_for
+from .sampling import random_movies
+from .http_cache import catalog_cache
+from .posters import send_poster
+from .avatars import AvatarError, submit_avatar, send_avatar
+from .assets import send_asset
+from .streaming import stream_page
+from .stats import user_stats, users_stats
+from .export import export_library, EXPORT_FORMATS
 from sqlalchemy import or_
 from sqlalchemy.orm import joinedload
+from werkzeug.exceptions import RequestEntityTooLarge
 
 # Create a blueprint named "pages"
 bp = Blueprint("pages", __name__)
 
+# Number of movies shown per page on the paginated listings
+LISTING_PAGE_SIZE = 24
+SEARCH_PAGE_SIZE = 24
+TOP_MOVIES_PAGE_SIZE = 50
+
+# Maximum number of titles returned by the suggest API
+MAX_SUGGESTIONS = 10
+
+# Maximum number of movie IDs accepted by the movie-statuses API
+MAX_STATUS_IDS = 500
+
 # Define routes using the blueprint
 @bp.route("/")
+@catalog_cache
 def home():
-    # Use no_autoflush to prevent premature flushes
-    with db.session.no_autoflush:
-        # Get all genres that have at least one movie
-        genres = db.session.query(Genre)\
-            .join(movie_genres, Genre.id == movie_genres.c.genre_id)\
-            .group_by(Genre.id)\
-            .order_by(Genre.name)\
-            .all()
-        
-        if not genres:
-            return render_template("index.html", movies_by_genre={})
-        
-        # Get all movie stats in one query
-        stats_map = {stat.movie_id: stat for stat in db.session.query(MovieStats).all()}
-        
-        # Get all movie-genre relationships
-        genre_movies = {}
-        for mg in db.session.query(movie_genres).all():
-            if mg.genre_id not in genre_movies:
-                genre_movies[mg.genre_id] = []
-            genre_movies[mg.genre_id].append(mg.movie_id)
-        
-        movies_by_genre = {}
-        
-        # Process each genre
-        for genre in genres:
-            if genre.id not in genre_movies:
-                continue
-                
-            # Get top 5 movies for this genre using ORM
-            movies = db.session.query(Movie)\
-                .filter(Movie.id.in_(genre_movies[genre.id]))\
-                .order_by(db.desc(Movie.rating))\
-                .limit(5)\
-                .all()
-            
-            # Attach stats to movies
-            for movie in movies:
-                movie.stats = stats_map.get(movie.id)
-                
-            if movies:
-                movies_by_genre[genre] = movies
+    # Top 5 movies of every genre, built in a single query
+    movies_by_genre = top_movies_by_genre(per_genre=5)
+    
+    # Watchlist/favorite/watched state of every card in one query
+    load_library(movie for movies in movies_by_genre.values() for movie in movies)
     
     return render_template("index.html", movies_by_genre=movies_by_genre)
 
 @bp.route('/genre/<int:genre_id>')
+@catalog_cache
 def genre_movies(genre_id):
     # Get the genre by ID or return 404 if not found
     genre = Genre.query.get_or_404(genre_id)
     
-    # Get all movies in this genre, ordered by rating (highest first)
-    movies = Movie.query\
-        .join(Movie.genres)\
-        .filter(Genre.id == genre_id)\
-        .options(joinedload(Movie.stats))\
-        .order_by(Movie.rating.desc())\
-        .all()
+    # Get one page of movies in this genre, ordered by rating (highest first)
+    try:
+        page = genre_movies_page(genre_id, cursor=request.args.get('cursor'), per_page=LISTING_PAGE_SIZE)
+    except ValueError:
+        abort(400)
     
-    return render_template(
+    load_library(page.items)
+    
+    return stream_page(
         'genre_movies.html',
         genre=genre,
-        movies=movies,
+        movies=page.items,
+        page=page,
         title=f"{genre.name} Movies"
     )
 
+@bp.route('/api/genre/<int:genre_id>/movies')
+def api_genre_movies(genre_id):
+    """JSON variant of the genre listing for infinite scroll"""
+    Genre.query.get_or_404(genre_id)
+    
+    try:
+        page = genre_movies_page(genre_id, cursor=request.args.get('cursor'), per_page=LISTING_PAGE_SIZE)
+    except ValueError:
+        return jsonify({'error': 'Invalid cursor'}), 400
+    
+    return jsonify({
+        'movies': [serialize_movie(movie) for movie in page.items],
+        'next_cursor': page.next_cursor
+    })
+
 @bp.route('/search', methods=['GET'])
 def search():
     query = request.args.get('q', '').strip()
@@ -84,32 +93,71 @@ def search():
     if not query:
         return redirect(url_for('pages.home'))
     
-    # Search for movies where the title contains the search query
-    movies = Movie.query.filter(
-        Movie.title.ilike(f'%{query}%')
-    ).order_by(Movie.rating.desc()).all()
+    cursor = request.args.get('cursor')
+    
+    # Full-text search over titles and overviews, ranked by relevance
+    try:
+        page = search_movies(query, cursor=cursor, per_page=SEARCH_PAGE_SIZE)
+    except ValueError:
+        abort(400)
+    
+    # Only the first page shows the total number of results
+    total = count_search_results(query) if not cursor else None
+    
+    load_library(page.items)
     
     return render_template(
         'search_results.html',
         query=query,
-        movies=movies,
+        movies=page.items,
+        page=page,
+        total=total,
         title=f'Search: {query}'
     )
 
+@bp.route('/api/search')
+def api_search():
+    """JSON variant of the search results for infinite scroll"""
+    query = request.args.get('q', '').strip()
+    
+    if not query:
+        return jsonify({'error': 'Search query is required'}), 400
+    
+    try:
+        page = search_movies(query, cursor=request.args.get('cursor'), per_page=SEARCH_PAGE_SIZE)
+    except ValueError:
+        return jsonify({'error': 'Invalid cursor'}), 400
+    
+    return jsonify({
+        'query': query,
+        'movies': [serialize_movie(movie) for movie in page.items],
+        'next_cursor': page.next_cursor
+    })
+
+@bp.route('/api/search/suggest')
+def search_suggest():
+    """Title suggestions for the search box, answered from an in-memory index"""
+    query = request.args.get('q', '').strip()
+    limit = min(max(request.args.get('limit', 8, type=int), 1), MAX_SUGGESTIONS)
+    
+    return jsonify({
+        'query': query,
+        'results': suggest_titles(query, limit=limit) if query else []
+    })
+
 @bp.route('/movie/<int:movie_id>')
+@catalog_cache
 def movie_detail(movie_id):
     # Get the movie by ID or return 404 if not found
     movie = Movie.query.options(
-        joinedload(Movie.genres),
         joinedload(Movie.stats)
     ).get_or_404(movie_id)
     
-    # Check if movie is in user's watchlist (only for authenticated users)
-    in_watchlist = current_user.is_in_watchlist(movie) if current_user.is_authenticated else False
+    # Get similar movies from the precomputed similarity index
+    similar_movies = similar_movies_for(movie_id, limit=4)
     
-    # Get similar movies (movies that share at least one genre, excluding the current movie)
-    similar_movies = []
-    if movie.genres:
+    # Fall back to movies that share a genre when the index has no entry yet
+    if not similar_movies:
         # Get the first 3 genre IDs for this movie
         genre_ids = [genre.id for genre in movie.genres][:3]
         
@@ -126,34 +174,44 @@ def movie_detail(movie_id):
             .limit(4)\
             .all()
     
-    # If we don't have enough similar movies, get some random popular movies
+    # If we don't have enough similar movies, fill the gap with random ones
     if len(similar_movies) < 4:
-        # Get additional random popular movies to fill the gap
-        additional_count = 4 - len(similar_movies)
-        additional_movies = Movie.query\
-            .options(joinedload(Movie.stats))\
-            .filter(Movie.id != movie_id)\
-            .order_by(db.func.random())\
-            .limit(additional_count)\
-            .all()
-        
-        # Add to similar movies, avoiding duplicates
-        existing_ids = {m.id for m in similar_movies}
-        for m in additional_movies:
-            if m.id not in existing_ids:
-                similar_movies.append(m)
-                existing_ids.add(m.id)
-                if len(similar_movies) >= 4:
-                    break
+        existing_ids = {m.id for m in similar_movies} | {movie_id}
+        similar_movies += random_movies(
+            4 - len(similar_movies),
+            has_poster=True,
+            exclude=existing_ids
+        )
+    
+    # Check the movie's list membership (only for authenticated users)
+    library = load_library([movie])
     
     return render_template(
         'movie_detail.html',
         movie=movie,
         similar_movies=similar_movies,
-        in_watchlist=in_watchlist,
+        in_watchlist=library.in_watchlist(movie),
         title=f"{movie.title} ({movie.release_year})" if movie.release_year else movie.title
     )
 
+@bp.route('/posters/<content_hash>/<int:width>.<ext>')
+def poster(content_hash, width, ext):
+    """Serve a resized poster from the local store (see board/posters.py)"""
+    return send_poster(content_hash, width, ext)
+
+@bp.route('/assets/<path:filename>')
+def asset(filename):
+    """Serve a built static file (see board/assets.py)"""
+    return send_asset(filename)
+
+@bp.route('/surprise-me')
+def surprise_me():
+    """Redirect to a random rated movie that has a poster"""
+    movies = random_movies(1, has_poster=True, rated=True)
+    if not movies:
+        return redirect(url_for('pages.home'))
+    return redirect(url_for('pages.movie_detail', movie_id=movies[0].id))
+
 @bp.route('/signin', methods=['GET', 'POST'])
 def signin():
     if current_user.is_authenticated:
@@ -178,7 +236,9 @@ def signup():
     if form.validate_on_submit():
         user = User(
             username=form.username.data,
-            email=form.email.data
+            email=form.email.data,
+            # The list counters start with the account, at zero
+            stats=UserStats()
         )
         user.set_password(form.password.data)
         db.session.add(user)
@@ -194,99 +254,150 @@ def signout():
     return redirect(url_for('pages.home'))
 
 @bp.route('/top-movies')
+@catalog_cache
 def top_movies():
-    # Get top 50 movies by rating, ordered highest to lowest
-    top_movies = Movie.query\
-        .options(joinedload(Movie.stats))\
-        .filter(Movie.rating.isnot(None))\
-        .order_by(Movie.rating.desc())\
-        .limit(50)\
-        .all()
+    # Get one page of rated movies, ordered highest to lowest
+    try:
+        page = top_movies_page(cursor=request.args.get('cursor'), per_page=TOP_MOVIES_PAGE_SIZE)
+    except ValueError:
+        abort(400)
+    top_movies = page.items
     
-    # Add watchlist status for each movie (only for authenticated users)
-    for movie in top_movies:
-        movie.in_watchlist = current_user.is_in_watchlist(movie) if current_user.is_authenticated else False
+    # Watchlist/favorite/watched state of every card in one query
+    load_library(top_movies)
     
     return render_template(
         'top_movies.html',
         movies=top_movies,
+        page=page,
         title='Top Movies by IMDB Rating'
     )
 
+@bp.route('/api/top-movies')
+def api_top_movies():
+    """JSON variant of the top movies listing for infinite scroll"""
+    try:
+        page = top_movies_page(cursor=request.args.get('cursor'), per_page=TOP_MOVIES_PAGE_SIZE)
+    except ValueError:
+        return jsonify({'error': 'Invalid cursor'}), 400
+    
+    return jsonify({
+        'movies': [serialize_movie(movie) for movie in page.items],
+        'next_cursor': page.next_cursor,
+        'position': page.position
+    })
+
 @bp.route('/my-library')
 @login_required
 def my_library():
-    # Get all movies in the user's watchlist, ordered by title
-    watchlist_movies = current_user.watchlist\
-        .options(joinedload(Movie.stats))\
-        .order_by(Movie.title)\
-        .all()
-    
-    # Get watched and favorited movies
-    watched_movies = current_user.watched_movies\
-        .options(joinedload(Movie.stats))\
-        .order_by(Movie.title)\
-        .all()
+    tab = request.args.get('tab', 'all')
+    sort = request.args.get('sort', 'title')
+    cursor = request.args.get('cursor')
     
-    favorite_movies = current_user.favorite_movies\
-        .options(joinedload(Movie.stats))\
-        .order_by(Movie.title)\
-        .all()
+    # One page of the selected tab, with every movie's list flags, in a single query
+    try:
+        page = library_page(current_user.id, tab=tab, sort=sort, cursor=cursor, per_page=LISTING_PAGE_SIZE)
+    except ValueError:
+        abort(400)
     
-    # Combine all movies and remove duplicates
-    all_movies = {}
-    for movie in watchlist_movies + watched_movies + favorite_movies:
-        all_movies[movie.id] = movie
-    all_movies = list(all_movies.values())
-    all_movies.sort(key=lambda x: x.title)
+    # The cards' buttons read the flags that came with the page
+    current_library().add_entries(page.items)
     
-    return render_template(
+    # Only the first page shows the tab counts (the lists' from user_stats)
+    return stream_page(
         'library.html',
-        all_movies=all_movies,
-        watchlist_movies=watchlist_movies,
-        watched_movies=watched_movies,
-        favorite_movies=favorite_movies,
-        title='My Library',
-        total_movies=len(all_movies),
-        watchlist_count=len(watchlist_movies),
-        watched_count=len(watched_movies),
-        favorites_count=len(favorite_movies)
+        movies=[entry.movie for entry in page.items],
+        page=page,
+        tab=tab,
+        sort=sort,
+        stats=user_stats(current_user),
+        total_movies=library_size(current_user.id) if not cursor else None,
+        title='My Library'
     )
 
+@bp.route('/api/library')
+@login_required
+def api_library():
+    """JSON variant of the library view: one page of a tab with each movie's list state"""
+    try:
+        page = library_page(
+            current_user.id,
+            tab=request.args.get('tab', 'all'),
+            sort=request.args.get('sort', 'title'),
+            cursor=request.args.get('cursor'),
+            per_page=LISTING_PAGE_SIZE
+        )
+    except ValueError:
+        return jsonify({'error': 'Invalid tab, sort or cursor'}), 400
+    
+    return jsonify({
+        'movies': [serialize_library_entry(entry) for entry in page.items],
+        'next_cursor': page.next_cursor
+    })
+
+@bp.route('/api/library/export')
+@login_required
+def export_my_library():
+    """Download the whole library (lists, watched and favorited dates) as CSV or NDJSON"""
+    export_format = request.args.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({'error': 'Format must be csv or ndjson'}), 400
+    
+    # Rows are encoded as they come off the cursor and sent with chunked
+    # transfer encoding, so the export never sits in memory as a whole
+    mimetype, extension = EXPORT_FORMATS[export_format]
+    response = Response(stream_with_context(export_library(current_user.id, export_format)), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename="my-library.{extension}"'
+    response.headers['Cache-Control'] = 'private, no-store'
+    return response
+
+def _toggle_movie_id(data):
+    """The movie ID of a toggle request body, or None if missing or malformed."""
+    try:
+        return int((data or {}).get('movie_id'))
+    except (TypeError, ValueError):
+        return None
+
+
+def _toggle_list(list_name, movie_id):
+    """
+    Flip a movie's membership in one of the current user's lists through
+    apply_library_batch(), so the toggle is a single transaction. Returns
+    (in_list, movie counters), or (False, None) if the movie does not exist.
+    """
+    library = LibraryMembership().load(current_user.id, [movie_id])
+    in_list = movie_id in getattr(library, list_name)
+    batch = apply_library_batch(current_user.id, [
+        {'movie_id': movie_id, 'list': list_name, 'op': 'remove' if in_list else 'add'}
+    ])
+    outcome = batch.results[0]['outcome']
+    if outcome == 'not_found':
+        return False, None
+
+    counters = batch.movie_counters.get(movie_id)
+    if counters is None:
+        # 'unchanged': another request already made the same change
+        stats = db.session.get(MovieStats, movie_id)
+        counters = {column: getattr(stats, column) if stats else 0 for column in LIST_COUNTERS.values()}
+    return not in_list, counters
+
+
 @bp.route('/api/watchlist/toggle', methods=['POST'])
 @login_required
 def toggle_watchlist():
     try:
-        data = request.get_json()
-        movie_id = data.get('movie_id')
-        
-        if not movie_id:
+        movie_id = _toggle_movie_id(request.get_json(silent=True))
+        if movie_id is None:
             return jsonify({'error': 'Movie ID is required'}), 400
-            
-        movie = Movie.query.get(movie_id)
-        if not movie:
-            return jsonify({'error': 'Movie not found'}), 404
-            
-        # Toggle watchlist status
-        in_watchlist = current_user.is_in_watchlist(movie)
-        
-        if in_watchlist:
-            current_user.remove_from_watchlist(movie)
-            status = 'removed from'
-            button_text = 'Add to Watchlist'
-        else:
-            current_user.add_to_watchlist(movie)
-            status = 'added to'
-            button_text = 'Remove from Watchlist'
         
-        db.session.commit()
-        
-        # Get updated watchlist count for the movie
-        watchlist_count = movie.stats.watchlist_count if movie.stats and hasattr(movie.stats, 'watchlist_count') else 0
+        in_list, counters = _toggle_list('watchlist', movie_id)
+        if counters is None:
+            return jsonify({'error': 'Movie not found'}), 404
+        watchlist_count = counters['watchlist_count']
         
         return jsonify({
-            'status': status,
-            'button_text': button_text,
+            'status': 'added to' if in_list else 'removed from',
+            'button_text': 'Remove from Watchlist' if in_list else 'Add to Watchlist',
             'watchlist_count': watchlist_count,
             'movie_id': movie_id
         })
@@ -300,36 +411,18 @@ def toggle_watchlist():
 @login_required
 def toggle_favorite():
     try:
-        data = request.get_json()
-        movie_id = data.get('movie_id')
-        
-        if not movie_id:
+        movie_id = _toggle_movie_id(request.get_json(silent=True))
+        if movie_id is None:
             return jsonify({'error': 'Movie ID is required'}), 400
-            
-        movie = Movie.query.get(movie_id)
-        if not movie:
-            return jsonify({'error': 'Movie not found'}), 404
-            
-        # Toggle favorite status
-        is_favorite = current_user.is_favorite(movie)
-        
-        if is_favorite:
-            current_user.remove_from_favorites(movie)
-            status = 'removed from'
-            button_text = 'Add to Favorites'
-        else:
-            current_user.add_to_favorites(movie)
-            status = 'added to'
-            button_text = 'Remove from Favorites'
         
-        db.session.commit()
-        
-        # Get updated favorites count for the movie
-        favorites_count = movie.stats.favorites_count if movie.stats and hasattr(movie.stats, 'favorites_count') else 0
+        in_list, counters = _toggle_list('favorites', movie_id)
+        if counters is None:
+            return jsonify({'error': 'Movie not found'}), 404
+        favorites_count = counters['favorites_count']
         
         return jsonify({
-            'status': status,
-            'button_text': button_text,
+            'status': 'added to' if in_list else 'removed from',
+            'button_text': 'Remove from Favorites' if in_list else 'Add to Favorites',
             'favorites_count': favorites_count,
             'movie_id': movie_id
         })
@@ -339,25 +432,88 @@ def toggle_favorite():
         return jsonify({'error': 'An error occurred while updating your favorites'}), 500
 
 
+def _parse_movie_ids(value):
+    """Parse a comma-separated list of movie IDs; raises ValueError if malformed or too long."""
+    movie_ids = sorted({int(movie_id) for movie_id in value.split(',') if movie_id.strip()})
+    if len(movie_ids) > MAX_STATUS_IDS:
+        raise ValueError
+    return movie_ids
+
 @bp.route('/api/user/movie-statuses')
 @login_required
 def get_user_movie_statuses():
-    """Get the current user's watchlist, favorites, and watched movie IDs"""
+    """
+    Get the current user's watchlist, favorites, and watched movie IDs.
+    
+    Query parameters:
+      ids    comma-separated movie IDs to limit the answer to (e.g. the
+             movies visible on the page); all saved movies when omitted
+    
+    Every response carries the user's library version and an ETag, so
+    repeating a request with If-None-Match costs a single indexed lookup
+    and returns 304 while nothing has changed.
+    """
     try:
-        watchlist_ids = [movie.id for movie in current_user.watchlist.all()]
-        favorite_ids = [movie.id for movie in current_user.favorite_movies.all()]
-        watched_ids = [movie.id for movie in current_user.watched_movies.all()]
-        
+        movie_ids = _parse_movie_ids(request.args['ids']) if 'ids' in request.args else None
+    except ValueError:
         return jsonify({
-            'success': True,
-            'watchlist': watchlist_ids,
-            'favorites': favorite_ids,
-            'watched': watched_ids
-        })
+            'success': False,
+            'error': f'ids must be at most {MAX_STATUS_IDS} comma-separated movie IDs'
+        }), 400
+    
+    try:
+        version = library_version(current_user.id)
+        
+        # The ETag covers the user, the library version and the requested scope
+        scope = zlib.crc32(','.join(map(str, movie_ids)).encode()) if movie_ids is not None else 'all'
+        etag = f"lib-{current_user.id}-{version}-{scope}"
+        
+        if request.if_none_match.contains(etag):
+            response = current_app.response_class(status=304)
+        else:
+            response = jsonify({'success': True, 'version': version, **library_snapshot(current_user.id, movie_ids)})
+        
+        response.set_etag(etag)
+        # Private to the user, and always revalidated so changes show up immediately
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
     except Exception as e:
         print(f"Error getting user movie statuses: {str(e)}")
         return jsonify({'success': False, 'error': 'Failed to get user movie statuses'}), 500
 
+@bp.route('/api/library/batch', methods=['POST'])
+@login_required
+def library_batch():
+    """
+    Apply many list changes in one transaction.
+    
+    Expects {"operations": [{"movie_id": 1, "list": "watchlist", "op": "add"}, ...]}
+    where list is watchlist, favorites or watched and op is add or remove.
+    Returns the outcome of every operation, the user's updated counters,
+    the updated counters of each changed movie and the new library version.
+    """
+    data = request.get_json(silent=True) or {}
+    operations = data.get('operations')
+    
+    if not isinstance(operations, list) or not operations:
+        return jsonify({'success': False, 'error': 'A non-empty list of operations is required'}), 400
+    if len(operations) > MAX_BATCH_SIZE:
+        return jsonify({'success': False, 'error': f'At most {MAX_BATCH_SIZE} operations are allowed per batch'}), 400
+    
+    try:
+        batch = apply_library_batch(current_user.id, operations)
+    except Exception as e:
+        print(f"Error applying library batch: {str(e)}")
+        return jsonify({'success': False, 'error': 'An error occurred while updating your library'}), 500
+    
+    return jsonify({
+        'success': True,
+        'results': batch.results,
+        'counters': batch.counters,
+        'movies': {str(movie_id): counters for movie_id, counters in batch.movie_counters.items()},
+        'version': batch.version
+    })
+
 @bp.route('/api/movie/remove', methods=['POST'])
 @login_required
 def remove_movie():
@@ -368,29 +524,21 @@ def remove_movie():
         if not movie_id:
             return jsonify({'error': 'Movie ID is required'}), 400
             
-        movie = Movie.query.get(movie_id)
-        if not movie:
+        # Remove from all lists in one transaction
+        batch = apply_library_batch(current_user.id, [
+            {'movie_id': movie_id, 'list': list_name, 'op': 'remove'}
+            for list_name in ('watchlist', 'favorites', 'watched')
+        ])
+        outcomes = {result['outcome'] for result in batch.results}
+        
+        if outcomes & {'not_found', 'invalid'}:
             return jsonify({'error': 'Movie not found'}), 404
             
-        # Remove from all lists
-        removed = False
-        if current_user.is_in_watchlist(movie):
-            current_user.remove_from_watchlist(movie)
-            removed = True
-            
-        if current_user.is_favorite(movie):
-            current_user.favorite_movies.remove(movie)
-            removed = True
-            
-        if current_user.has_watched(movie):
-            current_user.watched_movies.remove(movie)
-            removed = True
-            
-        if removed:
-            db.session.commit()
+        if 'removed' in outcomes:
             return jsonify({
                 'success': True,
-                'message': 'Movie removed from your library'
+                'message': 'Movie removed from your library',
+                'counters': batch.counters
             })
         else:
             return jsonify({
@@ -407,39 +555,21 @@ def remove_movie():
 @login_required
 def toggle_watched():
     try:
-        data = request.get_json()
-        movie_id = data.get('movie_id')
-        
-        if not movie_id:
+        movie_id = _toggle_movie_id(request.get_json(silent=True))
+        if movie_id is None:
             return jsonify({'error': 'Movie ID is required'}), 400
-            
-        movie = Movie.query.get(movie_id)
-        if not movie:
-            return jsonify({'error': 'Movie not found'}), 404
-            
-        # Toggle watched status
-        has_watched = current_user.has_watched(movie)
-        
-        if has_watched:
-            current_user.unmark_as_watched(movie)
-            status = 'marked as not watched'
-            button_text = 'Mark as Watched'
-        else:
-            current_user.mark_as_watched(movie)
-            status = 'marked as watched'
-            button_text = 'Watched'
-        
-        db.session.commit()
         
-        # Get updated watched count for the movie
-        watched_count = movie.stats.watched_count if movie.stats and hasattr(movie.stats, 'watched_count') else 0
+        in_list, counters = _toggle_list('watched', movie_id)
+        if counters is None:
+            return jsonify({'error': 'Movie not found'}), 404
+        watched_count = counters['watched_count']
         
         return jsonify({
-            'status': status,
-            'button_text': button_text,
+            'status': 'marked as watched' if in_list else 'marked as not watched',
+            'button_text': 'Watched' if in_list else 'Mark as Watched',
             'watched_count': watched_count,
             'movie_id': movie_id,
-            'is_watched': not has_watched  # Return the new state
+            'is_watched': in_list  # Return the new state
         })
         
     except Exception as e:
@@ -457,15 +587,11 @@ def profile(user_id=None):
             return redirect(url_for('pages.signin', next=request.url))
     
     # Get the user whose profile we're viewing
-    user = User.query.get_or_404(user_id)
+    user = User.query.options(joinedload(User.stats), joinedload(User.avatar)).get_or_404(user_id)
     is_own_profile = current_user.is_authenticated and (current_user.id == user_id)
     
-    # Get user's movie stats
-    stats = {
-        'watchlist_count': user.watchlist.count(),
-        'watched_count': user.watched_movies.count(),
-        'favorites_count': user.favorite_movies.count()
-    }
+    # Get user's movie stats (denormalized counters)
+    stats = user_stats(user)
     
     # Get recently watched movies (last 6)
     recent_movies = db.session.query(Movie)\
@@ -475,19 +601,19 @@ def profile(user_id=None):
         .limit(6)\
         .all()
     
-    # Get all watched movies for the user, ordered by watch date (newest first)
-    watched_movies = db.session.query(Movie)\
-        .join(watched, Movie.id == watched.c.movie_id)\
-        .filter(watched.c.user_id == user_id)\
-        .order_by(watched.c.watched_at.desc())\
-        .all()
+    # One page of all watched movies, newest first; more are loaded on scroll
+    try:
+        page = watched_movies_page(user_id, cursor=request.args.get('cursor'), per_page=LISTING_PAGE_SIZE)
+    except ValueError:
+        abort(400)
     
-    return render_template(
+    return stream_page(
         'profile.html',
         user=user,
         stats=stats,
         recent_movies=recent_movies,
-        watched_movies=watched_movies,
+        watched_movies=page.items,
+        page=page,
         is_own_profile=is_own_profile
     )
 
@@ -525,20 +651,49 @@ def update_profile():
     
     return redirect(url_for('pages.profile'))
 
+@bp.route('/profile/picture', methods=['POST'])
+@login_required
+def upload_avatar():
+    try:
+        upload = request.files.get('avatar')
+        if not upload or not upload.filename:
+            flash('Please choose a picture to upload.', 'danger')
+        else:
+            # Thumbnails are built in the background
+            submit_avatar(current_user.id, upload)
+            flash('Profile picture uploaded! It will appear in a few seconds.', 'success')
+    except AvatarError as e:
+        flash(str(e), 'danger')
+    except RequestEntityTooLarge:
+        raise
+    except Exception as e:
+        flash('An error occurred while uploading your picture. Please try again.', 'danger')
+        print(f"Error uploading profile picture: {str(e)}")
+    
+    return redirect(url_for('pages.profile'))
+
+@bp.app_errorhandler(RequestEntityTooLarge)
+def request_too_large(error):
+    # Raised while parsing the form (MAX_CONTENT_LENGTH), before the view runs
+    if request.endpoint == 'pages.upload_avatar':
+        flash('That picture is too large. Please upload a smaller one.', 'danger')
+        return redirect(url_for('pages.profile'))
+    return error
+
+@bp.route('/avatars/<content_hash>/<int:size>.webp')
+def avatar(content_hash, size):
+    """Serve a profile picture thumbnail (see board/avatars.py)"""
+    return send_avatar(content_hash, size)
+
 @bp.route('/community')
 def community():
     """Community page showing user profiles and activity"""
     # Get all active users, ordered by most recently active
-    users = User.query.filter_by(is_active=True)\
+    # Stats are loaded in the same query from the user_stats counters
+    users = User.query.options(joinedload(User.stats), joinedload(User.avatar))\
+                    .filter_by(is_active=True)\
                     .order_by(User.last_login.desc())\
                     .limit(50).all()  # Limit to 50 most recent users
     
-    # Add stats to each user
-    for user in users:
-        user.stats = {
-            'watchlist_count': user.watchlist.count(),
-            'watched_count': user.watched_movies.count(),
-            'favorites_count': user.favorite_movies.count()
-        }
-    
-    return render_template('community.html', users=users)
+    # Users without a counter row get counts from the lists, not zeros
+    return render_template('community.html', users=users, stats=users_stats(users))
@@ -0,0 +1,113 @@
+import base64
+import json
+from collections import namedtuple
+from datetime import datetime
+from sqlalchemy import DateTime, and_, or_, false
+
+# One page of keyset-paginated results.
+# `position` is the number of rows that came before this page, which lets
+# templates number rows (e.g. ranks) without an OFFSET query.
+KeysetPage = namedtuple('KeysetPage', ['items', 'next_cursor', 'position'])
+
+
+def encode_cursor(values, position):
+    """Encode the sort key of the last row of a page into an opaque URL-safe token."""
+    payload = json.dumps([list(values), position], separators=(',', ':'), default=_encode_value)
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Decode a cursor made by encode_cursor(). Raises ValueError if it is malformed."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values, position = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (TypeError, ValueError, UnicodeDecodeError) as e:
+        raise ValueError('Invalid cursor') from e
+    if not isinstance(values, list) or not isinstance(position, int):
+        raise ValueError('Invalid cursor')
+    return values, position
+
+
+def _encode_value(value):
+    # Datetime sort keys travel as ISO strings (see _decode_values())
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f'Cannot encode {type(value).__name__} in a cursor')
+
+
+def _decode_values(keys, values):
+    """Turn the ISO strings of datetime keys back into datetimes."""
+    decoded = []
+    for (column, _), value in zip(keys, values):
+        if isinstance(value, str) and isinstance(column.type, DateTime):
+            value = datetime.fromisoformat(value)
+        decoded.append(value)
+    return decoded
+
+
+def _nullable(column):
+    return getattr(getattr(column, 'expression', column), 'nullable', False)
+
+
+def _after(keys, values):
+    """
+    Build the WHERE clause selecting rows that sort after `values`.
+
+    NULLs always sort last, matching the NULLS LAST ordering applied by
+    keyset_paginate(), so nullable columns also match the NULL rows.
+    """
+    (column, descending), value = keys[0], values[0]
+
+    if value is None:
+        # Nothing sorts after NULL except rows tied on the remaining keys
+        if len(keys) == 1:
+            return false()
+        return and_(column.is_(None), _after(keys[1:], values[1:]))
+
+    beyond = column < value if descending else column > value
+    if _nullable(column):
+        beyond = or_(beyond, column.is_(None))
+
+    if len(keys) == 1:
+        return beyond
+    return or_(beyond, and_(column == value, _after(keys[1:], values[1:])))
+
+
+def keyset_paginate(query, keys, cursor=None, per_page=24):
+    """
+    Paginate an ORM query by its sort key instead of OFFSET.
+
+    `keys` is a list of (column, descending) pairs that together form a
+    unique ordering, e.g. [(Movie.rating, True), (Movie.id, False)]. The
+    cost of fetching a page is the same at any depth, since the database
+    seeks straight to the first row after the cursor.
+    
+    Items are the query's entity, or tuples of its columns when it selects
+    several (e.g. a Movie and flags computed alongside it).
+    """
+    width = len(query.column_descriptions)
+    position = 0
+    if cursor:
+        values, position = decode_cursor(cursor)
+        if len(values) != len(keys):
+            raise ValueError('Invalid cursor')
+        query = query.filter(_after(keys, _decode_values(keys, values)))
+
+    order = []
+    for column, descending in keys:
+        clause = column.desc() if descending else column.asc()
+        order.append(clause.nulls_last() if _nullable(column) else clause)
+
+    rows = query\
+        .add_columns(*[column for column, _ in keys])\
+        .order_by(*order)\
+        .limit(per_page + 1)\
+        .all()
+
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        next_cursor = encode_cursor(rows[-1][width:], position + per_page)
+
+    items = [row[0] if width == 1 else tuple(row[:width]) for row in rows]
+    return KeysetPage(items, next_cursor, position)
@@ -0,0 +1,216 @@
+import hashlib
+import os
+import re
+import tempfile
+import urllib.request
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from io import BytesIO
+from urllib.parse import urlparse
+from flask import abort, current_app, send_from_directory, url_for
+from markupsafe import Markup
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from .models import db, Movie, PosterImage
+
+# Pillow is only needed to build the variants, so it is imported inside
+# build_variants() rather than at application startup.
+
+# Widths of the generated variants, in pixels
+WIDTHS = (160, 320, 640)
+
+# Variant formats: extension -> (Pillow format, save options)
+FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 6}),
+    'jpg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+# Width of the JPEG in src (browsers without srcset) and the default sizes
+DEFAULT_WIDTH = 320
+DEFAULT_SIZES = '(max-width: 576px) 50vw, 220px'
+
+# Limits for downloading a source image
+FETCH_TIMEOUT = 15
+MAX_SOURCE_BYTES = 20 * 1024 * 1024
+
+# File types picked up by the offline import
+LOCAL_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp')
+
+# Variant URLs contain the content hash, so they never change meaning
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+_HASH_RE = re.compile(r'[0-9a-f]{64}')
+
+# Outcome of cache_posters(): `failed` holds (source URL, error) pairs
+PosterCacheResult = namedtuple('PosterCacheResult', ['cached', 'missing', 'failed'])
+
+
+def poster_dir():
+    """Root of the poster store (the POSTER_CACHE_DIR setting)."""
+    return current_app.config['POSTER_CACHE_DIR']
+
+
+def _entry_dir(root, content_hash):
+    return os.path.join(root, content_hash[:2], content_hash)
+
+
+def write_atomic(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+def fetch_source(url):
+    """Download a source image; raises on HTTP errors and oversized files."""
+    request = urllib.request.Request(url, headers={'User-Agent': 'MyMovieList poster cache'})
+    with urllib.request.urlopen(request, timeout=FETCH_TIMEOUT) as response:
+        data = response.read(MAX_SOURCE_BYTES + 1)
+    if len(data) > MAX_SOURCE_BYTES:
+        raise ValueError(f"Poster larger than {MAX_SOURCE_BYTES} bytes")
+    return data
+
+
+def read_local_source(source_dir, url, movie_ids):
+    """
+    Find the poster of a source URL in `source_dir` for the offline import:
+    <movie id>.<ext> for any movie using it, or the URL's file name.
+    Returns the file's bytes, or None when there is no such file.
+    """
+    candidates = [f'{movie_id}{ext}' for movie_id in movie_ids for ext in LOCAL_EXTENSIONS]
+    candidates.append(os.path.basename(urlparse(url).path))
+    for name in candidates:
+        path = os.path.join(source_dir, name)
+        if name and os.path.isfile(path):
+            with open(path, 'rb') as f:
+                return f.read()
+    return None
+
+
+def build_variants(data, root):
+    """
+    Store `data` under its SHA-256 and write every width/format variant
+    next to it. Existing entries are reused, so identical images are only
+    processed once. Returns (content_hash, width, height).
+    """
+    from PIL import Image
+
+    content_hash = hashlib.sha256(data).hexdigest()
+    entry = _entry_dir(root, content_hash)
+
+    with Image.open(BytesIO(data)) as image:
+        image = image.convert('RGB')
+        width, height = image.size
+
+        if not os.path.exists(os.path.join(entry, 'original')):
+            write_atomic(os.path.join(entry, 'original'), data)
+
+        for target in WIDTHS:
+            paths = {ext: os.path.join(entry, f'{target}.{ext}') for ext in FORMATS}
+            if all(os.path.exists(path) for path in paths.values()):
+                continue
+            # Never upscale; narrower sources get a same-size copy
+            resized = image if target >= width else image.resize(
+                (target, max(1, round(height * target / width))), Image.LANCZOS
+            )
+            for ext, (image_format, options) in FORMATS.items():
+                buffer = BytesIO()
+                resized.save(buffer, image_format, **options)
+                write_atomic(paths[ext], buffer.getvalue())
+
+    return content_hash, width, height
+
+
+def cache_posters(refresh=False, source_dir=None, workers=8, limit=None):
+    """
+    Fetch every movie poster not cached yet (all of them with `refresh`)
+    into the local store and record it in poster_images. Each distinct
+    source URL is fetched once, however many movies use it.
+
+    With `source_dir` nothing is downloaded: posters are read from local
+    files instead (see read_local_source()).
+    """
+    root = poster_dir()
+
+    query = db.session.query(Movie.id, Movie.poster_url)\
+        .filter(Movie.poster_url.isnot(None), Movie.poster_url != '')
+    if not refresh:
+        query = query.outerjoin(PosterImage, PosterImage.source_url == Movie.poster_url)\
+            .filter(PosterImage.source_url.is_(None))
+
+    sources = {}
+    for movie_id, url in query:
+        sources.setdefault(url, []).append(movie_id)
+    jobs = list(sources.items())[:limit] if limit else list(sources.items())
+
+    def process(url, movie_ids):
+        data = read_local_source(source_dir, url, movie_ids) if source_dir else fetch_source(url)
+        return build_variants(data, root) if data is not None else None
+
+    rows, missing, failed = [], 0, []
+    now = datetime.utcnow()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [(url, executor.submit(process, url, movie_ids)) for url, movie_ids in jobs]
+        for url, future in futures:
+            try:
+                result = future.result()
+            except Exception as e:
+                failed.append((url, str(e)))
+                continue
+            if result is None:
+                missing += 1
+                continue
+            content_hash, width, height = result
+            rows.append({'source_url': url, 'content_hash': content_hash,
+                         'width': width, 'height': height, 'fetched_at': now})
+
+    if rows:
+        stmt = sqlite_insert(PosterImage.__table__)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[PosterImage.source_url],
+            set_={name: stmt.excluded[name] for name in ('content_hash', 'width', 'height', 'fetched_at')}
+        )
+        db.session.execute(stmt, rows)
+    db.session.commit()
+
+    return PosterCacheResult(len(rows), missing, failed)
+
+
+def send_poster(content_hash, width, ext):
+    """Response for one variant, cacheable forever."""
+    if not _HASH_RE.fullmatch(content_hash) or width not in WIDTHS or ext not in FORMATS:
+        abort(404)
+    response = send_from_directory(_entry_dir(poster_dir(), content_hash), f'{width}.{ext}')
+    response.headers['Cache-Control'] = IMMUTABLE
+    return response
+
+
+def poster_attrs(movie, width=DEFAULT_WIDTH, sizes=DEFAULT_SIZES):
+    """
+    The src/srcset/sizes attributes of a movie's <img>: WebP variants in
+    srcset and a JPEG of about `width` pixels in src. Movies whose poster
+    isn't cached yet keep pointing at the external URL.
+    """
+    poster = movie.poster
+    if poster is None:
+        return Markup('src="{}"').format(movie.poster_url or '')
+
+    # Variants wider than the source would only be same-size copies
+    widths = [w for w in WIDTHS if w <= poster.width] or [WIDTHS[0]]
+    srcset = ', '.join(
+        f"{url_for('pages.poster', content_hash=poster.content_hash, width=w, ext='webp')} {w}w"
+        for w in widths
+    )
+    fallback = max([w for w in widths if w <= width] or [widths[0]])
+    src = url_for('pages.poster', content_hash=poster.content_hash, width=fallback, ext='jpg')
+    return Markup('src="{}" srcset="{}" sizes="{}"').format(src, srcset, sizes)
+
+
+def poster_key(movie):
+    """Fragment cache key part for a movie's poster."""
+    return movie.poster.content_hash if movie.poster is not None else movie.poster_url
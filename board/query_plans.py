@@ -0,0 +1,123 @@
+import re
+from collections import namedtuple
+from contextlib import contextmanager
+from sqlalchemy import event
+from .models import db
+
+# Pages checked by default. Search must have its full-text index built
+# (flask rebuild-search-index), and /api/search/suggest is left out because
+# it loads every title into the in-memory prefix index by design.
+ROUTES = [
+    '/',
+    '/genre/1',
+    '/api/genre/1/movies',
+    '/search?q=the',
+    '/api/search?q=the',
+    '/movie/1',
+    '/top-movies',
+    '/api/top-movies',
+    '/my-library',
+    '/api/user/movie-statuses?ids=1,2,3',
+    '/profile/1',
+    '/community',
+]
+
+# Small lookup tables that may be scanned in full
+ALLOWED_SCANS = {'genres', 'catalog_version'}
+
+# Tables a route may read through a full index scan ("SCAN <table> USING
+# [COVERING] INDEX"), because it stops early or runs rarely. Any other
+# SCAN, with or without an index, reads the whole table.
+ALLOWED_INDEX_SCANS = {
+    # The shelves are ranked over every genre once per catalog version
+    '/': {'movie_genres'},
+    # Walks ix_users_last_login in order and stops after one page
+    '/community': {'users'},
+}
+
+_SCAN = re.compile(r'^SCAN (\S+)(.*)$')
+
+# A full table scan found while serving `url`
+FullScan = namedtuple('FullScan', ['url', 'table', 'detail', 'statement'])
+
+
+@contextmanager
+def capture_queries(engine=None):
+    """Record the (statement, parameters) of every SELECT run on `engine` inside the block."""
+    engine = engine or db.engine
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and statement.lstrip().upper().startswith(('SELECT', 'WITH')):
+            statements.append((statement, parameters))
+
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+
+def explain_query_plan(statement, parameters=()):
+    """Return the detail lines of SQLite's EXPLAIN QUERY PLAN for a statement."""
+    with db.engine.connect() as connection:
+        rows = connection.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters)
+        return [row[-1] for row in rows]
+
+
+def full_table_scans(plan, allowed=ALLOWED_SCANS, index_scans=()):
+    """
+    Return the (table, detail) pairs of a query plan that scan a whole
+    table or index. Only SEARCH steps use an index to skip rows; SCAN steps
+    are reported unless the table is in `allowed`, or in `index_scans`
+    and read through an index.
+    """
+    tables = db.metadata.tables
+    scans = []
+    for detail in plan:
+        match = _SCAN.match(detail)
+        if not match:
+            continue
+        # Aliases look like movies_1; subqueries and CTEs (anon_1) aren't tables
+        name = match.group(1)
+        table = name if name in tables else re.sub(r'_\d+$', '', name)
+        if table not in tables or table in allowed:
+            continue
+        if table in index_scans and 'INDEX' in match.group(2):
+            continue
+        scans.append((table, detail))
+    return scans
+
+
+def check_query_plans(app, urls=ROUTES, user_id=None, allowed=ALLOWED_SCANS, index_scans=ALLOWED_INDEX_SCANS):
+    """
+    Fetch every URL with the test client, explain each SELECT it ran and
+    return a list of FullScan for the queries that scan a whole table.
+    Pass `user_id` to fetch the pages signed in as that user;
+    `index_scans` maps URLs to the tables they may scan through an index.
+    """
+    client = app.test_client()
+    if user_id is not None:
+        with client.session_transaction() as session:
+            session['_user_id'] = str(user_id)
+            session['_fresh'] = True
+
+    problems = []
+    with app.app_context():
+        for url in urls:
+            with capture_queries() as statements:
+                # Read the body: streamed pages run their queries while it is sent
+                client.get(url).get_data()
+            for statement, parameters in statements:
+                plan = explain_query_plan(statement, parameters)
+                for table, detail in full_table_scans(plan, allowed, index_scans.get(url, ())):
+                    problems.append(FullScan(url, table, detail, statement))
+    return problems
+
+
+def assert_no_full_scans(app, urls=ROUTES, user_id=None, allowed=ALLOWED_SCANS, index_scans=ALLOWED_INDEX_SCANS):
+    """Raise AssertionError listing every full table scan made by the given routes."""
+    problems = check_query_plans(app, urls, user_id=user_id, allowed=allowed, index_scans=index_scans)
+    if problems:
+        report = '\n\n'.join(f"{p.url}: {p.detail}\n{p.statement}" for p in problems)
+        raise AssertionError(f"{len(problems)} queries scan a whole table:\n\n{report}")
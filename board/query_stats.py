@@ -0,0 +1,200 @@
+import logging
+import re
+import threading
+import time
+from contextlib import contextmanager
+from flask import current_app, g, has_app_context, request
+from sqlalchemy import event
+from .models import db
+
+# A statement run this many times in one request is reported as a likely
+# N+1 pattern; override with the QUERY_STATS_REPEAT_THRESHOLD setting
+REPEAT_THRESHOLD = 3
+
+# Longest statement text shown in log lines, and in the X-Query-Repeats header
+MAX_STATEMENT_LENGTH = 200
+REPEAT_HEADER_LENGTH = 80
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDERS = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+_SPACE = re.compile(r'\s+')
+
+
+def fingerprint(statement):
+    """
+    Normalize a SQL statement so that runs differing only in their values
+    compare equal: literals become ?, IN (?, ?, ...) lists collapse to
+    (?...) and whitespace is squeezed.
+    """
+    statement = _STRING.sub('?', statement)
+    statement = _NUMBER.sub('?', statement)
+    statement = _PLACEHOLDERS.sub('(?...)', statement)
+    return _SPACE.sub(' ', statement).strip()
+
+
+def _shorten(text):
+    return text if len(text) <= MAX_STATEMENT_LENGTH else text[:MAX_STATEMENT_LENGTH - 3] + '...'
+
+
+class QueryStats:
+    """Number and duration of the statements run, in total and per fingerprint."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.fingerprints = {}  # fingerprint -> [count, duration]
+
+    def record(self, statement, duration):
+        self.count += 1
+        self.duration += duration
+        entry = self.fingerprints.setdefault(fingerprint(statement), [0, 0.0])
+        entry[0] += 1
+        entry[1] += duration
+
+    def repeated(self, threshold=REPEAT_THRESHOLD):
+        """(fingerprint, count, duration) of statements run at least `threshold` times, most frequent first."""
+        found = [(text, count, duration) for text, (count, duration) in self.fingerprints.items()
+                 if count >= threshold]
+        return sorted(found, key=lambda item: -item[1])
+
+    def summary(self, threshold=REPEAT_THRESHOLD):
+        """One line describing the statements, with the likely N+1 patterns."""
+        line = f"{self.count} queries in {self.duration * 1000:.1f}ms"
+        repeats = self.repeated(threshold)
+        if repeats:
+            line += '; likely N+1: ' + '; '.join(
+                f"{count}x {_shorten(text)}" for text, count, _ in repeats
+            )
+        return line
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = conn.info['query_start'].pop()
+    stats = g.get('query_stats') if has_app_context() else None
+    if stats is not None:
+        stats.record(statement, time.perf_counter() - start)
+
+
+def _handle_error(exception_context):
+    # Failed statements never reach after_cursor_execute
+    connection = exception_context.connection
+    if connection is not None and connection.info.get('query_start'):
+        connection.info['query_start'].pop()
+
+
+def _enabled():
+    return current_app.config.get('QUERY_STATS') or current_app.debug
+
+
+def _start_request():
+    if _enabled():
+        g.query_stats = QueryStats()
+
+
+def _report(response):
+    stats = g.get('query_stats')
+    if stats is None:
+        return response
+
+    threshold = current_app.config.get('QUERY_STATS_REPEAT_THRESHOLD', REPEAT_THRESHOLD)
+    # Streamed bodies run more queries after the headers are sent: the
+    # headers count those run so far, the log line (on close) all of them
+    response.headers['X-Query-Count'] = str(stats.count)
+    response.headers.add('Server-Timing', f'db;dur={stats.duration * 1000:.1f};desc="{stats.count} queries"')
+    repeats = stats.repeated(threshold)
+    if repeats:
+        response.headers['X-Query-Repeats'] = ' | '.join(
+            f"{count}x {text[:REPEAT_HEADER_LENGTH]}" for text, count, _ in repeats
+        )
+
+    logger = current_app.logger
+    label = f"{request.method} {request.full_path.rstrip('?')}"
+
+    def log():
+        if stats.repeated(threshold):
+            logger.warning(f"{label}: {stats.summary(threshold)}")
+        else:
+            logger.info(f"{label}: {stats.summary(threshold)}")
+
+    response.call_on_close(log)
+    return response
+
+
+@contextmanager
+def count_queries(engine=None):
+    """Collect the QueryStats of the statements run by this thread on `engine` inside the block."""
+    engine = engine or db.engine
+    stats = QueryStats()
+    thread = threading.get_ident()
+    starts = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if threading.get_ident() == thread:
+            starts.append(time.perf_counter())
+
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if threading.get_ident() == thread:
+            stats.record(statement, time.perf_counter() - starts.pop())
+
+    def handle_error(exception_context):
+        if threading.get_ident() == thread and starts:
+            starts.pop()
+
+    listeners = [('before_cursor_execute', before_cursor_execute),
+                 ('after_cursor_execute', after_cursor_execute),
+                 ('handle_error', handle_error)]
+    for name, listener in listeners:
+        event.listen(engine, name, listener)
+    try:
+        yield stats
+    finally:
+        for name, listener in listeners:
+            event.remove(engine, name, listener)
+
+
+@contextmanager
+def assert_max_queries(n, engine=None, threshold=None):
+    """
+    Raise AssertionError if the block runs more than `n` statements, or,
+    with `threshold`, any statement `threshold` times or more (N+1):
+
+        with app.app_context(), assert_max_queries(3):
+            client.get('/community').get_data()
+    """
+    with count_queries(engine) as stats:
+        yield stats
+
+    problems = []
+    if stats.count > n:
+        problems.append(f"expected at most {n} queries, ran {stats.count}")
+    if threshold is not None and stats.repeated(threshold):
+        problems.append(f"statements repeated {threshold}+ times")
+    if problems:
+        report = '\n'.join(f"{count}x {text}" for text, (count, _) in
+                           sorted(stats.fingerprints.items(), key=lambda item: -item[1][0]))
+        raise AssertionError(f"{', '.join(problems)}:\n{report}")
+
+
+def init_app(app):
+    """
+    Time the statements of each request (QUERY_STATS setting, or debug
+    mode) and report them in X-Query-Count, X-Query-Repeats and
+    Server-Timing headers and in a log line; repeated statements (likely
+    N+1 queries) are logged as warnings.
+    """
+    with app.app_context():
+        engine = db.engine
+    if not event.contains(engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+        event.listen(engine, 'handle_error', _handle_error)
+    # The log lines are at INFO level, which Flask only shows in debug mode
+    if app.config.get('QUERY_STATS') and app.logger.level == logging.NOTSET:
+        app.logger.setLevel(logging.INFO)
+    app.before_request(_start_request)
+    app.after_request(_report)
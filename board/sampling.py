@@ -0,0 +1,81 @@
+import time
+import random
+import threading
+from array import array
+from sqlalchemy.orm import joinedload
+from .models import db, Movie, movie_genres
+
+
+class MovieSampler:
+    """
+    Picks random movies without ORDER BY random().
+
+    The IDs matching each filter combination are cached in a compact array
+    and reloaded every `max_age` seconds. Sampling is then a random.sample()
+    over the array plus a primary-key lookup for the chosen rows, so it
+    costs the same however large the catalog is.
+    """
+
+    def __init__(self, max_age=300):
+        self.max_age = max_age
+        self._pools = {}
+        self._lock = threading.Lock()
+
+    def _load_ids(self, has_poster, rated, genre_id):
+        query = db.session.query(Movie.id)
+        if has_poster:
+            query = query.filter(Movie.poster_url.isnot(None), Movie.poster_url != '')
+        if rated:
+            query = query.filter(Movie.rating.isnot(None))
+        if genre_id is not None:
+            query = query.join(movie_genres, movie_genres.c.movie_id == Movie.id)\
+                .filter(movie_genres.c.genre_id == genre_id)
+        return array('q', (movie_id for movie_id, in query))
+
+    def _pool(self, has_poster, rated, genre_id):
+        key = (has_poster, rated, genre_id)
+        pool = self._pools.get(key)
+        if pool is None or time.monotonic() - pool[1] > self.max_age:
+            pool = (self._load_ids(has_poster, rated, genre_id), time.monotonic())
+            with self._lock:
+                self._pools[key] = pool
+        return pool[0]
+
+    def invalidate(self):
+        """Drop all cached ID pools (e.g. after a bulk import)."""
+        with self._lock:
+            self._pools = {}
+
+    def sample_ids(self, n, has_poster=False, rated=False, genre_id=None, exclude=()):
+        """Return up to `n` distinct random movie IDs matching the filters."""
+        ids = self._pool(has_poster, rated, genre_id)
+        exclude = set(exclude)
+        # Draw a few extra so excluded IDs don't leave us short
+        picks = random.sample(ids, min(len(ids), n + len(exclude)))
+        return [movie_id for movie_id in picks if movie_id not in exclude][:n]
+
+    def sample(self, n, has_poster=False, rated=False, genre_id=None, exclude=()):
+        """Return up to `n` distinct random movies (with stats) matching the filters."""
+        movie_ids = self.sample_ids(n, has_poster, rated, genre_id, exclude)
+        if not movie_ids:
+            return []
+
+        movies = {
+            movie.id: movie
+            for movie in Movie.query.options(joinedload(Movie.stats)).filter(Movie.id.in_(movie_ids))
+        }
+
+        # IDs that vanished since the pool was loaded mean the pool is stale
+        if len(movies) < len(movie_ids):
+            self.invalidate()
+
+        return [movies[movie_id] for movie_id in movie_ids if movie_id in movies]
+
+
+# Shared per-process sampler
+movie_sampler = MovieSampler()
+
+
+def random_movies(n, **filters):
+    """Return `n` random movies; see MovieSampler.sample() for the filters."""
+    return movie_sampler.sample(n, **filters)
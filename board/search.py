@@ -0,0 +1,354 @@
+import re
+import time
+import heapq
+import threading
+import unicodedata
+from bisect import bisect_left, insort
+from flask import current_app
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session, joinedload, object_session
+from sqlalchemy.sql import table, column
+from .models import db, Movie
+from .pagination import keyset_paginate
+
+# Name of the FTS5 virtual table that indexes movies.title and movies.overview
+FTS_TABLE = 'movies_fts'
+
+# Lightweight handle on the virtual table (kept out of db.metadata so that
+# create_all() never tries to create it as a regular table)
+movies_fts = table(FTS_TABLE, column('rowid'), column('title'), column('overview'))
+
+# Column weights used for BM25 ranking (title matches count more than overview)
+TITLE_WEIGHT = 10.0
+OVERVIEW_WEIGHT = 1.0
+
+_CREATE_STATEMENTS = (
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        title, overview,
+        content='movies', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2',
+        prefix='2 3'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON movies BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, title, overview)
+        VALUES (new.id, new.title, new.overview);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON movies BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, overview)
+        VALUES ('delete', old.id, old.title, old.overview);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF title, overview ON movies BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, overview)
+        VALUES ('delete', old.id, old.title, old.overview);
+        INSERT INTO {FTS_TABLE}(rowid, title, overview)
+        VALUES (new.id, new.title, new.overview);
+    END
+    """,
+)
+
+_DROP_STATEMENTS = (
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ai",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ad",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_au",
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+)
+
+# Either a "quoted phrase" or a bare word
+_TOKEN_RE = re.compile(r'"([^"]*)"|(\S+)')
+
+
+def create_search_index(connection):
+    """Create the FTS5 table and the triggers that keep it in sync with movies."""
+    for statement in _CREATE_STATEMENTS:
+        connection.execute(text(statement))
+
+
+def rebuild_search_index():
+    """Drop and rebuild the search index from the movies table. Returns the row count."""
+    with db.engine.begin() as connection:
+        for statement in _DROP_STATEMENTS:
+            connection.execute(text(statement))
+        create_search_index(connection)
+        connection.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+        connection.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')"))
+        return connection.execute(text(f"SELECT count(*) FROM {FTS_TABLE}")).scalar()
+
+
+def has_search_index():
+    """Check whether the FTS5 index exists in the current database."""
+    if db.engine.dialect.name != 'sqlite':
+        return False
+    return db.session.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+        {'name': FTS_TABLE}
+    ).first() is not None
+
+
+@event.listens_for(Movie.__table__, 'after_create')
+def _create_index_with_movies(target, connection, **kw):
+    # New databases get the index as soon as the movies table is created
+    if connection.dialect.name == 'sqlite':
+        create_search_index(connection)
+
+
+def build_match_query(query):
+    """
+    Turn a user search string into a safe FTS5 MATCH expression.
+
+    "Quoted text" becomes a phrase query, a trailing * on a word becomes a
+    prefix query, and the last bare word is always matched as a prefix so
+    partially typed titles still find results. Every term is quoted, so
+    FTS5 operators in the input are treated as plain text.
+    """
+    terms = []
+    tokens = _TOKEN_RE.findall(query)
+    for index, (phrase, word) in enumerate(tokens):
+        if phrase:
+            words = phrase.split()
+            if words:
+                terms.append('"%s"' % ' '.join(words).replace('"', '""'))
+            continue
+
+        prefix = word.endswith('*') or index == len(tokens) - 1
+        word = word.rstrip('*')
+        if not word:
+            continue
+        term = '"%s"' % word.replace('"', '""')
+        terms.append(term + '*' if prefix else term)
+
+    return ' '.join(terms)
+
+
+def _search_query(query):
+    """Return the matching movies query and its (rank, id) keyset ordering."""
+    match = build_match_query(query)
+
+    if match and has_search_index():
+        rank = db.func.bm25(text(FTS_TABLE), TITLE_WEIGHT, OVERVIEW_WEIGHT)
+        movies = Movie.query\
+            .join(movies_fts, movies_fts.c.rowid == Movie.id)\
+            .filter(text(f"{FTS_TABLE} MATCH :match").bindparams(match=match))
+        return movies, [(rank, False), (Movie.id, False)]
+
+    movies = Movie.query.filter(Movie.title.ilike(f'%{query}%'))
+    return movies, [(Movie.rating, True), (Movie.id, False)]
+
+
+def search_movies(query, cursor=None, per_page=24):
+    """
+    Search movies by title and overview, ranked by BM25 relevance.
+
+    Returns a keyset page. Falls back to a plain title substring match,
+    ordered by rating, when the FTS5 index has not been built yet.
+    """
+    movies, keys = _search_query(query)
+    return keyset_paginate(movies.options(joinedload(Movie.stats)), keys, cursor=cursor, per_page=per_page)
+
+
+def count_search_results(query):
+    """Total number of movies matching a search."""
+    movies, _ = _search_query(query)
+    return movies.order_by(None).count()
+
+
+def normalize_title(value):
+    """Lowercase, strip accents and punctuation so prefixes match loosely."""
+    value = unicodedata.normalize('NFKD', value or '')
+    value = ''.join(c for c in value if not unicodedata.combining(c))
+    return ' '.join(re.sub(r'[^\w\s]', ' ', value.lower()).split())
+
+
+class TitleIndex:
+    """
+    In-memory prefix index over movie titles used for search suggestions.
+
+    Every word position of a normalized title is stored as a key in a
+    sorted list, so "godf" matches "The Godfather" as well as titles that
+    start with it. A prefix lookup is two bisects plus a top-k selection
+    by rating; the results for short prefixes (which cover large ranges)
+    are cached until the index changes.
+
+    Edits committed in this process are applied in place. Once `max_age`
+    seconds have passed, the index is rebuilt in a background thread to
+    pick up changes made elsewhere (other workers, the importer), while
+    suggestions keep being served from the current one.
+    """
+
+    # Prefixes matching more keys than this have their top results cached
+    CACHE_RANGE_SIZE = 256
+    # Upper bound on cached prefixes before the cache is reset
+    MAX_CACHED_PREFIXES = 10000
+
+    def __init__(self, max_age=600):
+        self.max_age = max_age
+        self.built_at = None
+        self._keys = []
+        self._movies = {}
+        self._cache = {}
+        # Changes committed while a refresh reads the table, replayed on top of it
+        self._pending = None
+        self._refreshing = False
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _title_keys(title):
+        words = normalize_title(title).split()
+        return {' '.join(words[i:]) for i in range(len(words))}
+
+    @staticmethod
+    def _rank(title, rating):
+        return (-(rating if rating is not None else -1), title.lower())
+
+    def is_stale(self):
+        return self.built_at is None or time.monotonic() - self.built_at > self.max_age
+
+    def build(self, rows):
+        """Build the index from (id, title, release_year, rating) rows."""
+        movies = {}
+        keys = []
+        for movie_id, title, release_year, rating in rows:
+            title_keys = self._title_keys(title)
+            movies[movie_id] = (title, release_year, rating, self._rank(title, rating), title_keys)
+            keys.extend((key, movie_id) for key in title_keys)
+        keys.sort()
+
+        with self._lock:
+            self._movies = movies
+            self._keys = keys
+            self._cache = {}
+            self.built_at = time.monotonic()
+            pending, self._pending = self._pending, None
+            if pending:
+                self._apply(pending)
+
+    def refresh(self):
+        """Rebuild the index from the database."""
+        with self._lock:
+            self._pending = {}
+        self.build(db.session.query(Movie.id, Movie.title, Movie.release_year, Movie.rating))
+
+    def refresh_in_background(self, app):
+        """Start a refresh in a daemon thread unless one is already running."""
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=self._background_refresh, args=(app,), name='title-index', daemon=True).start()
+
+    def _background_refresh(self, app):
+        try:
+            with app.app_context():
+                self.refresh()
+        except Exception as e:
+            print(f"Error refreshing the title index: {str(e)}")
+            with self._lock:
+                # Keep serving the current index and retry after another max_age
+                self._pending = None
+                self.built_at = time.monotonic()
+        finally:
+            self._refreshing = False
+
+    def _remove(self, movie_id):
+        entry = self._movies.pop(movie_id, None)
+        if entry is None:
+            return
+        for key in entry[4]:
+            position = bisect_left(self._keys, (key, movie_id))
+            if position < len(self._keys) and self._keys[position] == (key, movie_id):
+                del self._keys[position]
+
+    def _apply(self, changes):
+        for movie_id, values in changes.items():
+            self._remove(movie_id)
+            if values is None:
+                continue
+            title, release_year, rating = values
+            title_keys = self._title_keys(title)
+            self._movies[movie_id] = (title, release_year, rating, self._rank(title, rating), title_keys)
+            for key in title_keys:
+                insort(self._keys, (key, movie_id))
+        self._cache = {}
+
+    def apply(self, changes):
+        """Apply {movie_id: (title, release_year, rating) or None} changes in place."""
+        with self._lock:
+            if self._pending is not None:
+                self._pending.update(changes)
+            if self.built_at is not None:
+                self._apply(changes)
+
+    def suggest(self, query, limit=8):
+        """Return up to `limit` movies whose title has a word starting with `query`."""
+        prefix = normalize_title(query)
+        if not prefix:
+            return []
+
+        with self._lock:
+            ids = self._cache.get((prefix, limit))
+            if ids is None:
+                start = bisect_left(self._keys, (prefix,))
+                end = bisect_left(self._keys, (prefix + '\uffff',))
+                matches = {movie_id for _, movie_id in self._keys[start:end]}
+                ids = heapq.nsmallest(limit, matches, key=lambda movie_id: self._movies[movie_id][3])
+                if end - start > self.CACHE_RANGE_SIZE:
+                    if len(self._cache) >= self.MAX_CACHED_PREFIXES:
+                        self._cache = {}
+                    self._cache[(prefix, limit)] = ids
+            movies = [(movie_id, self._movies[movie_id]) for movie_id in ids]
+
+        return [
+            {'id': movie_id, 'title': title, 'release_year': release_year, 'rating': rating}
+            for movie_id, (title, release_year, rating, _, _) in movies
+        ]
+
+
+# Per-process suggestion index, built lazily on the first suggest request
+title_index = TitleIndex()
+
+
+def suggest_titles(query, limit=8):
+    """Suggest movie titles for a partially typed query, best rated first."""
+    if title_index.built_at is None:
+        # Nothing to serve yet: the first request builds the index
+        title_index.refresh()
+    elif title_index.is_stale():
+        title_index.refresh_in_background(current_app._get_current_object())
+    return title_index.suggest(query, limit=limit)
+
+
+def _queue_title_change(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        changes = session.info.setdefault('title_index_changes', {})
+        changes[target.id] = (target.title, target.release_year, target.rating)
+
+
+def _queue_title_removal(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault('title_index_changes', {})[target.id] = None
+
+
+event.listen(Movie, 'after_insert', _queue_title_change)
+event.listen(Movie, 'after_update', _queue_title_change)
+event.listen(Movie, 'after_delete', _queue_title_removal)
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_title_changes(session):
+    # Only committed edits reach the suggestion index
+    changes = session.info.pop('title_index_changes', None)
+    if changes:
+        title_index.apply(changes)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_title_changes(session):
+    session.info.pop('title_index_changes', None)
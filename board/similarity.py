@@ -0,0 +1,200 @@
+from datetime import datetime
+from sqlalchemy import event, or_
+from .models import db, Movie, MovieSimilarity, movie_genres, favorites, watched
+
+# NumPy and SciPy are only needed to build the index, so they are imported
+# inside the build functions rather than at application startup.
+
+# Number of neighbours stored per movie
+TOP_K = 12
+
+# Weights of the score components
+GENRE_WEIGHT = 0.7
+COOCCURRENCE_WEIGHT = 0.3
+# Small bonus so equally similar neighbours are ordered by rating
+RATING_WEIGHT = 0.01
+
+# Number of movies scored per block (bounds memory to the related pairs of that many movies)
+BLOCK_SIZE = 256
+
+
+@event.listens_for(Movie.genres, 'append')
+@event.listens_for(Movie.genres, 'remove')
+def _touch_movie_on_genre_change(target, value, initiator):
+    # Bump updated_at so the incremental build picks the movie up
+    target.updated_at = datetime.utcnow()
+
+
+def similar_movies_for(movie_id, limit=4):
+    """Return up to `limit` precomputed neighbours of a movie, best first."""
+    return Movie.query\
+        .join(MovieSimilarity, MovieSimilarity.similar_movie_id == Movie.id)\
+        .filter(MovieSimilarity.movie_id == movie_id)\
+        .order_by(MovieSimilarity.score.desc())\
+        .limit(limit)\
+        .all()
+
+
+def _load_matrices():
+    """Load the movie x genre and movie x user matrices as sparse CSR matrices."""
+    import numpy as np
+    from scipy import sparse
+
+    movies = db.session.query(Movie.id, Movie.rating).order_by(Movie.id).all()
+    movie_ids = np.array([movie_id for movie_id, _ in movies], dtype=np.int64)
+    ratings = np.array([rating or 0.0 for _, rating in movies], dtype=np.float32)
+    position = {movie_id: i for i, movie_id in enumerate(movie_ids.tolist())}
+
+    def incidence(pairs):
+        rows, cols, columns = [], [], {}
+        for movie_id, other_id in pairs:
+            if movie_id in position:
+                rows.append(position[movie_id])
+                cols.append(columns.setdefault(other_id, len(columns)))
+        matrix = sparse.csr_matrix(
+            (np.ones(len(rows), dtype=np.float32), (rows, cols)),
+            shape=(len(movie_ids), max(len(columns), 1))
+        )
+        # Duplicates were summed (e.g. a movie both favorited and watched by a user)
+        matrix.data[:] = 1.0
+        return matrix
+
+    genres = incidence(db.session.query(movie_genres.c.movie_id, movie_genres.c.genre_id))
+    users = incidence(
+        db.session.query(favorites.c.movie_id, favorites.c.user_id).union_all(
+            db.session.query(watched.c.movie_id, watched.c.user_id)
+        )
+    )
+    return movie_ids, ratings, position, genres, users
+
+
+def _row_indices(matrix):
+    """Row index of every stored entry of a CSR matrix."""
+    import numpy as np
+    return np.repeat(np.arange(matrix.shape[0]), np.diff(matrix.indptr))
+
+
+def _score_neighbours(rows, movie_ids, ratings, genres, users, top_k):
+    """Yield (movie_id, similar_movie_id, score) for the top neighbours of `rows`."""
+    import numpy as np
+
+    genre_counts = np.asarray(genres.sum(axis=1)).ravel()
+    user_norms = np.sqrt(np.asarray(users.sum(axis=1)).ravel())
+    rating_bonus = RATING_WEIGHT * ratings / 10.0
+    k = min(top_k, len(movie_ids) - 1)
+    if k <= 0:
+        return
+
+    for start in range(0, len(rows), BLOCK_SIZE):
+        block = rows[start:start + BLOCK_SIZE]
+
+        # Both products stay sparse: only movies related to the block have
+        # entries, and each component is computed on those entries alone
+
+        # Genre Jaccard: |A & B| / (|A| + |B| - |A & B|)
+        shared = (genres[block] @ genres.T).tocsr()
+        union = genre_counts[block][_row_indices(shared)] + genre_counts[shared.indices] - shared.data
+        shared.data = GENRE_WEIGHT * shared.data / union
+
+        # Co-occurrence in users' lists: cosine of the user vectors
+        together = (users[block] @ users.T).tocsr()
+        norms = user_norms[block][_row_indices(together)] * user_norms[together.indices]
+        together.data = COOCCURRENCE_WEIGHT * together.data / norms
+
+        # Only related movies get the rating bonus; a movie is not its own neighbour
+        score = (shared + together).tocsr()
+        score.data += rating_bonus[score.indices]
+        score.data[score.indices == block[_row_indices(score)]] = 0
+        score.eliminate_zeros()
+
+        for i, row in enumerate(block):
+            begin, end = score.indptr[i], score.indptr[i + 1]
+            values, columns = score.data[begin:end], score.indices[begin:end]
+            if len(values) > k:
+                top = np.argpartition(-values, k - 1)[:k]
+                values, columns = values[top], columns[top]
+            for j, value in zip(columns, values):
+                yield int(movie_ids[row]), int(movie_ids[j]), float(value)
+
+
+def build_similarity_index(movie_ids=None, top_k=TOP_K):
+    """
+    (Re)compute the top-K neighbours of `movie_ids`, or of every movie when
+    None, and store them in movie_similarities.
+
+    Neighbours are scored by genre overlap (Jaccard) plus co-occurrence in
+    users' favorites and watched lists (cosine of the user vectors), using
+    sparse matrix products over blocks of rows that are never densified,
+    so memory grows with the related pairs rather than with the catalog.
+    Returns the number of movies whose neighbours were recomputed.
+    """
+    import numpy as np
+
+    all_ids, ratings, position, genres, users = _load_matrices()
+
+    if movie_ids is None:
+        targets = list(range(len(all_ids)))
+    else:
+        targets = sorted(position[movie_id] for movie_id in set(movie_ids) if movie_id in position)
+    target_ids = [int(all_ids[row]) for row in targets]
+
+    now = datetime.utcnow()
+    rows = [
+        {'movie_id': movie_id, 'similar_movie_id': similar_id, 'score': score, 'computed_at': now}
+        for movie_id, similar_id, score in _score_neighbours(
+            np.array(targets, dtype=np.int64), all_ids, ratings, genres, users, top_k
+        )
+    ]
+
+    # Replace the old neighbours of the recomputed movies
+    if movie_ids is None:
+        MovieSimilarity.query.delete(synchronize_session=False)
+    else:
+        for start in range(0, len(target_ids), 500):
+            MovieSimilarity.query\
+                .filter(MovieSimilarity.movie_id.in_(target_ids[start:start + 500]))\
+                .delete(synchronize_session=False)
+    if rows:
+        db.session.execute(MovieSimilarity.__table__.insert(), rows)
+    db.session.commit()
+
+    return len(target_ids)
+
+
+def update_similarity_index(top_k=TOP_K):
+    """
+    Incrementally refresh the index: recompute movies changed since the
+    last build (new movies, edited movies, genre changes), the movies that
+    list them as neighbours, and drop neighbours that no longer exist.
+    Falls back to a full build when the index is empty.
+    """
+    last_built = db.session.query(db.func.max(MovieSimilarity.computed_at)).scalar()
+    if last_built is None:
+        return build_similarity_index(top_k=top_k)
+
+    indexed = db.session.query(MovieSimilarity.movie_id).distinct()
+    changed = {
+        movie_id for movie_id, in db.session.query(Movie.id).filter(
+            or_(Movie.updated_at > last_built, Movie.id.notin_(indexed))
+        )
+    }
+
+    # Neighbours pointing at deleted movies
+    orphaned = db.session.query(MovieSimilarity.movie_id)\
+        .filter(MovieSimilarity.similar_movie_id.notin_(db.session.query(Movie.id)))
+    changed.update(movie_id for movie_id, in orphaned)
+    MovieSimilarity.query\
+        .filter(MovieSimilarity.movie_id.notin_(db.session.query(Movie.id)))\
+        .delete(synchronize_session=False)
+
+    if not changed:
+        db.session.commit()
+        return 0
+
+    changed_list = list(changed)
+    for start in range(0, len(changed_list), 500):
+        referencing = db.session.query(MovieSimilarity.movie_id)\
+            .filter(MovieSimilarity.similar_movie_id.in_(changed_list[start:start + 500]))
+        changed.update(movie_id for movie_id, in referencing)
+
+    return build_similarity_index(movie_ids=changed, top_k=top_k)
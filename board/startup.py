@@ -0,0 +1,25 @@
+import os
+from jinja2 import FileSystemBytecodeCache
+
+
+def is_production(environ=os.environ):
+    """Whether APP_ENV asks for the production startup mode."""
+    return environ.get('APP_ENV', '').lower() == 'production'
+
+
+def configure_template_cache(app, directory):
+    """
+    Store compiled templates as bytecode in `directory`, so a restarted
+    worker loads them instead of compiling the sources again. Must run
+    before app.jinja_env is first used.
+    """
+    os.makedirs(directory, exist_ok=True)
+    app.jinja_options = {**app.jinja_options, 'bytecode_cache': FileSystemBytecodeCache(directory)}
+
+
+def precompile_templates(app):
+    """Load every template once (compiling and caching it) and return how many there are."""
+    names = app.jinja_env.list_templates(extensions=['html'])
+    for name in names:
+        app.jinja_env.get_template(name)
+    return len(names)
@@ -0,0 +1,69 @@
+// Grids that receive the next page's items: movie grids, or any element
+// marked with data-load-more-items
+const LOAD_MORE_ITEMS = '.movie-grid, [data-load-more-items]';
+
+// Load the next page of a listing in place ("Load More" links and infinite scroll)
+async function loadMore(link) {
+    if (link.dataset.loading) return;
+    link.dataset.loading = 'true';
+    link.classList.add('disabled');
+
+    const container = link.closest('.load-more-container');
+    const grid = container.parentElement.querySelector(LOAD_MORE_ITEMS);
+
+    try {
+        const response = await fetch(link.href, { credentials: 'same-origin' });
+        if (!response.ok) throw new Error('Failed to load more movies');
+
+        const html = await response.text();
+        const nextPage = new DOMParser().parseFromString(html, 'text/html');
+
+        // Append the new cards and swap in the next "Load More" link (if any)
+        const nextGrid = nextPage.querySelector(LOAD_MORE_ITEMS);
+        if (grid && nextGrid) {
+            grid.append(...nextGrid.children);
+        }
+
+        const nextContainer = nextPage.querySelector('.load-more-container');
+        if (nextContainer) {
+            container.replaceWith(nextContainer);
+            observeLoadMore(nextContainer.querySelector('[data-load-more]'));
+        } else {
+            container.remove();
+        }
+    } catch (error) {
+        console.error('Error loading more movies:', error);
+        delete link.dataset.loading;
+        link.classList.remove('disabled');
+    }
+}
+
+// Trigger loading automatically when the link scrolls into view
+const loadMoreObserver = 'IntersectionObserver' in window
+    ? new IntersectionObserver(entries => {
+        entries.forEach(entry => {
+            if (entry.isIntersecting) {
+                loadMoreObserver.unobserve(entry.target);
+                loadMore(entry.target);
+            }
+        });
+    }, { rootMargin: '400px' })
+    : null;
+
+function observeLoadMore(link) {
+    if (link && loadMoreObserver) {
+        loadMoreObserver.observe(link);
+    }
+}
+
+document.addEventListener('DOMContentLoaded', () => {
+    document.querySelectorAll('[data-load-more]').forEach(observeLoadMore);
+
+    document.addEventListener('click', (e) => {
+        const link = e.target.closest('[data-load-more]');
+        if (link) {
+            e.preventDefault();
+            loadMore(link);
+        }
+    });
+});
@@ -1,7 +1,159 @@
+// Delay before asking the server for suggestions while the user types
+const SUGGEST_DELAY_MS = 150;
+
+// Add suggestion styles if they don't exist
+if (!document.getElementById('search-suggest-styles')) {
+    const style = document.createElement('style');
+    style.id = 'search-suggest-styles';
+    style.textContent = `
+        .search-suggestions {
+            position: absolute;
+            top: calc(100% + 6px);
+            left: 0;
+            right: 0;
+            margin: 0;
+            padding: 0.25rem 0;
+            list-style: none;
+            background-color: #1a1a1a;
+            border: 1px solid #333;
+            border-radius: 0.5rem;
+            box-shadow: 0 0.5rem 1rem rgba(0, 0, 0, 0.4);
+            z-index: 1090;
+        }
+
+        .search-suggestions a {
+            display: flex;
+            justify-content: space-between;
+            gap: 1rem;
+            padding: 0.4rem 1rem;
+            color: #e0e0e0;
+            text-decoration: none;
+            font-size: 0.9rem;
+        }
+
+        .search-suggestions a:hover,
+        .search-suggestions li.active a {
+            background-color: #2a2a2a;
+            color: #fff;
+        }
+
+        .search-suggestions .suggestion-meta {
+            color: #6c757d;
+            white-space: nowrap;
+        }
+    `;
+    document.head.appendChild(style);
+}
+
+// Attach search-as-you-type suggestions to a search input
+function initSearchSuggestions(input) {
+    const list = document.createElement('ul');
+    list.className = 'search-suggestions';
+    list.hidden = true;
+    input.closest('.search-bar, form').appendChild(list);
+    input.setAttribute('autocomplete', 'off');
+
+    let timer = null;
+    let controller = null;
+    let latestRequest = 0;
+    let activeIndex = -1;
+
+    function hideSuggestions() {
+        list.hidden = true;
+        list.innerHTML = '';
+        activeIndex = -1;
+    }
+
+    function renderSuggestions(results) {
+        list.innerHTML = '';
+        activeIndex = -1;
+        results.forEach(movie => {
+            const item = document.createElement('li');
+            const link = document.createElement('a');
+            link.href = `/movie/${movie.id}`;
+
+            const title = document.createElement('span');
+            title.textContent = movie.title;
+            const meta = document.createElement('span');
+            meta.className = 'suggestion-meta';
+            meta.textContent = [movie.release_year, movie.rating ? `★ ${movie.rating.toFixed(1)}` : null]
+                .filter(Boolean).join(' · ');
+
+            link.append(title, meta);
+            item.appendChild(link);
+            list.appendChild(item);
+        });
+        list.hidden = results.length === 0;
+    }
+
+    async function fetchSuggestions(query) {
+        // Cancel the previous request; only the latest one may render
+        if (controller) controller.abort();
+        controller = new AbortController();
+        const requestId = ++latestRequest;
+
+        try {
+            const response = await fetch(`/api/search/suggest?q=${encodeURIComponent(query)}`, {
+                signal: controller.signal,
+                credentials: 'same-origin'
+            });
+            if (!response.ok) throw new Error('Failed to fetch suggestions');
+
+            const data = await response.json();
+            if (requestId !== latestRequest || input.value.trim() !== query) return;
+            renderSuggestions(data.results || []);
+        } catch (error) {
+            if (error.name !== 'AbortError') {
+                console.error('Error fetching search suggestions:', error);
+            }
+        }
+    }
+
+    function setActive(index) {
+        const items = list.querySelectorAll('li');
+        if (!items.length) return;
+        activeIndex = (index + items.length) % items.length;
+        items.forEach((item, i) => item.classList.toggle('active', i === activeIndex));
+    }
+
+    input.addEventListener('input', function() {
+        const query = input.value.trim();
+        clearTimeout(timer);
+        if (!query) {
+            latestRequest++;
+            hideSuggestions();
+            return;
+        }
+        timer = setTimeout(() => fetchSuggestions(query), SUGGEST_DELAY_MS);
+    });
+
+    input.addEventListener('keydown', function(e) {
+        if (list.hidden) return;
+        if (e.key === 'ArrowDown') {
+            e.preventDefault();
+            setActive(activeIndex + 1);
+        } else if (e.key === 'ArrowUp') {
+            e.preventDefault();
+            setActive(activeIndex - 1);
+        } else if (e.key === 'Enter' && activeIndex >= 0) {
+            e.preventDefault();
+            window.location.href = list.querySelectorAll('li a')[activeIndex].href;
+        } else if (e.key === 'Escape') {
+            hideSuggestions();
+        }
+    });
+
+    document.addEventListener('click', function(e) {
+        if (e.target !== input && !list.contains(e.target)) {
+            hideSuggestions();
+        }
+    });
+}
+
 document.addEventListener('DOMContentLoaded', function() {
     const searchForm = document.getElementById('searchForm');
     const searchInput = document.getElementById('searchInput');
-    
+
     if (searchForm) {
         searchForm.addEventListener('submit', function(e) {
             const query = searchInput.value.trim();
@@ -11,7 +163,11 @@ document.addEventListener('DOMContentLoaded', function() {
             }
         });
     }
-    
+
+    if (searchInput) {
+        initSearchSuggestions(searchInput);
+    }
+
     // Focus search input when search icon is clicked on mobile
     const searchIcon = document.querySelector('.search-icon');
     if (searchIcon && window.innerWidth < 768) {
@@ -96,24 +96,14 @@ async function toggleMovieStatus(endpoint, movieId, errorMessage) {
 }
 
 // Function to update tab count
-function updateTabCount(tabId) {
-    const tabElement = document.querySelector(`#${tabId}-tab`);
-    if (!tabElement) return;
+// The library is paginated, so the badge is adjusted rather than recounted
+// from the cards on the page; `count` sets it outright
+function updateTabCount(tabId, count) {
+    const badge = document.querySelector(`#${tabId}-tab .badge`);
+    if (!badge) return;
     
-    const tabContent = document.getElementById(tabId);
-    if (!tabContent) return;
-    
-    // Count the number of movie cards in the tab
-    const movieCount = tabContent.querySelectorAll('.movie-card').length;
-    
-    // Update the badge with the new count
-    let badge = tabElement.querySelector('.badge');
-    if (!badge) {
-        badge = document.createElement('span');
-        badge.className = 'badge bg-secondary ms-1';
-        tabElement.appendChild(badge);
-    }
-    badge.textContent = movieCount;
+    const current = parseInt(badge.textContent, 10) || 0;
+    badge.textContent = count !== undefined ? count : Math.max(current - 1, 0);
 }
 
 // Helper function to remove movie card from the UI
@@ -172,10 +162,8 @@ function removeMovieCard(movieId, tabId) {
                     }
                 }
                 
-                // Update the tab count for all tabs since a movie might affect multiple tabs
-                updateTabCount('all');
-                updateTabCount('watched');
-                updateTabCount('favorites');
+                // Only the tab the card left changes; the others are on other pages
+                updateTabCount(tab);
                 
             }, 300);
         }
@@ -476,45 +464,55 @@ function updateButtonState(button, type, isActive) {
     }
 }
 
+// Button selectors and the list each one belongs to
+const STATUS_BUTTONS = [
+    { selector: '[onclick*="toggleWatchlist"], .watchlist-btn', list: 'watchlist', type: 'watchlist' },
+    { selector: '[onclick*="toggleFavorite"], .favorite-btn', list: 'favorites', type: 'favorite' },
+    { selector: '[onclick*="toggleWatched"], .watched-btn', list: 'watched', type: 'watched' }
+];
+
 // Function to initialize button states
 async function initializeButtonStates() {
+    // Collect the buttons on the page, grouped by list, and the movies they refer to
+    const groups = STATUS_BUTTONS.map(group => ({
+        ...group,
+        buttons: Array.from(document.querySelectorAll(group.selector))
+    }));
+    const movieIds = new Set();
+    groups.forEach(group => group.buttons.forEach(button => {
+        const movieId = button.dataset.movieId;
+        if (movieId) movieIds.add(movieId);
+    }));
+    if (movieIds.size === 0) return;
+
     try {
-        const response = await fetch('/api/user/movie-statuses');
+        // Only ask about the movies shown here. no-cache makes the browser
+        // revalidate with If-None-Match, so unchanged libraries cost a 304.
+        const ids = Array.from(movieIds).sort((a, b) => a - b).join(',');
+        const response = await fetch(`/api/user/movie-statuses?ids=${ids}`, {
+            cache: 'no-cache',
+            credentials: 'same-origin'
+        });
         if (!response.ok) throw new Error('Failed to fetch user movie statuses');
         
         const data = await response.json();
         if (!data.success) throw new Error(data.error || 'Failed to fetch user movie statuses');
         
-        // Update all watchlist buttons
-        document.querySelectorAll('[onclick*="toggleWatchlist"], .watchlist-btn').forEach(button => {
-            const movieId = button.getAttribute('data-movie-id') || 
-                           (button.getAttribute('onclick') || '').match(/toggleWatchlist\(['"](\d+)['"]\)/)?.[1];
-            if (movieId && data.watchlist.includes(parseInt(movieId))) {
-                updateButtonState(button, 'watchlist', true);
-            }
-        });
-        
-        // Update all favorite buttons
-        document.querySelectorAll('[onclick*="toggleFavorite"], .favorite-btn').forEach(button => {
-            const movieId = button.getAttribute('data-movie-id') || 
-                           (button.getAttribute('onclick') || '').match(/toggleFavorite\(['"](\d+)['"]\)/)?.[1];
-            if (movieId && data.favorites.includes(parseInt(movieId))) {
-                updateButtonState(button, 'favorite', true);
-            }
-        });
-        
-        // Update all watched buttons
-        document.querySelectorAll('[onclick*="toggleWatched"], .watched-btn').forEach(button => {
-            const movieId = button.getAttribute('data-movie-id') || 
-                           (button.getAttribute('onclick') || '').match(/toggleWatched\(['"](\d+)['"]\)/)?.[1];
-            if (movieId && data.watched.includes(parseInt(movieId))) {
-                // Remove any existing text-primary class from the icon
-                const icon = button.querySelector('i');
-                if (icon) {
-                    icon.classList.remove('text-primary');
+        groups.forEach(group => {
+            const saved = new Set(data[group.list]);
+            group.buttons.forEach(button => {
+                const movieId = button.dataset.movieId;
+                if (movieId && saved.has(parseInt(movieId))) {
+                    if (group.type === 'watched') {
+                        // Remove any existing text-primary class from the icon
+                        const icon = button.querySelector('i');
+                        if (icon) {
+                            icon.classList.remove('text-primary');
+                        }
+                    }
+                    updateButtonState(button, group.type, true);
                 }
-                updateButtonState(button, 'watched', true);
-            }
+            });
         });
     } catch (error) {
         console.error('Error initializing button states:', error);
@@ -560,7 +558,7 @@ async function removeFromLibrary(movieId, event) {
         });
 
         // Update all tab counts
-        updateTabCounts();
+        updateTabCounts(data.counters);
         
         // Show success message
         setTimeout(() => {
@@ -575,32 +573,14 @@ async function removeFromLibrary(movieId, event) {
     return false;
 }
 
-// Function to update tab counts
-function updateTabCounts() {
-    // Get all tab containers
-    const tabContainers = {
-        'all': document.querySelector('#all .movie-grid'),
-        'watchlist': document.querySelector('#watchlist .movie-grid'),
-        'watched': document.querySelector('#watched .movie-grid'),
-        'favorites': document.querySelector('#favorites .movie-grid')
-    };
-
-    // Update each tab's count
-    for (const [tab, container] of Object.entries(tabContainers)) {
-        const tabElement = document.querySelector(`#${tab}-tab .badge`);
-        if (tabElement) {
-            const count = container ? container.querySelectorAll('.movie-card').length : 0;
-            tabElement.textContent = count;
-            
-            // If count is 0 and we're not on the 'all' tab, show empty state
-            if (count === 0 && tab !== 'all') {
-                const emptyState = document.querySelector(`#${tab} .empty-state`);
-                if (emptyState) {
-                    emptyState.style.display = 'block';
-                }
-            }
-        }
-    }
+// Function to update tab counts after a movie left the whole library,
+// from the user's list counters returned by the server
+function updateTabCounts(counters) {
+    updateTabCount('all');
+    if (!counters) return;
+    updateTabCount('watchlist', counters.watchlist_count);
+    updateTabCount('watched', counters.watched_count);
+    updateTabCount('favorites', counters.favorites_count);
 }
 
 // Initialize event listeners when DOM is loaded
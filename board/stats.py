@@ -0,0 +1,103 @@
+from collections import namedtuple
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from .models import db, Movie, MovieStats, User, UserStats
+
+# Counter column -> association table it counts
+USER_COUNTERS = UserStats.counted_tables
+
+MOVIE_COUNTERS = MovieStats.counted_tables
+
+# Outcome of a reconciliation run.
+# `repaired` holds the corrected rows, `drift` the sum of the absolute
+# differences between the stored and the recomputed counters.
+Reconciliation = namedtuple('Reconciliation', ['checked', 'repaired', 'missing', 'drift'])
+
+
+def _upsert(model, key_name, rows):
+    """Write counter rows, inserting or overwriting only the given columns, in one executemany."""
+    if not rows:
+        return
+    table = model.__table__
+    stmt = sqlite_insert(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c[key_name]],
+        set_={name: stmt.excluded[name] for name in rows[0] if name != key_name}
+    )
+    db.session.execute(stmt, rows)
+
+
+def _reconcile(model, key_name, keys, counters, dry_run=False):
+    """
+    Recompute the `counters` of `model` for every key from the association
+    tables (one grouped count per table) and repair drifted or missing rows.
+    """
+    expected = {key: dict.fromkeys(counters, 0) for key, in keys}
+
+    for name, table in counters.items():
+        group = table.c[key_name]
+        for key, count in db.session.query(group, db.func.count()).group_by(group):
+            if key in expected:
+                expected[key][name] = count
+
+    columns = [getattr(model, key_name)] + [getattr(model, name) for name in counters]
+    current = {
+        row[0]: dict(zip(counters, row[1:]))
+        for row in db.session.query(*columns)
+    }
+
+    repaired = []
+    missing = 0
+    drift = 0
+    for key, counts in expected.items():
+        stored = current.get(key)
+        if stored == counts:
+            continue
+        if stored is None:
+            missing += 1
+            stored = {}
+        drift += sum(abs((stored.get(name) or 0) - count) for name, count in counts.items())
+        repaired.append({key_name: key, **counts})
+
+    if not dry_run:
+        _upsert(model, key_name, repaired)
+        db.session.commit()
+
+    return Reconciliation(len(expected), repaired, missing, drift)
+
+
+def reconcile_user_stats(dry_run=False):
+    """Rebuild user_stats (watchlist, watched and favorites counts) from the list tables."""
+    return _reconcile(UserStats, 'user_id', db.session.query(User.id), USER_COUNTERS, dry_run=dry_run)
+
+
+def reconcile_movie_stats(dry_run=False):
+    """
+    Rebuild the list counters of movie_stats from the list tables.
+    ratings_count and reviews_count are left untouched.
+    """
+    return _reconcile(MovieStats, 'movie_id', db.session.query(Movie.id), MOVIE_COUNTERS, dry_run=dry_run)
+
+
+def users_stats(users):
+    """
+    {user_id: UserStats} for `users`, each user's row or, when it is
+    missing (databases never backfilled), an unsaved one counted from the
+    list tables with one grouped query per list for all such users.
+    """
+    stats = {user.id: user.stats for user in users if user.stats is not None}
+    missing = [user.id for user in users if user.stats is None]
+    if missing:
+        counts = {user_id: {name: 0 for name in USER_COUNTERS} for user_id in missing}
+        for name, table in USER_COUNTERS.items():
+            query = db.select(table.c.user_id, db.func.count())\
+                .where(table.c.user_id.in_(missing))\
+                .group_by(table.c.user_id)
+            for user_id, count in db.session.execute(query):
+                counts[user_id][name] = count
+        stats.update((user_id, UserStats(user_id=user_id, **row)) for user_id, row in counts.items())
+    return stats
+
+
+def user_stats(user):
+    """The user's UserStats row, or an unsaved one counted from the list tables (see users_stats())."""
+    return users_stats([user])[user.id]
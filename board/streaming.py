@@ -0,0 +1,35 @@
+from flask import Response, get_flashed_messages, session, stream_template
+from flask_login import current_user
+from flask_wtf.csrf import generate_csrf
+
+# Rendered output is sent in chunks of about this many characters, rather
+# than one tiny write per template fragment
+CHUNK_SIZE = 8 * 1024
+
+
+def buffered(chunks, size=CHUNK_SIZE):
+    """Join the pieces of `chunks` into strings of at least `size` characters (the last one may be shorter)."""
+    buffer, length = [], 0
+    for chunk in chunks:
+        buffer.append(chunk)
+        length += len(chunk)
+        if length >= size:
+            yield ''.join(buffer)
+            buffer, length = [], 0
+    if buffer:
+        yield ''.join(buffer)
+
+
+def stream_page(template_name, **context):
+    """
+    Render a template with stream_template(), so the head and the first
+    rows are sent while the rest of the page is still being rendered.
+    """
+    # The session cookie goes out with the headers, before the template
+    # runs: consume the flashed messages and create the CSRF token now.
+    # Anonymous pages without flashes need neither, and must not set a
+    # cookie that a shared cache would hand to every visitor.
+    if current_user.is_authenticated or '_flashes' in session:
+        get_flashed_messages()
+        generate_csrf()
+    return Response(buffered(stream_template(template_name, **context)), mimetype='text/html')
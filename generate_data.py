@@ -0,0 +1,240 @@
+"""
+Deterministic synthetic data for benchmarks.
+
+Creates a new SQLite database with the application schema and fills it
+with generated movies, genres, users and libraries. Movie popularity
+follows a Zipf distribution and library sizes a Pareto (power-law) one,
+so most users have a few dozen movies and a handful have thousands.
+User 1 is a power user whose library size is set explicitly. The same
+arguments always produce the same data.
+
+    python generate_data.py --db /tmp/bench.db --movies 200000 --genres 50 --users 20000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from bisect import bisect
+from datetime import datetime, timedelta
+from itertools import accumulate
+
+# Add the current directory to the Python path
+sys.path.insert(0, os.path.abspath('.'))
+
+from sqlalchemy import insert, select, text
+from werkzeug.security import generate_password_hash
+from board import create_app
+from board.models import db, Genre, Movie, MovieStats, User, movie_genres, watchlist, favorites, watched
+from board.stats import reconcile_user_stats, reconcile_movie_stats
+from board.similarity import build_similarity_index
+
+# Password of every generated user (hashed once, see generate_users())
+PASSWORD = 'benchmark'
+
+# "Now" of the generated data, so timestamps don't depend on the clock
+BASE_TIME = datetime(2025, 1, 1)
+
+# Rows per executemany
+BATCH_SIZE = 10000
+
+GENRE_NAMES = [
+    'Action', 'Adventure', 'Animation', 'Biography', 'Comedy', 'Crime', 'Documentary', 'Drama',
+    'Family', 'Fantasy', 'History', 'Horror', 'Music', 'Musical', 'Mystery', 'Romance',
+    'Sci-Fi', 'Sport', 'Thriller', 'War', 'Western',
+]
+
+TITLE_WORDS = [
+    'Dark', 'Night', 'Last', 'Lost', 'City', 'Road', 'Star', 'Storm', 'Silent', 'River',
+    'Blood', 'Shadow', 'Return', 'King', 'Queen', 'Ghost', 'Summer', 'Winter', 'Iron', 'Glass',
+    'Fire', 'Moon', 'House', 'Dream', 'Secret', 'Wild', 'Golden', 'Broken', 'Edge', 'Heart',
+    'Empire', 'Island', 'Stranger', 'Hunter', 'Game', 'Machine', 'Garden', 'Echo', 'Signal', 'Line',
+]
+
+OVERVIEW_WORDS = [
+    'a', 'the', 'young', 'detective', 'family', 'must', 'find', 'their', 'way', 'home', 'after',
+    'mysterious', 'journey', 'across', 'world', 'war', 'love', 'story', 'town', 'secret', 'past',
+    'team', 'unlikely', 'friends', 'discover', 'plan', 'to', 'save', 'city', 'from', 'danger',
+    'when', 'an', 'old', 'enemy', 'returns', 'and', 'everything', 'changes', 'in', 'small',
+]
+
+CERTIFICATIONS = ['G', 'PG', 'PG-13', 'R', 'NC-17', None]
+
+# Shape of the distributions: Zipf exponent of movie popularity, Pareto
+# exponent and minimum of the watched-list size, and the share of a user's
+# watched movies that are favorites
+POPULARITY_EXPONENT = 0.8
+LIBRARY_EXPONENT = 1.3
+MIN_LIBRARY_SIZE = 5
+FAVORITE_SHARE = 0.2
+
+# Movies whose similar movies are computed by default
+SIMILAR_MOVIES = 2000
+
+
+def batches(rows, size=BATCH_SIZE):
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+
+def insert_rows(table, rows):
+    for batch in batches(rows):
+        db.session.execute(insert(table), batch)
+
+
+def random_time(rng, days):
+    return BASE_TIME - timedelta(seconds=rng.randrange(days * 86400))
+
+
+def generate_genres(count):
+    names = GENRE_NAMES[:count] + [f'Genre {n}' for n in range(len(GENRE_NAMES) + 1, count + 1)]
+    insert_rows(Genre.__table__, [{'id': n, 'name': name} for n, name in enumerate(names, start=1)])
+
+
+def generate_movies(rng, count, genre_count):
+    # A few genres are much more common than the rest
+    genre_weights = list(accumulate(1 / n for n in range(1, genre_count + 1)))
+    movies, links = [], []
+    for movie_id in range(1, count + 1):
+        year = min(2024, int(1920 + 105 * rng.betavariate(3, 1.2)))
+        movies.append({
+            'id': movie_id,
+            'title': ' '.join(rng.choice(TITLE_WORDS) for _ in range(rng.randint(1, 4))),
+            'release_year': year,
+            'rating': round(min(10.0, max(1.0, rng.gauss(6.5, 1.2))), 1) if rng.random() < 0.95 else None,
+            'certification': rng.choice(CERTIFICATIONS),
+            'runtime_minutes': rng.randint(75, 190),
+            'poster_url': f'https://posters.example.com/{movie_id}.jpg' if rng.random() < 0.9 else None,
+            'overview': ' '.join(rng.choice(OVERVIEW_WORDS) for _ in range(rng.randint(15, 45))).capitalize() + '.',
+            'created_at': BASE_TIME,
+            'updated_at': BASE_TIME,
+        })
+        genre_ids = {bisect(genre_weights, rng.random() * genre_weights[-1]) + 1 for _ in range(rng.randint(1, 3))}
+        links.extend({'movie_id': movie_id, 'genre_id': genre_id} for genre_id in sorted(genre_ids))
+
+    insert_rows(Movie.__table__, movies)
+    insert_rows(movie_genres, links)
+    insert_rows(MovieStats.__table__, [{'movie_id': movie_id} for movie_id in range(1, count + 1)])
+
+
+def generate_users(rng, count):
+    # Hashing is deliberately slow, so every user shares one hash
+    password_hash = generate_password_hash(PASSWORD)
+    insert_rows(User.__table__, [{
+        'id': user_id,
+        'username': f'user{user_id:05d}',
+        'email': f'user{user_id:05d}@example.com',
+        'password_hash': password_hash,
+        'created_at': random_time(rng, 3 * 365),
+        'last_login': random_time(rng, 90),
+        'is_active': True,
+    } for user_id in range(1, count + 1)])
+
+
+def pick_movies(rng, cumulative, order, size):
+    """`size` distinct movie IDs, drawn by popularity."""
+    size = min(size, len(order))
+    picked = set()
+    while len(picked) < size:
+        picked.add(order[bisect(cumulative, rng.random() * cumulative[-1])])
+    return sorted(picked)
+
+
+def generate_libraries(rng, movie_count, user_count, power_user_library, max_library):
+    # Popularity rank -> movie: a fixed shuffle, so popular movies aren't just the oldest IDs
+    order = list(range(1, movie_count + 1))
+    rng.shuffle(order)
+    cumulative = list(accumulate(1 / rank ** POPULARITY_EXPONENT for rank in range(1, movie_count + 1)))
+
+    total = 0
+    for first in range(1, user_count + 1, 1000):
+        watched_rows, watchlist_rows, favorite_rows = [], [], []
+        for user_id in range(first, min(first + 1000, user_count + 1)):
+            if user_id == 1:
+                size = power_user_library
+            else:
+                size = min(max_library, int(MIN_LIBRARY_SIZE * rng.paretovariate(LIBRARY_EXPONENT)))
+            seen = pick_movies(rng, cumulative, order, size)
+            seen_set = set(seen)
+            wanted = [movie_id for movie_id in pick_movies(rng, cumulative, order, size // 2 + 1)
+                      if movie_id not in seen_set]
+
+            watched_rows.extend({'user_id': user_id, 'movie_id': movie_id, 'watched_at': random_time(rng, 3 * 365)}
+                                for movie_id in seen)
+            watchlist_rows.extend({'user_id': user_id, 'movie_id': movie_id} for movie_id in wanted)
+            favorite_rows.extend({'user_id': user_id, 'movie_id': movie_id, 'added_at': random_time(rng, 3 * 365)}
+                                 for movie_id in seen if rng.random() < FAVORITE_SHARE)
+
+        insert_rows(watched, watched_rows)
+        insert_rows(watchlist, watchlist_rows)
+        insert_rows(favorites, favorite_rows)
+        total += len(watched_rows) + len(watchlist_rows) + len(favorite_rows)
+    return total
+
+
+def most_watched(limit):
+    """IDs of the `limit` most watched movies."""
+    return db.session.scalars(
+        select(MovieStats.movie_id).order_by(MovieStats.watched_count.desc(), MovieStats.movie_id).limit(limit)
+    ).all()
+
+
+def generate(path, movies, genres, users, power_user_library, max_library, seed, similar_movies=SIMILAR_MOVIES):
+    """
+    Create the database at `path` and fill it; prints each step's duration.
+    Similar movies are computed for the `similar_movies` most watched
+    movies only (all of them when None): a full build is quadratic in the
+    number of movies.
+    """
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.abspath(path)
+    rng = random.Random(seed)
+    app = create_app(production=False)
+
+    def step(label, function, *args):
+        start = time.perf_counter()
+        result = function(*args)
+        db.session.commit()
+        print(f'{label:<24} {time.perf_counter() - start:8.2f}s')
+        return result
+
+    with app.app_context():
+        step('genres', generate_genres, genres)
+        step('movies', generate_movies, rng, movies, genres)
+        step('users', generate_users, rng, users)
+        entries = step('libraries', generate_libraries, rng, movies, users, power_user_library, max_library)
+        step('movie counters', reconcile_movie_stats)
+        step('user counters', reconcile_user_stats)
+        if similar_movies != 0:
+            targets = most_watched(similar_movies) if similar_movies is not None else None
+            step('similar movies', build_similarity_index, targets)
+        step('analyze', lambda: db.session.execute(text('ANALYZE')))
+    print(f'{movies} movies, {genres} genres, {users} users, {entries} library entries in {path}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--db', required=True, help='SQLite database to create')
+    parser.add_argument('--movies', type=int, default=200000)
+    parser.add_argument('--genres', type=int, default=50)
+    parser.add_argument('--users', type=int, default=20000)
+    parser.add_argument('--power-user-library', type=int, default=10000, help='Watched movies of user 1')
+    parser.add_argument('--max-library', type=int, default=20000, help='Largest watched list of other users')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--similar-movies', type=int, default=SIMILAR_MOVIES,
+                        help='Most watched movies to compute similar movies for (-1: all, 0: none)')
+    parser.add_argument('--force', action='store_true', help='Replace the database if it exists')
+    args = parser.parse_args()
+
+    if os.path.exists(args.db):
+        if not args.force:
+            parser.error(f'{args.db} exists; pass --force to replace it')
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(args.db + suffix):
+                os.unlink(args.db + suffix)
+
+    generate(args.db, args.movies, args.genres, args.users, args.power_user_library, args.max_library,
+             args.seed, similar_movies=None if args.similar_movies < 0 else args.similar_movies)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,35 @@
+"""Add poster_images
+
+Records which movie posters are stored locally (see board/posters.py).
+
+Revision ID: 0c9e5a1f7b42
+Revises: 5f4364cfca43
+Create Date: 2026-10-18 13:40:51.204117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0c9e5a1f7b42'
+down_revision = '5f4364cfca43'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Left alone when db.create_all() already made it
+    if 'poster_images' not in sa.inspect(op.get_bind()).get_table_names():
+        op.create_table('poster_images',
+        sa.Column('source_url', sa.String(length=500), nullable=False),
+        sa.Column('content_hash', sa.String(length=64), nullable=False),
+        sa.Column('width', sa.Integer(), nullable=False),
+        sa.Column('height', sa.Integer(), nullable=False),
+        sa.Column('fetched_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('source_url')
+        )
+
+
+def downgrade():
+    op.drop_table('poster_images')
@@ -0,0 +1,101 @@
+"""Add denormalized and derived tables
+
+Creates the tables that so far only db.create_all() made: user_stats,
+movie_similarities, library_changes, catalog_version and the movies_fts
+search index, so a database can be built from migrations alone.
+
+Revision ID: 5f4364cfca43
+Revises: bd57e77aaec0
+Create Date: 2026-10-18 11:02:17.530914
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from board.search import FTS_TABLE, create_search_index
+
+
+# revision identifiers, used by Alembic.
+revision = '5f4364cfca43'
+down_revision = 'bd57e77aaec0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    tables = set(sa.inspect(bind).get_table_names())
+
+    # Tables already created by db.create_all() are left alone
+    if 'user_stats' not in tables:
+        op.create_table('user_stats',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('watchlist_count', sa.Integer(), nullable=False),
+        sa.Column('watched_count', sa.Integer(), nullable=False),
+        sa.Column('favorites_count', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('user_id')
+        )
+        # Backfill the counters from the list tables
+        op.execute("""
+            INSERT INTO user_stats (user_id, watchlist_count, watched_count, favorites_count)
+            SELECT id,
+                   (SELECT count(*) FROM watchlist WHERE watchlist.user_id = users.id),
+                   (SELECT count(*) FROM watched WHERE watched.user_id = users.id),
+                   (SELECT count(*) FROM favorites WHERE favorites.user_id = users.id)
+            FROM users
+        """)
+
+    if 'movie_similarities' not in tables:
+        op.create_table('movie_similarities',
+        sa.Column('movie_id', sa.Integer(), nullable=False),
+        sa.Column('similar_movie_id', sa.Integer(), nullable=False),
+        sa.Column('score', sa.Float(), nullable=False),
+        sa.Column('computed_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['movie_id'], ['movies.id'], ),
+        sa.ForeignKeyConstraint(['similar_movie_id'], ['movies.id'], ),
+        sa.PrimaryKeyConstraint('movie_id', 'similar_movie_id')
+        )
+        op.create_index('ix_movie_similarities_similar_movie_id', 'movie_similarities', ['similar_movie_id'])
+
+    if 'library_changes' not in tables:
+        op.create_table('library_changes',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('movie_id', sa.Integer(), nullable=False),
+        sa.Column('list_name', sa.String(length=16), nullable=False),
+        sa.Column('added', sa.Boolean(), nullable=False),
+        sa.Column('changed_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['movie_id'], ['movies.id'], ),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index('ix_library_changes_user_id_id', 'library_changes', ['user_id', 'id'])
+
+    if 'catalog_version' not in tables:
+        op.create_table('catalog_version',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('version', sa.Integer(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+        )
+
+    if bind.dialect.name == 'sqlite' and FTS_TABLE not in tables:
+        create_search_index(bind)
+        op.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == 'sqlite':
+        for trigger in ('ai', 'ad', 'au'):
+            op.execute(f"DROP TRIGGER IF EXISTS {FTS_TABLE}_{trigger}")
+        op.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+    op.drop_table('catalog_version')
+    with op.batch_alter_table('library_changes', schema=None) as batch_op:
+        batch_op.drop_index('ix_library_changes_user_id_id')
+    op.drop_table('library_changes')
+    with op.batch_alter_table('movie_similarities', schema=None) as batch_op:
+        batch_op.drop_index('ix_movie_similarities_similar_movie_id')
+    op.drop_table('movie_similarities')
+    op.drop_table('user_stats')
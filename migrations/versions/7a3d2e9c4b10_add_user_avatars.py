@@ -0,0 +1,34 @@
+"""Add user_avatars
+
+Records each user's processed profile picture (see board/avatars.py).
+
+Revision ID: 7a3d2e9c4b10
+Revises: 0c9e5a1f7b42
+Create Date: 2026-10-18 14:22:06.913548
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7a3d2e9c4b10'
+down_revision = '0c9e5a1f7b42'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Left alone when db.create_all() already made it
+    if 'user_avatars' not in sa.inspect(op.get_bind()).get_table_names():
+        op.create_table('user_avatars',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('content_hash', sa.String(length=64), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('user_id')
+        )
+
+
+def downgrade():
+    op.drop_table('user_avatars')
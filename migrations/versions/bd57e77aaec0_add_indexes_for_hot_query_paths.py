@@ -0,0 +1,58 @@
+"""Add indexes for hot query paths
+
+Revision ID: bd57e77aaec0
+Revises: d6642a834e48
+Create Date: 2026-10-18 10:12:41.208311
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'bd57e77aaec0'
+down_revision = 'd6642a834e48'
+branch_labels = None
+depends_on = None
+
+
+# (index name, table, columns); the same indexes are declared on the models
+INDEXES = [
+    # Home, genre, top movies and search fallback sort by rating, then ID
+    ('ix_movies_rating_id', 'movies', [sa.text('rating DESC'), 'id']),
+    # Movies of a genre
+    ('ix_movie_genres_genre_id_movie_id', 'movie_genres', ['genre_id', 'movie_id']),
+    # Recently watched movies on the profile page, favorites by date
+    ('ix_watched_user_id_watched_at', 'watched', ['user_id', 'watched_at']),
+    ('ix_favorites_user_id_added_at', 'favorites', ['user_id', 'added_at']),
+    # Community page orders users by last login
+    ('ix_users_last_login', 'users', ['last_login']),
+    # Reverse lookups by movie on the list tables
+    ('ix_watchlist_movie_id', 'watchlist', ['movie_id', 'user_id']),
+    ('ix_favorites_movie_id', 'favorites', ['movie_id', 'user_id']),
+    ('ix_watched_movie_id', 'watched', ['movie_id', 'user_id']),
+    # Similar-movies index maintenance
+    ('ix_movie_similarities_similar_movie_id', 'movie_similarities', ['similar_movie_id']),
+]
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    tables = set(inspector.get_table_names())
+
+    for name, table, columns in INDEXES:
+        # Tables created by db.create_all() already have the indexes declared on the models
+        if table not in tables:
+            continue
+        if name in {index['name'] for index in inspector.get_indexes(table)}:
+            continue
+        op.create_index(name, table, columns)
+
+
+def downgrade():
+    inspector = sa.inspect(op.get_bind())
+    tables = set(inspector.get_table_names())
+
+    for name, table, columns in reversed(INDEXES):
+        if table in tables and name in {index['name'] for index in inspector.get_indexes(table)}:
+            op.drop_index(name, table_name=table)
@@ -0,0 +1,34 @@
+"""Add import_checkpoints
+
+Progress of `flask import-movies` per source file (see board/importer.py).
+
+Revision ID: c41f8e2d9a67
+Revises: 7a3d2e9c4b10
+Create Date: 2026-10-18 16:05:39.482210
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c41f8e2d9a67'
+down_revision = '7a3d2e9c4b10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Left alone when db.create_all() already made it
+    if 'import_checkpoints' not in sa.inspect(op.get_bind()).get_table_names():
+        op.create_table('import_checkpoints',
+        sa.Column('source', sa.String(length=500), nullable=False),
+        sa.Column('rows_done', sa.Integer(), nullable=False),
+        sa.Column('file_size', sa.Integer(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('source')
+        )
+
+
+def downgrade():
+    op.drop_table('import_checkpoints')
@@ -0,0 +1,56 @@
+import pytest
+from board import create_app, http_cache
+from board.models import db, User, Movie
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    """An app on an empty database made by create_all(), as in development."""
+    monkeypatch.setenv('DATABASE_URL', f"sqlite:///{tmp_path / 'test.db'}")
+    monkeypatch.setenv('AVATAR_DIR', str(tmp_path / 'avatars'))
+    monkeypatch.setenv('POSTER_CACHE_DIR', str(tmp_path / 'posters'))
+    # The catalog version is cached per process; each test has its own database
+    monkeypatch.setattr(http_cache, '_cached', None)
+    monkeypatch.setattr(http_cache, '_counters_bumped_at', None)
+    monkeypatch.setattr(http_cache, '_counters_pending', False)
+    app = create_app(production=False)
+    app.config['TESTING'] = True
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def make_user(app):
+    def make_user(username='alice'):
+        user = User(username=username, email=f'{username}@example.com')
+        user.set_password('password')
+        db.session.add(user)
+        db.session.commit()
+        return user
+    return make_user
+
+
+@pytest.fixture
+def make_movies(app):
+    def make_movies(count):
+        movies = [Movie(title=f'Movie {n}', release_year=2000 + n) for n in range(count)]
+        db.session.add_all(movies)
+        db.session.commit()
+        return movies
+    return make_movies
+
+
+@pytest.fixture
+def sign_in(client):
+    def sign_in(user_id):
+        with client.session_transaction() as session:
+            session['_user_id'] = str(user_id)
+            session['_fresh'] = True
+    return sign_in
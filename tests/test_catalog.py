@@ -0,0 +1,43 @@
+from board.catalog import top_movies_by_genre
+from board.models import db, Genre
+from board.query_stats import count_queries
+
+
+def make_shelves(make_movies):
+    movies = make_movies(4)
+    for movie, rating in zip(movies, (7.0, 9.0, 8.0, 6.0)):
+        movie.rating = rating
+    drama, comedy = Genre(name='Drama'), Genre(name='Comedy')
+    drama.movies.extend(movies)
+    comedy.movies.extend(movies[2:])
+    db.session.add_all([drama, comedy])
+    db.session.commit()
+    return movies
+
+
+def titles(shelves):
+    return {genre.name: [movie.title for movie in movies] for genre, movies in shelves.items()}
+
+
+def test_top_movies_by_genre(app, make_movies):
+    with app.app_context():
+        make_shelves(make_movies)
+        shelves = top_movies_by_genre(per_genre=2)
+        assert list(titles(shelves)) == ['Comedy', 'Drama']
+        assert titles(shelves) == {'Comedy': ['Movie 2', 'Movie 3'], 'Drama': ['Movie 1', 'Movie 2']}
+
+
+def test_shelves_are_ranked_once_per_catalog_version(app, make_user, make_movies):
+    with app.app_context():
+        movies = make_shelves(make_movies)
+        top_movies_by_genre(per_genre=2)
+
+        # Library changes only touch the counters: the ranking is reused
+        make_user().add_to_watchlist(movies[0])
+        with count_queries() as stats:
+            top_movies_by_genre(per_genre=2)
+        assert stats.count == 1
+
+        movies[3].rating = 9.5
+        db.session.commit()
+        assert titles(top_movies_by_genre(per_genre=2))['Comedy'] == ['Movie 3', 'Movie 2']
@@ -0,0 +1,77 @@
+import csv
+import io
+import json
+from datetime import datetime
+import pytest
+from sqlalchemy import insert
+from board.export import ALL_USERS_FIELDS, FIELDS, encode_rows, export_library
+from board.models import db, favorites, watchlist, watched
+from board.streaming import CHUNK_SIZE
+
+WATCHED_AT = datetime(2024, 5, 1, 20, 15)
+
+
+@pytest.fixture
+def libraries(app, make_user, make_movies):
+    """alice has three movies across her lists, bob one."""
+    with app.app_context():
+        alice, bob = make_user('alice'), make_user('bobby')
+        first, second, third = make_movies(3)
+        db.session.execute(insert(watchlist), [{'user_id': alice.id, 'movie_id': first.id},
+                                               {'user_id': bob.id, 'movie_id': first.id}])
+        db.session.execute(insert(watched), [{'user_id': alice.id, 'movie_id': second.id, 'watched_at': WATCHED_AT}])
+        db.session.execute(insert(favorites), [{'user_id': alice.id, 'movie_id': second.id},
+                                               {'user_id': alice.id, 'movie_id': third.id}])
+        db.session.commit()
+        return alice.id, bob.id
+
+
+def test_csv_export_streams_only_the_users_library(app, client, libraries, sign_in):
+    alice_id, _ = libraries
+    sign_in(alice_id)
+
+    response = client.get('/api/library/export')
+    assert response.is_streamed
+    assert response.headers['Content-Disposition'] == 'attachment; filename="my-library.csv"'
+    assert response.headers['Cache-Control'] == 'private, no-store'
+
+    rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+    assert [(row['title'], row['in_watchlist'], row['is_watched'], row['is_favorite']) for row in rows] == [
+        ('Movie 0', 'true', 'false', 'false'),
+        ('Movie 1', 'false', 'true', 'true'),
+        ('Movie 2', 'false', 'false', 'true'),
+    ]
+    assert rows[1]['watched_at'] == WATCHED_AT.isoformat()
+    assert rows[0]['watched_at'] == ''
+
+
+def test_ndjson_export_and_unknown_formats(app, client, libraries, sign_in):
+    sign_in(libraries[1])
+
+    response = client.get('/api/library/export?format=ndjson')
+    assert response.mimetype == 'application/x-ndjson'
+    rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [(row['title'], row['in_watchlist'], row['watched_at']) for row in rows] == [('Movie 0', True, None)]
+    assert set(rows[0]) == set(FIELDS)
+
+    assert client.get('/api/library/export?format=xml').status_code == 400
+    with pytest.raises(ValueError):
+        export_library(1, 'xml')
+
+
+def test_rows_are_sent_in_chunks():
+    rows = ({name: n for name in FIELDS} for n in range(2000))
+    chunks = list(encode_rows(rows, FIELDS, 'csv'))
+    assert len(chunks) > 1
+    assert all(len(chunk) >= CHUNK_SIZE for chunk in chunks[:-1])
+    assert ''.join(chunks).count('\r\n') == 2001
+
+
+def test_export_command_dumps_every_library(app, libraries):
+    result = app.test_cli_runner().invoke(args=['export-libraries'])
+    rows = list(csv.DictReader(io.StringIO(result.stdout)))
+    assert [(row['username'], row['title']) for row in rows] == [
+        ('alice', 'Movie 0'), ('alice', 'Movie 1'), ('alice', 'Movie 2'), ('bobby', 'Movie 0'),
+    ]
+    assert list(rows[0]) == list(ALL_USERS_FIELDS)
+    assert 'Exported 4 library entries' in result.stderr
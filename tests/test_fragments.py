@@ -0,0 +1,57 @@
+from board.fragments import FragmentCache
+from board.models import db, Genre, Movie
+
+
+def test_cache_evicts_least_recently_used_and_expires():
+    cache = FragmentCache(max_entries=2, ttl=60)
+    cache.set('a', 'A')
+    cache.set('b', 'B')
+    assert cache.get('a') == 'A'  # now more recent than b
+    cache.set('c', 'C')
+    assert (cache.get('a'), cache.get('b'), cache.get('c')) == ('A', None, 'C')
+
+    cache.ttl = -1
+    assert cache.get('a') is None
+    assert cache.stats() == {'entries': 1, 'hits': 3, 'misses': 2, 'evictions': 1, 'hit_rate': 0.6}
+
+
+def seed_shelf(make_movies):
+    movies = make_movies(3)
+    for n, movie in enumerate(movies):
+        movie.rating = 7 + n
+    db.session.add(Genre(name='Drama', movies=movies))
+    db.session.commit()
+    return [movie.id for movie in movies]
+
+
+def test_edited_movies_are_rendered_again(app, client, make_movies):
+    with app.app_context():
+        movie_ids = seed_shelf(make_movies)
+    cache = app.extensions['fragment_cache']
+
+    assert 'Movie 2' in client.get('/').get_data(as_text=True)
+    misses = cache.misses
+    client.get('/')
+    assert cache.misses == misses and cache.hits > 0
+
+    with app.app_context():
+        db.session.get(Movie, movie_ids[2]).title = 'Renamed'
+        db.session.commit()
+    html = client.get('/').get_data(as_text=True)
+    assert 'Renamed' in html and 'Movie 2' not in html
+
+
+def test_cached_shelves_are_filled_per_user(app, client, make_user, make_movies, sign_in):
+    with app.app_context():
+        movie_ids = seed_shelf(make_movies)
+        user = make_user()
+        user.add_to_watchlist(db.session.get(Movie, movie_ids[0]))
+        user_id = user.id
+
+    anonymous = client.get('/').get_data(as_text=True)
+    assert f'data-movie-id="{movie_ids[0]}"' not in anonymous
+
+    sign_in(user_id)
+    html = client.get('/').get_data(as_text=True)
+    assert html.count('bi-bookmark-check-fill') == 1
+    assert html.count('bi-bookmark-plus') == 2
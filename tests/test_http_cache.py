@@ -0,0 +1,94 @@
+from flask import session
+from board import http_cache
+from board.http_cache import catalog_cache, catalog_version
+from board.models import db, Genre
+from board.query_stats import count_queries
+
+
+def test_anonymous_genre_page_is_public_without_cookie(app, client, make_movies):
+    with app.app_context():
+        movies = make_movies(2)
+        genre = Genre(name='Drama')
+        genre.movies.extend(movies)
+        db.session.add(genre)
+        db.session.commit()
+        genre_id = genre.id
+
+    response = client.get(f'/genre/{genre_id}')
+    assert response.status_code == 200
+    response.get_data()
+    assert 'Set-Cookie' not in response.headers
+    assert response.headers['Cache-Control'].startswith('public')
+
+
+def test_response_setting_a_cookie_is_private(app):
+    with app.test_request_context():
+        @catalog_cache
+        def view():
+            session['seen'] = True
+            return 'page'
+
+        response = view()
+    assert response.headers['Cache-Control'] == 'private, no-cache'
+    assert 'Cookie' in response.headers['Vary']
+
+
+def test_matching_etag_is_answered_with_304(app, client, make_movies):
+    with app.app_context():
+        make_movies(3)
+
+    response = client.get('/top-movies')
+    etag = response.headers['ETag']
+    assert response.headers['Cache-Control'] == 'public, max-age=0, s-maxage=60'
+    assert 'Cookie' in response.headers['Vary']
+
+    with app.app_context(), count_queries() as stats:
+        response = client.get('/top-movies', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.headers['ETag'] == etag
+    assert stats.count == 0
+
+
+def test_signed_in_responses_are_private(app, client, make_user, make_movies, sign_in):
+    with app.app_context():
+        make_movies(1)
+        user_id = make_user().id
+    sign_in(user_id)
+
+    response = client.get('/top-movies')
+    assert response.status_code == 200
+    assert response.headers['Cache-Control'] == 'private, no-cache'
+    assert 'Cookie' in response.headers['Vary']
+    assert 'ETag' not in response.headers
+
+
+def test_counter_changes_wait_for_the_interval(app, make_user, make_movies):
+    with app.app_context():
+        user = make_user()
+        first, second = make_movies(2)
+        version = catalog_version()[0]
+
+        # The movies were just published, so the counters wait
+        user.add_to_watchlist(first)
+        user.add_to_watchlist(second)
+        assert catalog_version()[0] == version
+
+        # Catalog changes never do
+        first.title = 'Renamed'
+        db.session.commit()
+        assert catalog_version()[0] == version + 1
+
+
+def test_pending_counter_changes_are_published_after_the_interval(app, make_user, make_movies, monkeypatch):
+    with app.app_context():
+        user = make_user()
+        movie, = make_movies(1)
+        version = catalog_version()[0]
+        user.add_to_watchlist(movie)
+        assert catalog_version()[0] == version
+
+        # The next commit after the interval publishes them, whatever it changes
+        monkeypatch.setattr(http_cache, 'COUNTER_BUMP_INTERVAL', 0)
+        user.last_login = user.created_at
+        db.session.commit()
+        assert catalog_version()[0] == version + 1
@@ -0,0 +1,83 @@
+import json
+import pytest
+from board.importer import import_movies
+from board.models import db, Genre, Movie, MovieStats
+
+
+class Interrupted(Exception):
+    pass
+
+
+def write_jsonl(path, count, start=0):
+    with open(path, 'a') as f:
+        for n in range(start, start + count):
+            f.write(json.dumps({'title': f'Film {n}', 'year': 1990 + n % 30, 'genres': 'Drama|Crime'}) + '\n')
+
+
+def titles():
+    return sorted(title for title, in db.session.query(Movie.title))
+
+
+def test_interrupted_import_resumes_after_the_last_batch(app, tmp_path):
+    path = str(tmp_path / 'movies.jsonl')
+    write_jsonl(path, 7)
+
+    def stop(rows_done, elapsed):
+        raise Interrupted
+
+    with app.app_context():
+        with pytest.raises(Interrupted):
+            import_movies(path, batch_size=3, progress=stop)
+        assert len(titles()) == 3
+
+        result = import_movies(path, batch_size=3)
+        assert (result.resumed_from, result.imported) == (3, 4)
+        assert titles() == sorted(f'Film {n}' for n in range(7))
+        assert MovieStats.query.count() == 7
+        assert {genre.name: genre.movies.count() for genre in Genre.query} == {'Drama': 7, 'Crime': 7}
+
+        # Rows appended later are picked up on the next run; done ones are not repeated
+        write_jsonl(path, 2, start=7)
+        assert import_movies(path, batch_size=3).imported == 2
+        assert import_movies(path, batch_size=3).imported == 0
+        assert len(titles()) == 9
+
+
+def test_restart_and_changed_files(app, tmp_path):
+    path = str(tmp_path / 'movies.jsonl')
+    write_jsonl(path, 4)
+    with app.app_context():
+        import_movies(path)
+        assert import_movies(path, restart=True).imported == 4
+        assert len(titles()) == 8
+
+        # A file that shrank is not the one the checkpoint counted
+        write_jsonl(str(tmp_path / 'other.jsonl'), 1)
+        (tmp_path / 'other.jsonl').replace(path)
+        with pytest.raises(ValueError, match='--restart'):
+            import_movies(path)
+
+
+def test_bad_rows_are_skipped_and_reported(app, tmp_path):
+    path = tmp_path / 'movies.csv'
+    path.write_text('name,year,vote_average,genre\n'
+                    'Good,2001,7.5,Drama;Comedy\n'
+                    ',2002,6.0,Drama\n'
+                    'No Year,,5.0,\n'
+                    'Bad Rating,2003,high,\n')
+    with app.app_context():
+        result = import_movies(str(path))
+        assert (result.imported, result.skipped, result.new_genres) == (1, 3, 2)
+        assert result.errors == [(2, 'missing title'), (3, 'missing release year'), (4, 'malformed number')]
+        movie = Movie.query.one()
+        assert (movie.title, movie.release_year, movie.rating) == ('Good', 2001, 7.5)
+
+
+def test_import_command_reports_resumed_runs(app, tmp_path):
+    path = str(tmp_path / 'movies.jsonl')
+    write_jsonl(path, 3)
+    runner = app.test_cli_runner()
+    assert 'Imported 3 movies' in runner.invoke(args=['import-movies', path]).output
+    write_jsonl(path, 1, start=3)
+    output = runner.invoke(args=['import-movies', path]).output
+    assert 'Imported 1 movies' in output and 'resumed after row 3' in output
@@ -0,0 +1,135 @@
+import pytest
+from sqlalchemy import insert
+from board.library import MAX_BATCH_SIZE, apply_library_batch
+from board.models import db, MovieStats, favorites, watchlist, watched
+
+
+def test_library_tab_counts_without_stats_row(app, client, make_user, make_movies):
+    with app.app_context():
+        user_id = make_user().id
+        movies = make_movies(3)
+        db.session.execute(insert(watched), [{'user_id': user_id, 'movie_id': movie.id} for movie in movies])
+        db.session.execute(insert(favorites), [{'user_id': user_id, 'movie_id': movies[0].id}])
+        db.session.commit()
+
+    app.config['WTF_CSRF_ENABLED'] = False
+    client.post('/signin', data={'email': 'alice@example.com', 'password': 'password'})
+    html = client.get('/my-library').get_data(as_text=True)
+    counts = {name: html.split(f'id="{name}-tab"')[1].split('class="badge ms-1">')[1].split('<')[0]
+              for name in ('all', 'watchlist', 'watched', 'favorites')}
+    assert counts == {'all': '3', 'watchlist': '0', 'watched': '3', 'favorites': '1'}
+
+
+def test_toggles_flip_membership(app, client, make_user, make_movies, sign_in):
+    with app.app_context():
+        user_id = make_user().id
+        movie_id = make_movies(1)[0].id
+    app.config['WTF_CSRF_ENABLED'] = False
+    sign_in(user_id)
+
+    first = client.post('/api/watched/toggle', json={'movie_id': str(movie_id)}).get_json()
+    assert (first['status'], first['watched_count'], first['is_watched']) == ('marked as watched', 1, True)
+    second = client.post('/api/watched/toggle', json={'movie_id': movie_id}).get_json()
+    assert (second['status'], second['watched_count'], second['is_watched']) == ('marked as not watched', 0, False)
+
+    added = client.post('/api/watchlist/toggle', json={'movie_id': movie_id}).get_json()
+    assert (added['status'], added['button_text'], added['watchlist_count']) == ('added to', 'Remove from Watchlist', 1)
+    favorite = client.post('/api/favorites/toggle', json={'movie_id': movie_id}).get_json()
+    assert (favorite['status'], favorite['favorites_count']) == ('added to', 1)
+
+    with app.app_context():
+        assert db.session.execute(db.select(watched)).all() == []
+        assert len(db.session.execute(db.select(favorites)).all()) == 1
+
+
+def test_toggle_rejects_unknown_and_malformed_movies(app, client, make_user, sign_in):
+    with app.app_context():
+        user_id = make_user().id
+    app.config['WTF_CSRF_ENABLED'] = False
+    sign_in(user_id)
+
+    assert client.post('/api/watchlist/toggle', json={'movie_id': 999}).status_code == 404
+    assert client.post('/api/favorites/toggle', json={'movie_id': 'abc'}).status_code == 400
+    assert client.post('/api/watched/toggle', json={}).status_code == 400
+
+
+def test_movie_statuses_and_buttons_share_movie_ids(app, client, make_user, make_movies, sign_in):
+    with app.app_context():
+        user_id = make_user().id
+        movies = make_movies(2)
+        movie_ids = [movie.id for movie in movies]
+        db.session.execute(insert(favorites), [{'user_id': user_id, 'movie_id': movie_ids[1]}])
+        db.session.commit()
+    sign_in(user_id)
+
+    html = client.get(f'/movie/{movie_ids[0]}').get_data(as_text=True)
+    assert html.count(f'data-movie-id="{movie_ids[0]}"') >= 3
+
+    response = client.get(f'/api/user/movie-statuses?ids={movie_ids[0]},{movie_ids[1]}')
+    data = response.get_json()
+    assert (data['watchlist'], data['favorites'], data['watched']) == ([], [movie_ids[1]], [])
+    assert client.get(response.request.url, headers={'If-None-Match': response.headers['ETag']}).status_code == 304
+
+
+def test_batch_reports_every_outcome(app, client, make_user, make_movies, sign_in):
+    with app.app_context():
+        user_id = make_user().id
+        first, second = [movie.id for movie in make_movies(2)]
+        db.session.execute(insert(favorites), [{'user_id': user_id, 'movie_id': second}])
+        db.session.commit()
+    app.config['WTF_CSRF_ENABLED'] = False
+    sign_in(user_id)
+
+    operations = [
+        {'movie_id': first, 'list': 'watchlist', 'op': 'add'},
+        {'movie_id': first, 'list': 'watched', 'op': 'add'},
+        {'movie_id': first, 'list': 'watched', 'op': 'remove'},
+        {'movie_id': second, 'list': 'favorites', 'op': 'add'},
+        {'movie_id': second, 'list': 'favorites', 'op': 'remove'},
+        {'movie_id': second, 'list': 'watched', 'op': 'remove'},
+        {'movie_id': 999, 'list': 'watchlist', 'op': 'add'},
+        {'movie_id': first, 'list': 'ratings', 'op': 'add'},
+        {'movie_id': 'abc', 'list': 'watchlist', 'op': 'add'},
+        'not an operation',
+    ]
+    data = client.post('/api/library/batch', json={'operations': operations}).get_json()
+    assert [result['outcome'] for result in data['results']] == [
+        'added', 'superseded', 'unchanged', 'superseded', 'removed', 'unchanged',
+        'not_found', 'invalid', 'invalid', 'invalid',
+    ]
+    assert data['counters'] == {'watchlist_count': 1, 'favorites_count': 0, 'watched_count': 0}
+    assert data['movies'] == {
+        str(first): {'watchlist_count': 1, 'favorites_count': 0, 'watched_count': 0},
+        str(second): {'watchlist_count': 0, 'favorites_count': 0, 'watched_count': 0},
+    }
+    assert data['version'] > 0
+
+    # Applying the same batch again changes nothing
+    again = client.post('/api/library/batch', json={'operations': operations[:1]}).get_json()
+    assert again['results'][0]['outcome'] == 'unchanged'
+    assert (again['movies'], again['version']) == ({}, data['version'])
+
+
+def test_batch_rejects_empty_and_oversized_requests(app, client, make_user, sign_in):
+    with app.app_context():
+        user_id = make_user().id
+    app.config['WTF_CSRF_ENABLED'] = False
+    sign_in(user_id)
+
+    assert client.post('/api/library/batch', json={'operations': []}).status_code == 400
+    assert client.post('/api/library/batch', data='nonsense').status_code == 400
+    too_many = [{'movie_id': 1, 'list': 'watchlist', 'op': 'add'}] * (MAX_BATCH_SIZE + 1)
+    assert client.post('/api/library/batch', json={'operations': too_many}).status_code == 400
+
+
+def test_batch_rolls_back_on_error(app, make_user, make_movies, monkeypatch):
+    with app.app_context():
+        user_id = make_user().id
+        movie_id = make_movies(1)[0].id
+
+        def fail(deltas):
+            raise RuntimeError('disk full')
+        monkeypatch.setattr(MovieStats, 'increment_many', fail)
+        with pytest.raises(RuntimeError):
+            apply_library_batch(user_id, [{'movie_id': movie_id, 'list': 'watchlist', 'op': 'add'}])
+        assert db.session.execute(db.select(watchlist)).all() == []
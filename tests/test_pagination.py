@@ -0,0 +1,60 @@
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import insert
+from board.models import db, Movie, watched
+from board.pagination import keyset_paginate, decode_cursor, encode_cursor
+
+
+def walk(query, keys, per_page):
+    """Every item of a keyset-paginated query, following cursors page by page."""
+    items, cursor, positions = [], None, []
+    while True:
+        page = keyset_paginate(query, keys, cursor=cursor, per_page=per_page)
+        items.extend(page.items)
+        positions.append(page.position)
+        cursor = page.next_cursor
+        if cursor is None:
+            return items, positions
+
+
+def test_pages_cover_ties_and_nulls_once_in_order(app, make_movies):
+    with app.app_context():
+        movies = make_movies(11)
+        for n, movie in enumerate(movies):
+            movie.rating = None if n % 4 == 0 else n % 3  # ties, and NULLs that sort last
+        db.session.commit()
+
+        keys = [(Movie.rating, True), (Movie.id, False)]
+        items, positions = walk(Movie.query, keys, per_page=3)
+        expected = sorted(movies, key=lambda movie: (movie.rating is None, -(movie.rating or 0), movie.id))
+        assert [movie.id for movie in items] == [movie.id for movie in expected]
+        assert positions == [0, 3, 6, 9]
+
+
+def test_datetime_keys_round_trip(app, make_user, make_movies):
+    with app.app_context():
+        user = make_user()
+        movies = make_movies(5)
+        start = datetime(2024, 1, 1, 12, 30)
+        db.session.execute(insert(watched), [
+            {'user_id': user.id, 'movie_id': movie.id, 'watched_at': start + timedelta(minutes=n // 2)}
+            for n, movie in enumerate(movies)
+        ])
+        db.session.commit()
+
+        query = db.session.query(Movie).join(watched, watched.c.movie_id == Movie.id)
+        keys = [(watched.c.watched_at, True), (Movie.id, False)]
+        items, _ = walk(query, keys, per_page=2)
+        assert [movie.id for movie in items] == [movies[n].id for n in (4, 2, 3, 0, 1)]
+
+
+def test_malformed_cursors_are_rejected(app, client):
+    with pytest.raises(ValueError):
+        decode_cursor('not a cursor')
+    with pytest.raises(ValueError):
+        decode_cursor(encode_cursor([1], 0)[:-2])
+    with app.app_context(), pytest.raises(ValueError):
+        # A cursor for a different number of keys
+        keyset_paginate(Movie.query, [(Movie.id, False)], cursor=encode_cursor([1, 2], 24))
+
+    assert client.get('/api/top-movies?cursor=garbage').status_code == 400
@@ -0,0 +1,54 @@
+import re
+from datetime import datetime, timedelta
+from html import unescape
+from sqlalchemy import insert
+from board.models import db, UserStats, watched
+
+
+def test_profile_lists_watched_movies_without_stats_row(app, client, make_user, make_movies):
+    with app.app_context():
+        user_id = make_user().id
+        movies = make_movies(3)
+        db.session.execute(insert(watched), [{'user_id': user_id, 'movie_id': movie.id} for movie in movies])
+        db.session.commit()
+        assert db.session.get(UserStats, user_id) is None
+
+    html = client.get(f'/profile/{user_id}').get_data(as_text=True)
+    assert 'All Watched Movies (3)' in html
+    assert html.count('Movie 0') == 2  # recently watched, and the full list
+    assert 'No watched movies yet' not in html
+
+
+def test_profile_without_watched_movies(app, client, make_user):
+    with app.app_context():
+        user_id = make_user().id
+
+    html = client.get(f'/profile/{user_id}').get_data(as_text=True)
+    assert 'All Watched Movies (0)' in html
+    assert 'No watched movies yet' in html
+
+
+def test_profile_pages_the_watched_list(app, client, make_user, make_movies):
+    with app.app_context():
+        user_id = make_user().id
+        movies = make_movies(30)
+        db.session.execute(insert(watched), [
+            {'user_id': user_id, 'movie_id': movie.id, 'watched_at': datetime(2024, 1, 1) + timedelta(days=n)}
+            for n, movie in enumerate(movies)
+        ])
+        db.session.commit()
+
+    html = client.get(f'/profile/{user_id}').get_data(as_text=True)
+    assert 'All Watched Movies (30)' in html
+    assert 'Movie 29' in html and 'Movie 5' not in html
+    next_url = re.search(r'href="([^"]*cursor=[^"]*)" class="[^"]*" data-load-more', html).group(1)
+
+    html = client.get(unescape(next_url)).get_data(as_text=True)
+    assert all(f'Movie {n}<' in html for n in range(6))
+    assert 'data-load-more' not in html.split('data-load-more-items', 1)[1]
+
+
+def test_profile_rejects_a_malformed_cursor(app, client, make_user):
+    with app.app_context():
+        make_user()
+    assert client.get('/profile/1?cursor=nonsense').status_code == 400
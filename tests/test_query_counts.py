@@ -0,0 +1,49 @@
+import json
+from pathlib import Path
+import pytest
+from sqlalchemy import insert
+from board.models import db, Genre, favorites, watched
+from board.query_stats import REPEAT_THRESHOLD, assert_max_queries
+from board.similarity import build_similarity_index
+
+# Query counts recorded by bench_routes.py; a route may not run more here
+BASELINE = json.loads((Path(__file__).parent.parent / 'bench_baseline.json').read_text())['routes']
+
+
+@pytest.fixture
+def seeded(app, make_user, make_movies):
+    """Five users with lists and stats, 12 rated movies in two genres with a similarity index."""
+    with app.app_context():
+        users = [make_user(f'user{n}') for n in range(5)]
+        movies = make_movies(12)
+        for n, movie in enumerate(movies):
+            movie.rating = 5 + n % 5
+        db.session.add_all([Genre(name='Drama', movies=movies[::2]), Genre(name='Comedy', movies=movies[1::2])])
+        db.session.commit()
+        for user in users:
+            user.add_to_watchlist(movies[user.id])
+            for table in (favorites, watched):
+                db.session.execute(insert(table), [{'user_id': user.id, 'movie_id': movie.id} for movie in movies[:4]])
+        db.session.commit()
+        build_similarity_index()
+        return [user.id for user in users], [movie.id for movie in movies]
+
+
+@pytest.mark.parametrize('case, url, signed_in', [
+    ('community', '/community', False),
+    ('top_movies', '/top-movies', False),
+    ('profile', '/profile/{user_id}', False),
+    ('movie', '/movie/{movie_id}', False),
+    ('movie_signed_in', '/movie/{movie_id}', True),
+])
+def test_route_stays_within_baseline_queries(app, client, sign_in, seeded, case, url, signed_in):
+    user_ids, movie_ids = seeded
+    if signed_in:
+        sign_in(user_ids[0])
+    # Warm the catalog version and fragment caches on other rows, as the benchmark does
+    client.get(url.format(user_id=user_ids[1], movie_id=movie_ids[1])).get_data()
+
+    with app.app_context(), assert_max_queries(BASELINE[case]['queries'], threshold=REPEAT_THRESHOLD):
+        response = client.get(url.format(user_id=user_ids[0], movie_id=movie_ids[0]))
+        response.get_data()
+    assert response.status_code == 200
@@ -0,0 +1,37 @@
+from sqlalchemy import insert
+from board.models import db, Genre, favorites, watchlist, watched
+from board.query_plans import ROUTES, assert_no_full_scans, full_table_scans
+
+
+def seed(make_user, make_movies):
+    user = make_user()
+    movies = make_movies(30)
+    for n, movie in enumerate(movies):
+        movie.title = f'The Movie {n}'
+        movie.rating = 5 + n % 5
+    genre = Genre(name='Drama')
+    genre.movies.extend(movies)
+    db.session.add(genre)
+    db.session.commit()
+    for table in (watchlist, favorites, watched):
+        db.session.execute(insert(table), [{'user_id': user.id, 'movie_id': movie.id} for movie in movies[::3]])
+    db.session.commit()
+    return user
+
+
+def test_routes_do_not_scan_whole_tables(app, make_user, make_movies):
+    with app.app_context():
+        user_id = seed(make_user, make_movies).id
+        assert user_id == 1  # ROUTES use the first user, genre and movie
+
+    assert_no_full_scans(app, ROUTES)
+    assert_no_full_scans(app, ROUTES, user_id=user_id)
+
+
+def test_index_scans_are_full_scans_unless_allowed(app):
+    plan = ['SCAN movies USING INDEX ix_movies_rating_id',
+            'SEARCH watched USING COVERING INDEX ix_watched_movie_id (movie_id=?)']
+    with app.app_context():
+        assert [table for table, _ in full_table_scans(plan)] == ['movies']
+        assert full_table_scans(plan, index_scans={'movies'}) == []
+        assert full_table_scans(['SCAN movies'], index_scans={'movies'}) == [('movies', 'SCAN movies')]
@@ -0,0 +1,144 @@
+import time
+from board import search
+from board.models import db, Movie
+from board.search import TitleIndex, build_match_query, count_search_results, has_search_index, search_movies
+
+
+def add_movies(*movies):
+    db.session.add_all([Movie(title=title, overview=overview, rating=rating, release_year=2000)
+                        for title, overview, rating in movies])
+    db.session.commit()
+
+
+def titles(page):
+    return [movie.title for movie in page.items]
+
+
+def test_match_query_quotes_terms_and_prefixes_the_last_word():
+    assert build_match_query('star wa') == '"star" "wa"*'
+    assert build_match_query('"new hope" empire*') == '"new hope" "empire"*'
+    # FTS5 syntax in the input is matched as text, never run as operators
+    assert build_match_query('NOT OR') == '"NOT" "OR"*'
+    assert build_match_query('say "hi') == '"say" """hi"*'
+
+
+def test_title_matches_outrank_overview_matches(app):
+    with app.app_context():
+        assert has_search_index()
+        add_movies(('Quiet Harbor', 'A storm hits the coast.', 9.0),
+                   ('Storm Front', 'A detective story.', 5.0),
+                   ('Open Water', 'Sailors ride out a storm.', 8.0))
+
+        # The title match ranks first despite the lowest rating
+        assert titles(search_movies('storm'))[0] == 'Storm Front'
+        assert count_search_results('storm') == 3
+
+
+def test_partial_words_phrases_and_accents_match(app):
+    with app.app_context():
+        add_movies(('Amélie', 'A shy waitress in Paris.', 8.3),
+                   ('The Shy Ones', 'Paris in the rain.', 6.0))
+
+        assert titles(search_movies('ame')) == ['Amélie']
+        assert titles(search_movies('"shy waitress"')) == ['Amélie']
+        assert count_search_results('paris') == 2
+        assert titles(search_movies('NOT OR')) == []
+
+
+def test_search_results_page_with_cursors(app, client):
+    with app.app_context():
+        add_movies(*[(f'Heist {n}', 'A heist.', 7.0) for n in range(5)])
+        first = search_movies('heist', per_page=3)
+        second = search_movies('heist', cursor=first.next_cursor, per_page=3)
+        assert len(set(titles(first)) | set(titles(second))) == 5
+        assert second.next_cursor is None
+
+    response = client.get('/api/search?q=heist')
+    assert len(response.get_json()['movies']) == 5
+
+
+def test_stale_title_index_refreshes_off_the_request(app, monkeypatch):
+    index = TitleIndex(max_age=0)
+    monkeypatch.setattr(search, 'title_index', index)
+    with app.app_context():
+        add_movies(('Vertigo', 'A detective.', 8.3))
+        assert [movie['title'] for movie in search.suggest_titles('vert')] == ['Vertigo']
+
+        # Rows written behind the ORM's back only show up after a refresh
+        db.session.execute(db.insert(Movie), [{'title': 'Vertical Limit', 'release_year': 2000, 'rating': 5.9}])
+        db.session.commit()
+        refreshed = []
+        monkeypatch.setattr(index, 'refresh_in_background', refreshed.append)
+        assert [movie['title'] for movie in search.suggest_titles('vert')] == ['Vertigo']
+        assert refreshed == [app]
+
+        TitleIndex.refresh_in_background(index, app)
+        for _ in range(100):
+            if not index._refreshing:
+                break
+            time.sleep(0.01)
+        assert [movie['title'] for movie in index.suggest('vert')] == ['Vertigo', 'Vertical Limit']
+
+
+def test_edits_committed_during_a_refresh_are_kept(app):
+    index = TitleIndex()
+    with app.app_context():
+        add_movies(('Alien', 'Space.', 8.5))
+        index.refresh()
+        # As if committed while a refresh was reading the table
+        index._pending = {}
+        index.apply({99: ('Aliens', 1986, 8.4)})
+        index.build([(1, 'Alien', 1979, 8.5)])
+        assert [movie['title'] for movie in index.suggest('alie')] == ['Alien', 'Aliens']
+
+
+def suggested(query, **kwargs):
+    return [movie['title'] for movie in search.suggest_titles(query, **kwargs)]
+
+
+def test_suggestions_match_any_word_best_rated_first(app, monkeypatch):
+    monkeypatch.setattr(search, 'title_index', TitleIndex())
+    with app.app_context():
+        add_movies(('The Godfather', '', 9.2), ('Godfather: Part II', '', 9.0),
+                   ('Gods of Egypt', '', 5.4), ('Godzilla', '', None), ('Amélie', '', 8.3))
+
+        assert suggested('god') == ['The Godfather', 'Godfather: Part II', 'Gods of Egypt', 'Godzilla']
+        assert suggested('GODFATHER part') == ['Godfather: Part II']
+        assert suggested('ame') == suggested('amé') == ['Amélie']
+        assert suggested('god', limit=2) == ['The Godfather', 'Godfather: Part II']
+        assert suggested('!!') == []
+
+
+def test_committed_edits_update_suggestions_in_place(app, monkeypatch):
+    monkeypatch.setattr(search, 'title_index', TitleIndex())
+    monkeypatch.setattr(TitleIndex, 'CACHE_RANGE_SIZE', 0)  # cache every prefix
+    with app.app_context():
+        add_movies(('Heat', '', 8.3), ('Hereditary', '', 7.3))
+        assert suggested('he') == ['Heat', 'Hereditary']
+
+        heat = Movie.query.filter_by(title='Heat').one()
+        heat.title = 'Collateral'
+        db.session.commit()
+        assert suggested('he') == ['Hereditary']
+        assert suggested('coll') == ['Collateral']
+
+        db.session.delete(Movie.query.filter_by(title='Hereditary').one())
+        db.session.flush()
+        db.session.rollback()
+        assert suggested('he') == ['Hereditary']
+
+        db.session.delete(Movie.query.filter_by(title='Hereditary').one())
+        db.session.commit()
+        assert suggested('he') == []
+
+
+def test_suggest_api(app, client, monkeypatch):
+    monkeypatch.setattr(search, 'title_index', TitleIndex())
+    with app.app_context():
+        add_movies(*[(f'Rocky {n}', '', n) for n in range(1, 6)])
+
+    data = client.get('/api/search/suggest?q=rock&limit=2').get_json()
+    assert data['query'] == 'rock'
+    assert [(movie['title'], movie['rating']) for movie in data['results']] == [('Rocky 5', 5), ('Rocky 4', 4)]
+    assert client.get('/api/search/suggest?q=').get_json()['results'] == []
+    assert len(client.get('/api/search/suggest?q=rock&limit=0').get_json()['results']) == 1
@@ -0,0 +1,59 @@
+import numpy as np
+from scipy import sparse
+from board import similarity
+from board.models import db, Genre, MovieSimilarity, favorites
+from board.similarity import build_similarity_index, similar_movies_for
+
+
+def dense_scores(ratings, genres, users):
+    """Every pair's score computed naively on dense matrices."""
+    genres, users = genres.toarray(), users.toarray()
+    shared = genres @ genres.T
+    union = genres.sum(axis=1)[:, None] + genres.sum(axis=1)[None, :] - shared
+    score = similarity.GENRE_WEIGHT * np.divide(shared, union, out=np.zeros_like(shared), where=union > 0)
+    together = users @ users.T
+    norms = np.sqrt(users.sum(axis=1))[:, None] * np.sqrt(users.sum(axis=1))[None, :]
+    score += similarity.COOCCURRENCE_WEIGHT * np.divide(together, norms, out=np.zeros_like(together), where=norms > 0)
+    score = np.where(score > 0, score + similarity.RATING_WEIGHT * ratings[None, :] / 10.0, 0)
+    np.fill_diagonal(score, 0)
+    return score
+
+
+def test_sparse_scores_match_dense_top_k(monkeypatch):
+    monkeypatch.setattr(similarity, 'BLOCK_SIZE', 7)
+    random = np.random.default_rng(5)
+    count, top_k = 40, 5
+    movie_ids = np.arange(100, 100 + count)
+    ratings = random.uniform(0, 10, count).astype(np.float32)
+    genres = sparse.csr_matrix((random.random((count, 6)) < 0.25).astype(np.float32))
+    users = sparse.csr_matrix((random.random((count, 30)) < 0.1).astype(np.float32))
+
+    found = {}
+    for movie_id, similar_id, score in similarity._score_neighbours(
+            np.arange(count), movie_ids, ratings, genres, users, top_k):
+        found.setdefault(movie_id, {})[similar_id] = score
+
+    expected = dense_scores(ratings, genres, users)
+    for row in range(count):
+        positive = np.sort(expected[row][expected[row] > 0])[::-1]
+        scores = sorted(found.get(int(movie_ids[row]), {}).values(), reverse=True)
+        np.testing.assert_allclose(scores, positive[:top_k], rtol=1e-5)
+        for similar_id, score in found.get(int(movie_ids[row]), {}).items():
+            assert similar_id != movie_ids[row]
+            assert abs(expected[row, similar_id - 100] - score) < 1e-5
+
+
+def test_index_links_movies_sharing_genres_or_fans(app, make_user, make_movies):
+    with app.app_context():
+        user = make_user()
+        drama, horror, loner = make_movies(3)
+        twin = make_movies(1)[0]
+        db.session.add_all([Genre(name='Drama', movies=[drama, twin]), Genre(name='Horror', movies=[horror])])
+        db.session.execute(favorites.insert(), [{'user_id': user.id, 'movie_id': horror.id},
+                                                {'user_id': user.id, 'movie_id': drama.id}])
+        db.session.commit()
+
+        assert build_similarity_index() == 4
+        assert [movie.id for movie in similar_movies_for(drama.id)] == [twin.id, horror.id]
+        assert similar_movies_for(loner.id) == []
+        assert MovieSimilarity.query.filter_by(movie_id=horror.id).one().similar_movie_id == drama.id
@@ -0,0 +1,90 @@
+from sqlalchemy import insert
+from board.library import apply_library_batch
+from board.query_stats import count_queries
+from board.models import db, MovieStats, UserStats, watched
+
+
+def test_toggle_seeds_missing_user_stats_from_lists(app, make_user, make_movies):
+    with app.app_context():
+        user = make_user()
+        movies = make_movies(5)
+        # Watched before any counter existed, e.g. a create_all() database
+        db.session.execute(insert(watched), [{'user_id': user.id, 'movie_id': movie.id} for movie in movies[:3]])
+        db.session.commit()
+        assert db.session.get(UserStats, user.id) is None
+
+        user.mark_as_watched(movies[3])
+        stats = db.session.get(UserStats, user.id)
+        assert (stats.watched_count, stats.watchlist_count, stats.favorites_count) == (4, 0, 0)
+        assert db.session.get(MovieStats, movies[3].id).watched_count == 1
+
+        user.unmark_as_watched(movies[0])
+        db.session.refresh(stats)
+        assert stats.watched_count == 3
+
+
+def test_batch_seeds_missing_stats_rows(app, make_user, make_movies):
+    with app.app_context():
+        user = make_user()
+        movies = make_movies(3)
+        db.session.execute(insert(watched), [{'user_id': user.id, 'movie_id': movie.id} for movie in movies[:2]])
+        db.session.commit()
+
+        result = apply_library_batch(user.id, [
+            {'movie_id': movies[0].id, 'list': 'watchlist', 'op': 'add'},
+            {'movie_id': movies[2].id, 'list': 'watched', 'op': 'add'},
+        ])
+        assert result.counters == {'watchlist_count': 1, 'favorites_count': 0, 'watched_count': 3}
+        assert result.movie_counters[movies[0].id] == {'watchlist_count': 1, 'favorites_count': 0, 'watched_count': 1}
+
+
+def test_existing_stats_rows_are_incremented(app, make_user, make_movies):
+    with app.app_context():
+        user = make_user()
+        movie, = make_movies(1)
+        user.add_to_watchlist(movie)
+        user.add_to_favorites(movie)
+        user.remove_from_watchlist(movie)
+        stats = db.session.get(UserStats, user.id)
+        assert (stats.watchlist_count, stats.favorites_count) == (0, 1)
+        assert db.session.get(MovieStats, movie.id).favorites_count == 1
+
+
+def test_signup_creates_stats_row(app, client):
+    app.config['WTF_CSRF_ENABLED'] = False
+    response = client.post('/signup', data={'username': 'bobby', 'email': 'bobby@example.com',
+                                            'password': 'Secret-pass1', 'confirm_password': 'Secret-pass1'})
+    assert response.status_code == 302
+    with app.app_context():
+        stats = UserStats.query.one()
+        assert (stats.watchlist_count, stats.watched_count, stats.favorites_count) == (0, 0, 0)
+
+
+def test_increment_of_existing_rows_only_updates(app, make_user, make_movies):
+    with app.app_context():
+        user = make_user()
+        first, second = make_movies(2)
+        user.add_to_watchlist(first)
+
+        with count_queries() as stats:
+            user.add_to_watchlist(second)
+        statements = ' '.join(stats.fingerprints)
+        assert 'INSERT INTO user_stats' not in statements
+        assert 'INSERT INTO movie_stats' in statements  # the second movie had no row yet
+        assert db.session.get(UserStats, user.id).watchlist_count == 2
+
+
+def test_community_counts_users_without_stats_rows(app, client, make_user, make_movies):
+    with app.app_context():
+        counted, uncounted = make_user('carol'), make_user('dave')
+        movies = make_movies(3)
+        counted.add_to_watchlist(movies[0])
+        db.session.execute(insert(watched), [{'user_id': uncounted.id, 'movie_id': movie.id} for movie in movies])
+        db.session.commit()
+        assert db.session.get(UserStats, uncounted.id) is None
+
+    html = client.get('/community').get_data(as_text=True)
+    cards = {name: html.split(f'{name}\n')[1].split('View Profile')[0] for name in ('carol', 'dave')}
+    values = {name: [part.split('<')[0] for part in card.split('class="stat-value">')[1:]]
+              for name, card in cards.items()}
+    assert values == {'carol': ['1', '0', '0'], 'dave': ['0', '3', '0']}